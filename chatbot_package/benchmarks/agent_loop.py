@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency of the full agent loop with the offline mock LLM provider
+
+Runs concurrent sessions against a SQLite database; each turn streams the
+model reply, runs the scripted tool calls and streams the follow-up, the
+same sequence on_message drives in the Chainlit app.
+
+    python benchmarks/agent_loop.py --sessions 20 --turns 5 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+chatbot_root = Path(__file__).parent.parent
+sys.path.insert(0, str(chatbot_root / "src"))
+os.environ.setdefault("CHATBOT_DB_PATH", str(chatbot_root / "data" / "movies.db"))
+
+MAX_ITERATIONS = 5
+
+
+async def agent_turn(bot, question):
+    """One user turn: stream, run tools, stream again until no tool calls are left"""
+    async for _ in bot.stream(question):
+        pass
+    for _ in range(MAX_ITERATIONS):
+        tool_calls = bot.last_message.tool_calls
+        if not tool_calls:
+            break
+        await bot.run_tools(tool_calls)
+        async for _ in bot.stream():
+            pass
+    return bot.last_message.content
+
+
+async def run_session(make_bot, turns, latencies, timelines):
+    bot = make_bot()
+    for i in range(turns):
+        start = time.perf_counter()
+        timeline = bot.start_turn()
+        await agent_turn(bot, f"Question {i}: which tables are there?")
+        latencies.append(time.perf_counter() - start)
+        timelines.append(timeline.summary())
+
+
+async def main(args):
+    from bot import ChatBot
+    from llm import MockProvider
+    from tools import tools_schema, run_sqlite_query, plot_chart, get_table_schema
+
+    provider = MockProvider(latency=args.latency, token_delay=args.token_delay)
+    tool_functions = {
+        "run_sqlite_query": run_sqlite_query,
+        "plot_chart": plot_chart,
+        "get_table_schema": get_table_schema,
+    }
+
+    def make_bot():
+        return ChatBot("You are a data analysis expert.", tools_schema, tool_functions, provider=provider)
+
+    latencies = []
+    timelines = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(make_bot, args.turns, latencies, timelines) for _ in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"Sessions: {args.sessions}, turns per session: {args.turns}, LLM calls: {provider.calls}")
+    print(f"Throughput: {len(latencies) / elapsed:.1f} turns/s ({elapsed:.2f}s total)")
+    print(f"Turn latency p50: {statistics.median(latencies) * 1000:.0f} ms, "
+          f"p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+    for key, label in (("llm_wait", "LLM wait"), ("tool_time", "Tool time"), ("other", "Other")):
+        print(f"{label + ':':<11}{statistics.mean(t[key] for t in timelines) * 1000:.0f} ms per turn")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the agent loop with the mock LLM provider")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent chat sessions")
+    parser.add_argument("--turns", type=int, default=5, help="Turns per session")
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated LLM latency per call (seconds)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Simulated delay per streamed token")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+LLM calls and turn latency for repeated questions, with and without the answer cache
+
+Replays a mix of questions (several phrasings of a few common ones) with the
+offline mock LLM provider. A miss costs a planning round, the SQL and an
+answer round; a hit replays the cached SQL and only needs the answer round.
+
+    python benchmarks/answer_cache_bench.py --turns 60 --latency 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+chatbot_root = Path(__file__).parent.parent
+sys.path.insert(0, str(chatbot_root / "src"))
+os.environ.setdefault("CHATBOT_DB_PATH", str(chatbot_root / "data" / "movies.db"))
+
+from agent_loop import agent_turn
+
+QUESTIONS = [
+    "top 5 highest rated movies",
+    "What are the top 5 highest rated movies?",
+    "Show me the top 5 highest rated movies please",
+    "how many movies are there",
+    "How many movies do we have?",
+    "average runtime of movies per director",
+    "Average runtime of movies per director?",
+    "which actors played in the most movies",
+]
+SCRIPT = [
+    {"tool_calls": [{"name": "run_sqlite_query",
+                     "arguments": {"sql_query": "SELECT title, imdb_score FROM movies ORDER BY imdb_score DESC LIMIT 5"}}]},
+    {"content": "Here is what I found:\n{tool_result}"},
+]
+
+
+async def run(turns, latency, use_cache):
+    from answer_cache import AnswerCache
+    from bot import ChatBot
+    from llm import MockProvider
+    from tools import tools_schema, run_sqlite_query
+
+    provider = MockProvider(script=SCRIPT, latency=latency)
+    dataset = ("benchmark", "movies") if use_cache else None
+    cache = AnswerCache()
+    rng = random.Random(0)
+    latencies = []
+    for i in range(turns):
+        # a new session every few turns: the cache is shared, the history is not
+        if i % 4 == 0:
+            bot = ChatBot("You are a data analysis expert.", tools_schema, {"run_sqlite_query": run_sqlite_query},
+                          provider=provider, dataset=dataset, answer_cache=cache)
+        start = time.perf_counter()
+        await agent_turn(bot, rng.choice(QUESTIONS))
+        bot.remember_answer()
+        latencies.append(time.perf_counter() - start)
+    return provider.calls, latencies, cache.stats()
+
+
+async def main(args):
+    print(f"{'answer cache':<13} {'LLM calls':>9} {'p50 ms':>7} {'mean ms':>8} {'hit rate':>9}")
+    for use_cache in (False, True):
+        calls, latencies, stats = await run(args.turns, args.latency, use_cache)
+        hit_rate = f"{stats['hit_rate']:.0%}" if use_cache else "-"
+        print(f"{'on' if use_cache else 'off':<13} {calls:>9} {statistics.median(latencies) * 1000:>7.0f} "
+              f"{statistics.mean(latencies) * 1000:>8.0f} {hit_rate:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Repeated questions with and without the answer cache")
+    parser.add_argument("--turns", type=int, default=40, help="Questions asked")
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated LLM latency per call (seconds)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Cold-start regression check: imports the chatbot app in fresh interpreters and
+exits non-zero when the median import time exceeds the budget
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from import_profile import PROFILE_ENV, print_report, profile_imports, src_path
+
+COLD_START_BUDGET_MS = float(os.environ.get("COLD_START_BUDGET_MS", "1500"))
+
+TIMER = "import time; start = time.perf_counter(); import {modules}; print((time.perf_counter() - start) * 1000)"
+
+
+def import_ms(modules):
+    """Milliseconds to import the modules in a new interpreter (interpreter startup excluded)"""
+    completed = subprocess.run(
+        [sys.executable, "-c", TIMER.format(modules=", ".join(modules))],
+        cwd=src_path, env={**os.environ, **PROFILE_ENV}, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("modules", nargs="*", default=["app"], help="Modules of src/ to import (default: app)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=COLD_START_BUDGET_MS)
+    args = parser.parse_args()
+
+    times = [import_ms(args.modules) for _ in range(args.runs)]
+    median = statistics.median(times)
+    print(f"import {', '.join(args.modules)}: median {median:.0f} ms, "
+          f"min {min(times):.0f} ms, max {max(times):.0f} ms over {args.runs} runs "
+          f"(budget {args.budget_ms:.0f} ms)")
+
+    if median > args.budget_ms:
+        print(f"\n❌ Cold start is over budget by {median - args.budget_ms:.0f} ms\n")
+        print_report(profile_imports(args.modules), top=10)
+        sys.exit(1)
+    print("✅ Cold start within budget")
+
+
+if __name__ == "__main__":
+    main()
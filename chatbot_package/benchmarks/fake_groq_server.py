@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Local fake Groq (OpenAI-compatible) chat completions server for offline testing
+
+Replies are scripted: a user turn gets a call to the first SQL tool offered,
+a turn ending in tool results gets a text answer quoting them. Streaming
+responses send tool call arguments in several fragments so reassembly is
+exercised. Delays simulate provider time-to-first-token and per-token speed.
+
+    python benchmarks/fake_groq_server.py --port 8099
+    GROQ_BASE_URL=http://127.0.0.1:8099 GROQ_API_KEY=fake python run_chatbot.py
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_SQL = "SELECT COUNT(*) AS total FROM sqlite_master"
+
+
+def plan_reply(request):
+    """Deterministic reply for a chat completion request: (content, tool_calls)"""
+    messages = request.get("messages") or []
+    tools = request.get("tools") or []
+    last = messages[-1] if messages else {}
+
+    if last.get("role") == "user" and tools:
+        names = [tool["function"]["name"] for tool in tools]
+        name = next((name for name in names if "query" in name), names[0])
+        properties = next(tool for tool in tools if tool["function"]["name"] == name)["function"].get("parameters", {}).get("properties", {})
+        arguments = {"sql_query": DEFAULT_SQL} if "sql_query" in properties else {}
+        tool_call = {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                     "function": {"name": name, "arguments": json.dumps(arguments)}}
+        return None, [tool_call]
+
+    if last.get("role") == "tool":
+        result = str(last.get("content") or "").strip().splitlines()
+        return "Here is what I found:\n" + "\n".join(result[:6]), []
+
+    return "Hello! Ask me anything about your data.", []
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        content, tool_calls = plan_reply(request)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = request.get("model", "fake-model")
+
+        time.sleep(self.server.first_token_delay)
+        if request.get("stream"):
+            self._stream(completion_id, model, content, tool_calls)
+        else:
+            tokens = content.split(" ") if content else []
+            time.sleep(self.server.token_delay * len(tokens))
+            body = {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "tool_calls" if tool_calls else "stop",
+                             "message": {"role": "assistant", "content": content, "tool_calls": tool_calls or None}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            }
+            self._send_json(body)
+
+    def _send_json(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, completion_id, model, content, tool_calls):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def send(delta, finish_reason=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        send({"role": "assistant", "content": ""})
+        if content:
+            words = content.split(" ")
+            for i, word in enumerate(words):
+                send({"content": word if i == 0 else " " + word})
+                time.sleep(self.server.token_delay)
+        for index, tool_call in enumerate(tool_calls):
+            arguments = tool_call["function"]["arguments"]
+            middle = len(arguments) // 2
+            send({"tool_calls": [{"index": index, "id": tool_call["id"], "type": "function",
+                                  "function": {"name": tool_call["function"]["name"], "arguments": arguments[:middle]}}]})
+            send({"tool_calls": [{"index": index, "function": {"arguments": arguments[middle:]}}]})
+        send({}, "tool_calls" if tool_calls else "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def serve(port=0, first_token_delay=0.5, token_delay=0.02):
+    """Start the fake server in a background thread and return it (server.server_port has the port)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeGroqHandler)
+    server.daemon_threads = True
+    server.first_token_delay = first_token_delay
+    server.token_delay = token_delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local fake Groq chat completions server")
+    parser.add_argument("--port", type=int, default=8099, help="Port to listen on")
+    parser.add_argument("--first-token-delay", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between streamed tokens")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.first_token_delay, args.token_delay)
+    print(f"Fake Groq server listening on http://127.0.0.1:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Import-time breakdown of the chatbot modules, parsed from `python -X importtime`
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+chatbot_root = Path(__file__).parent.parent
+src_path = chatbot_root / "src"
+
+# app.py refuses to start without a Groq key; the mock provider needs none
+PROFILE_ENV = {"LLM_PROVIDER": "mock"}
+
+
+def profile_imports(modules):
+    """(module, depth, self_us, cumulative_us) for every module imported by `import <modules>`"""
+    env = {**os.environ, **PROFILE_ENV}
+    code = "import " + ", ".join(modules)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=src_path, env=env, capture_output=True, text=True,
+    )
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    if completed.returncode != 0:
+        raise RuntimeError(f"`{code}` failed:\n{completed.stderr.splitlines()[-1] if completed.stderr else ''}")
+    return entries
+
+
+def by_package(entries):
+    """Self time per top-level package in microseconds, largest first"""
+    totals = defaultdict(int)
+    for name, _, self_us, _ in entries:
+        totals[name.split(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def print_report(entries, top):
+    total_us = sum(self_us for _, _, self_us, _ in entries)
+    print(f"Total import time: {total_us / 1000:.1f} ms across {len(entries)} modules\n")
+
+    print(f"Top {top} packages by self time:")
+    for package, self_us in by_package(entries)[:top]:
+        print(f"  {self_us / 1000:8.1f} ms  {package}")
+
+    print(f"\nTop {top} imports by cumulative time (where the time is spent from):")
+    slowest = sorted(entries, key=lambda entry: entry[3], reverse=True)[:top]
+    for name, depth, _, cumulative_us in slowest:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {'  ' * depth}{name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("modules", nargs="*", default=["app"], help="Modules of src/ to import (default: app)")
+    parser.add_argument("--top", type=int, default=15, help="Rows per table")
+    args = parser.parse_args()
+    print_report(profile_imports(args.modules), args.top)
+
+
+if __name__ == "__main__":
+    main()
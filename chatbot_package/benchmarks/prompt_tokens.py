@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Prompt tokens per turn of a long session, with and without the rolling summary
+
+Replays one session with the offline mock LLM provider: every turn runs a
+query whose result goes into the history, then answers. The estimated tokens
+of each turn's first request are printed for both modes; with the summarizer
+they should stay roughly flat.
+
+    python benchmarks/prompt_tokens.py --turns 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+chatbot_root = Path(__file__).parent.parent
+sys.path.insert(0, str(chatbot_root / "src"))
+os.environ.setdefault("CHATBOT_DB_PATH", str(chatbot_root / "data" / "movies.db"))
+
+SCRIPT = [
+    {"tool_calls": [{"name": "run_sqlite_query", "arguments": {"sql_query": "SELECT * FROM movies LIMIT 15"}}]},
+    {"content": "The first movies are:\n{tool_result}"},
+]
+
+
+async def run_session(turns, summarize):
+    from bot import ChatBot
+    from conversation_store import ConversationStore
+    from encoder import estimate_tokens
+    from llm import MockProvider
+    from summarizer import Summarizer
+    from tools import tools_schema, run_sqlite_query
+
+    class RecordingProvider(MockProvider):
+        """Mock provider that records the estimated tokens of every chat request"""
+
+        def __init__(self):
+            super().__init__(script=SCRIPT)
+            self.prompt_tokens = []
+
+        async def stream(self, messages, tools=None):
+            self.prompt_tokens.append(estimate_tokens(json.dumps(messages)))
+            async for delta in super().stream(messages, tools):
+                yield delta
+
+    provider = RecordingProvider()
+    store = ConversationStore(os.path.join(tempfile.mkdtemp(), "conversations.db"))
+    bot = ChatBot("You are a data analysis expert.", tools_schema, {"run_sqlite_query": run_sqlite_query},
+                  provider=provider, store=store, summarizer=Summarizer(provider, store, enabled=summarize))
+
+    first_requests = []
+    for i in range(turns):
+        first_requests.append(len(provider.prompt_tokens))
+        async for _ in bot.stream(f"Question {i}: show me some movies"):
+            pass
+        while bot.last_message.tool_calls:
+            await bot.run_tools(bot.last_message.tool_calls)
+            async for _ in bot.stream():
+                pass
+        # the app does not wait for the summary; waiting here makes the runs repeatable
+        task = bot.summarize_later()
+        if task:
+            await task
+    return [provider.prompt_tokens[index] for index in first_requests]
+
+
+async def main(args):
+    from conversation_store import HISTORY_TOKEN_BUDGET
+
+    without = await run_session(args.turns, False)
+    with_summary = await run_session(args.turns, True)
+
+    print(f"History window: {HISTORY_TOKEN_BUDGET} tokens\n")
+    print(f"{'turn':>4} {'no summary':>11} {'summary':>8}")
+    for turn, (a, b) in enumerate(zip(without, with_summary), 1):
+        print(f"{turn:>4} {a:>11} {b:>8}")
+    print(f"\nMean prompt tokens: {sum(without) / len(without):.0f} without, "
+          f"{sum(with_summary) / len(with_summary):.0f} with the rolling summary")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt tokens per turn with and without the rolling summary")
+    parser.add_argument("--turns", type=int, default=20, help="Turns in the session")
+    asyncio.run(main(parser.parse_args()))
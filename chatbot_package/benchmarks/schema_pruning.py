@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Schema tokens per request with the whole schema vs the pruned, per-question schema
+
+Builds synthetic catalogs of growing size (tables x columns) and, for
+questions that each name one table and one of its columns, reports the
+estimated tokens of the full CREATE statements, of the pruned schema, how
+often the intended table and column were selected, and selection time.
+
+    python benchmarks/schema_pruning.py --tables 5 20 80 --columns 30
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from catalog import SchemaCatalog
+from encoder import estimate_tokens
+from schema_index import SchemaIndex
+
+SUBJECTS = ["orders", "customers", "invoices", "shipments", "products", "suppliers", "employees", "payments",
+            "returns", "campaigns", "tickets", "warehouses", "refunds", "subscriptions", "sessions", "reviews"]
+FIELDS = ["amount", "status", "region", "created_at", "discount", "quantity", "country", "channel", "priority",
+          "rating", "segment", "currency", "weight", "score", "category", "source", "margin", "tax", "duration"]
+
+
+def synthetic_catalog(table_count, column_count, rng):
+    tables = []
+    for t in range(table_count):
+        name = f"{SUBJECTS[t % len(SUBJECTS)]}_{t // len(SUBJECTS)}" if t >= len(SUBJECTS) else SUBJECTS[t]
+        fields = rng.sample(FIELDS, min(column_count - 1, len(FIELDS)))
+        fields += [f"attribute_{i}" for i in range(column_count - 1 - len(fields))]
+        columns = [{"name": "id", "type": "INTEGER"}] + [
+            {"name": f"{name.split('_')[0][:-1]}_{field}", "type": rng.choice(["TEXT", "REAL", "INTEGER"])}
+            for field in fields
+        ]
+        sql = f"CREATE TABLE {name} (" + ", ".join(f"{c['name']} {c['type']}" for c in columns) + ")"
+        tables.append({"name": name, "sql": sql, "row_count": 1000, "columns": columns, "sample_rows": []})
+    return SchemaCatalog(("synthetic", table_count, column_count), tables)
+
+
+def run(table_count, column_count, questions):
+    rng = random.Random(table_count)
+    catalog = synthetic_catalog(table_count, column_count, rng)
+    index = SchemaIndex(catalog)
+    full_tokens = estimate_tokens(catalog.table_info)
+    pruned_tokens = []
+    hits = 0
+    elapsed = 0.0
+    for _ in range(questions):
+        table = rng.choice(catalog.tables)
+        column = rng.choice(table["columns"][1:])
+        question = f"What is the average {column['name'].split('_', 1)[1].replace('_', ' ')} of {table['name']}?"
+        start = time.perf_counter()
+        selection = index.select(question)
+        elapsed += time.perf_counter() - start
+        pruned_tokens.append(estimate_tokens(index.render(question)))
+        selected = {t["name"]: [c["name"] for c in columns] for t, columns in selection}
+        hits += column["name"] in selected.get(table["name"], [])
+    return full_tokens, sum(pruned_tokens) / questions, hits / questions, elapsed / questions * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full vs pruned schema size for growing synthetic schemas")
+    parser.add_argument("--tables", type=int, nargs="+", default=[2, 10, 40, 160])
+    parser.add_argument("--columns", type=int, default=30, help="Columns per table")
+    parser.add_argument("--questions", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'tables':>6} {'full tokens':>12} {'pruned tokens':>14} {'recall':>7} {'select ms':>10}")
+    for table_count in args.tables:
+        full, pruned, recall, ms = run(table_count, args.columns, args.questions)
+        print(f"{table_count:>6} {full:>12} {pruned:>14.0f} {recall:>6.0%} {ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-token of streamed vs non-streamed ChatBot turns against the local fake Groq server
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+chatbot_root = Path(__file__).parent.parent
+sys.path.insert(0, str(chatbot_root / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fake_groq_server import serve
+
+
+async def answer_turn_bot(bot_class, tools_schema, tool_functions):
+    """Bot whose next completion is the answer to a finished tool call"""
+    bot = bot_class("You are a data analysis expert.", tools_schema, tool_functions)
+    await bot.add_user_message("How many tables are there?")
+    await bot.append_message({"role": "tool", "tool_call_id": "call_0", "name": "run_sqlite_query",
+                              "content": "| total |\n| --- |\n| 2 |"})
+    return bot
+
+
+async def measure(bot_class, tools_schema, tool_functions, turns):
+    non_streamed = []
+    streamed = []
+    for _ in range(turns):
+        bot = await answer_turn_bot(bot_class, tools_schema, tool_functions)
+        start = time.perf_counter()
+        await bot.execute()
+        non_streamed.append(time.perf_counter() - start)
+
+        bot = await answer_turn_bot(bot_class, tools_schema, tool_functions)
+        start = time.perf_counter()
+        first_token = None
+        async for _ in bot.stream():
+            if first_token is None:
+                first_token = time.perf_counter() - start
+        streamed.append((first_token, time.perf_counter() - start))
+
+    # A user turn streams back a tool call whose arguments arrive in fragments
+    bot = bot_class("You are a data analysis expert.", tools_schema, tool_functions)
+    async for _ in bot.stream("How many tables are there?"):
+        pass
+    tool_calls = bot.last_message.tool_calls
+    assert tool_calls and tool_calls[0].function.arguments.startswith("{"), "tool call was not reassembled"
+    return non_streamed, streamed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    server = serve(0, args.first_token_delay, args.token_delay)
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+
+    from bot import ChatBot
+    from tools import tools_schema, run_sqlite_query
+
+    tool_functions = {"run_sqlite_query": run_sqlite_query}
+    non_streamed, streamed = asyncio.run(measure(ChatBot, tools_schema, tool_functions, args.turns))
+    server.shutdown()
+
+    print(f"Non-streamed turn (first visible text): {sum(non_streamed) / len(non_streamed) * 1000:.0f} ms")
+    print(f"Streamed first token:                   {sum(t for t, _ in streamed) / len(streamed) * 1000:.0f} ms")
+    print(f"Streamed full answer:                   {sum(t for _, t in streamed) / len(streamed) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
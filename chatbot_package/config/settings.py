@@ -12,10 +12,85 @@ DATABASE_PATH = CHATBOT_ROOT / "data" / "movies.db"
 CUSTOM_DB_PATH = os.environ.get("CHATBOT_DB_PATH")
 if CUSTOM_DB_PATH:
     DATABASE_PATH = Path(CUSTOM_DB_PATH)
+# Per-user databases of the Django site, picked per chat session from a signed dataset token
+DB_PATH_TEMPLATE = os.environ.get("CHATBOT_DB_PATH_TEMPLATE", "/tmp/dataset_{user_id}.db")
+DATASET_SECRET = os.environ.get("CHATBOT_DATASET_SECRET")
+
+# SQLite connection pool settings
+SQLITE_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", "8"))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", "32768"))
+
+# Query executor settings
+SQLITE_MAX_WORKERS = int(os.environ.get("SQLITE_MAX_WORKERS", "4"))
+QUERY_TIMEOUT = float(os.environ.get("QUERY_TIMEOUT", "30"))
+RESULT_COUNT_CAP = int(os.environ.get("RESULT_COUNT_CAP", "100000"))
+
+# Query result rendering: markdown, csv or json
+TOOL_RESULT_FORMAT = os.environ.get("TOOL_RESULT_FORMAT", "markdown")
+TABLE_MAX_CELL_CHARS = int(os.environ.get("TABLE_MAX_CELL_CHARS", "80"))
+
+# Token budget for each tool result added to the conversation
+TOOL_RESULT_TOKEN_BUDGET = int(os.environ.get("TOOL_RESULT_TOKEN_BUDGET", "1500"))
+RESULT_PREVIEW_ROWS = int(os.environ.get("RESULT_PREVIEW_ROWS", "20"))
+
+# Query result cache settings
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "300"))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "256"))
+RESULT_CACHE_MAX_MB = float(os.environ.get("RESULT_CACHE_MAX_MB", "64"))
+
+# Chart store: figures built by plot_chart, displayed by the UI from memory
+CHART_STORE_MAX_ENTRIES = int(os.environ.get("CHART_STORE_MAX_ENTRIES", "64"))
+CHART_STORE_MAX_MB = float(os.environ.get("CHART_STORE_MAX_MB", "32"))
+
+# Conversation store: append-only history per session, shared by all workers
+CONVERSATION_DB_PATH = os.environ.get("CONVERSATION_DB_PATH", "/tmp/chatbot_conversations.db")
+CONVERSATION_TTL = float(os.environ.get("CONVERSATION_TTL", str(7 * 24 * 3600)))
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "3000"))
+HISTORY_MAX_MESSAGES = int(os.environ.get("HISTORY_MAX_MESSAGES", "40"))
+
+# Rolling summary of older turns, computed in the background after a turn
+SUMMARIZER = os.environ.get("SUMMARIZER", "1")
+SUMMARY_TRIGGER_TOKENS = int(os.environ.get("SUMMARY_TRIGGER_TOKENS", "1500"))
+SUMMARY_KEEP_TOKENS = int(os.environ.get("SUMMARY_KEEP_TOKENS", "500"))
+SUMMARY_MAX_TOKENS = int(os.environ.get("SUMMARY_MAX_TOKENS", "300"))
+
+# Schema pruning: large schemas send only the tables/columns relevant to the question
+SCHEMA_PRUNE_MIN_TOKENS = int(os.environ.get("SCHEMA_PRUNE_MIN_TOKENS", "1000"))
+SCHEMA_TOP_TABLES = int(os.environ.get("SCHEMA_TOP_TABLES", "3"))
+SCHEMA_TOP_COLUMNS = int(os.environ.get("SCHEMA_TOP_COLUMNS", "12"))
+
+# Answer cache: SQL of earlier answers replayed for the same or similar questions
+ANSWER_CACHE = os.environ.get("ANSWER_CACHE", "1")
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "256"))
+ANSWER_CACHE_MIN_SIMILARITY = float(os.environ.get("ANSWER_CACHE_MIN_SIMILARITY", "0.75"))
+
+# Index advisor: indexes recurring slow table scans of tool queries (writes to the dataset file)
+INDEX_ADVISOR = os.environ.get("INDEX_ADVISOR", "0")
+INDEX_ADVISOR_MIN_QUERIES = int(os.environ.get("INDEX_ADVISOR_MIN_QUERIES", "3"))
+INDEX_ADVISOR_MAX_INDEXES = int(os.environ.get("INDEX_ADVISOR_MAX_INDEXES", "4"))
+INDEX_ADVISOR_MIN_MS = float(os.environ.get("INDEX_ADVISOR_MIN_MS", "20"))
+
+# Answer simple GROUP BY queries from the rollup tables built at ingestion
+ROLLUPS = os.environ.get("ROLLUPS", "1")
+
+# Tool scheduling: concurrent calls per round and time budgets in seconds
+TOOL_MAX_CONCURRENCY = int(os.environ.get("TOOL_MAX_CONCURRENCY", "4"))
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", "45"))
+TOOL_TIMEOUTS = os.environ.get("TOOL_TIMEOUTS", "")  # e.g. "plot_chart=60,get_table_schema=10"
 
 # Groq API settings
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
-GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama3-8b-8192")
+GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama3-70b-8192")
+
+# LLM provider: groq or mock (offline, scripted)
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "groq")
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE = int(os.environ.get("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP2 = os.environ.get("LLM_HTTP2", "1") == "1"
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "60"))
 
 # Available models:
 # - llama3-8b-8192: Fast, good for most tasks
@@ -15,15 +15,16 @@ sys.path.insert(0, str(src_path))
 default_db_path = chatbot_root / "data" / "movies.db"
 os.environ.setdefault("CHATBOT_DB_PATH", str(default_db_path))
 
-def run_chatbot(port=8002):
+def run_chatbot(port=8002, headless=False):
     """Run the chatbot using Chainlit"""
     import subprocess
     app_path = src_path / "app.py"
+    command = ["chainlit", "run", str(app_path), "--port", str(port)]
+    if headless:
+        command.append("--headless")  # don't open a browser (supervised workers)
     
     try:
-        subprocess.run([
-            "chainlit", "run", str(app_path), "--port", str(port)
-        ], check=True)
+        subprocess.run(command, check=True)
     except subprocess.CalledProcessError as e:
         print(f"Error running chatbot: {e}")
         print("Make sure chainlit is installed: pip install -r requirements.txt")
@@ -34,6 +35,7 @@ if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Run the Data Analysis Chatbot")
     parser.add_argument("--port", type=int, default=8002, help="Port to run the chatbot on")
+    parser.add_argument("--headless", action="store_true", help="Don't open the chatbot in a browser")
     args = parser.parse_args()
     
-    run_chatbot(args.port)
+    run_chatbot(args.port, args.headless)
@@ -0,0 +1,163 @@
+"""
+Question-level cache that replays the SQL of earlier answers
+
+When a turn is answered with SQL queries, the queries are remembered under
+the normalized question and the dataset's schema. A later question that is
+the same or close enough (n-gram similarity of its content words, with the
+same numbers and the same direction, comparison and negation words, so
+"highest" never reuses the SQL of "lowest") replays those queries through
+run_sqlite_query, so the data is fresh, and the model only writes the
+answer: the planning rounds are skipped.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+try:
+    from .schema_index import terms
+except ImportError:
+    from schema_index import terms
+
+ANSWER_CACHE = os.environ.get("ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "256"))
+ANSWER_CACHE_MIN_SIMILARITY = float(os.environ.get("ANSWER_CACHE_MIN_SIMILARITY", "0.75"))
+SQL_TOOLS = ("run_sqlite_query", "query_db")
+
+STOPWORDS = frozenset(
+    "a all an and are as at be by can could do does find for from get give has have how i in is it list me my "
+    "of on or our please see show tell that the there to we what which who would you".split()
+)
+# words that flip the meaning of a query while changing little of its wording
+DIRECTION_TERMS = frozenset(
+    "asc ascending best biggest bottom cheapest decrease descending desc earliest fewest first greatest "
+    "highest increase largest last latest least longest lowest max maximum min minimum most newest oldest "
+    "shortest smallest top worst".split()
+)
+COMPARISON_TERMS = frozenset(
+    "above after before below between during equal fewer greater higher less lower more over since than "
+    "under until within".split()
+)
+NEGATION_TERMS = frozenset("except excluding never no non none not other without".split())
+GUARD_TERMS = DIRECTION_TERMS | COMPARISON_TERMS | NEGATION_TERMS
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+
+def content_terms(question):
+    """Question words that carry meaning, normalized (lowercase, singular)"""
+    return [term for term in terms(question.lower()) if term not in STOPWORDS]
+
+
+def features(question):
+    """Word unigrams and bigrams of the content words"""
+    words = content_terms(question)
+    return frozenset(words) | frozenset(zip(words, words[1:]))
+
+
+def guard_terms(question):
+    """Direction, comparison and negation words of the question; a fuzzy match must have the same ones"""
+    words = set(terms(question.lower())) & GUARD_TERMS
+    if "n't" in question.lower() or "n’t" in question.lower():
+        words.add("not")
+    return frozenset(words)
+
+
+def schema_key(catalog):
+    """Dataset key for cached answers: the same SQL stays valid as long as the schema is the same"""
+    return (catalog.version[0], hashlib.sha256(catalog.table_info.encode()).hexdigest()[:16])
+
+
+class CachedAnswer:
+    def __init__(self, question, tool_calls):
+        self.question = question
+        self.tool_calls = tool_calls  # [(tool name, arguments JSON), ...]
+        self.features = features(question)
+        self.numbers = _NUMBER_PATTERN.findall(question)
+        self.guards = guard_terms(question)
+        self.hits = 0
+
+
+class AnswerCache:
+    """Thread-safe LRU of question -> SQL tool calls, with exact and fuzzy lookup"""
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES, min_similarity=ANSWER_CACHE_MIN_SIMILARITY):
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        self._entries = OrderedDict()  # (dataset key, normalized question) -> CachedAnswer
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(dataset, question):
+        return (dataset, " ".join(content_terms(question)))
+
+    def lookup(self, dataset, question):
+        """Best cached answer for the question on this dataset, or None"""
+        key = self._key(dataset, question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.exact_hits += 1
+            else:
+                entry, similarity = self._closest(dataset, question)
+                if entry is None:
+                    self.misses += 1
+                    return None
+                self.fuzzy_hits += 1
+                logging.info(f"Answer cache: '{question}' matched '{entry.question}' ({similarity:.2f})")
+                key = self._key(dataset, entry.question)
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            return entry
+
+    def _closest(self, dataset, question):
+        wanted = features(question)
+        numbers = _NUMBER_PATTERN.findall(question)
+        guards = guard_terms(question)
+        best, best_similarity = None, self.min_similarity
+        for (entry_dataset, _), entry in self._entries.items():
+            # "top 5" and "top 10", or "highest" and "lowest", need different queries
+            if entry_dataset != dataset or entry.numbers != numbers or entry.guards != guards:
+                continue
+            union = len(wanted | entry.features)
+            similarity = len(wanted & entry.features) / union if union else 0.0
+            if similarity >= best_similarity:
+                best, best_similarity = entry, similarity
+        return best, best_similarity
+
+    def store(self, dataset, question, tool_calls):
+        """Remember the SQL tool calls (name, arguments JSON) that answered the question"""
+        key = self._key(dataset, question)
+        if not tool_calls or not key[1]:
+            return
+        with self._lock:
+            self._entries[key] = CachedAnswer(question, list(tool_calls))
+            self._entries.move_to_end(key)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            hits = self.exact_hits + self.fuzzy_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "lookups": lookups,
+                "exact_hits": self.exact_hits,
+                "fuzzy_hits": self.fuzzy_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+
+answer_cache = AnswerCache()
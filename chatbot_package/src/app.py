@@ -1,8 +1,10 @@
+import asyncio
 import chainlit as cl
 from dotenv import load_dotenv
 import logging
 import os
 from pathlib import Path
+from urllib.parse import parse_qs, urlparse
 
 # Load environment variables from .env file in the chatbot package root
 # Get the chatbot package root directory (1 level up from this file)
@@ -23,18 +25,25 @@ MAX_ITERATIONS = int(os.environ.get("MAX_ITERATIONS", "5"))
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
 LOG_FILE = chatbot_root / "chatbot.log"
 
-# Verify API key is loaded
-if not GROQ_API_KEY:
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "groq")
+
+# Verify API key is loaded (the offline mock provider doesn't need one)
+if LLM_PROVIDER != "groq":
+    print(f"✅ Using {LLM_PROVIDER} LLM provider")
+elif not GROQ_API_KEY:
     print("❌ GROQ_API_KEY not found in environment variables")
     print("Make sure .env file exists in the project root with GROQ_API_KEY=your_key")
     raise ValueError("GROQ_API_KEY environment variable is required")
 else:
     print(f"✅ GROQ_API_KEY loaded successfully (key: {GROQ_API_KEY[:10]}...)")
 
-from plotly.graph_objs import Figure
-
-from utils import generate_sqlite_table_info_query, format_table_info
-from tools import tools_schema, run_sqlite_query, plot_chart
+from tools import tools_schema, run_sqlite_query, plot_chart, get_table_schema, chart_store
+from chart_store import find_chart_keys
+from catalog import get_catalog
+from prompts import prompt_prefix
+from schema_index import needs_pruning, schema_index
+from answer_cache import schema_key
+from db import DatabaseNotFoundError, db_path_for_token, use_session_db
 from bot import ChatBot
 
 # Configure logging
@@ -44,65 +53,99 @@ logging.basicConfig(filename=LOG_FILE, level=getattr(logging, LOG_LEVEL),
 logger = logging.getLogger()
 logger.addHandler(logging.FileHandler(LOG_FILE))
 
-schema_table_pairs = []
-
 tool_run_sqlite_query = cl.step(type="tool", show_input="json", language="str")(run_sqlite_query)
 tool_plot_chart = cl.step(type="tool", show_input="json", language="json")(plot_chart)
-original_run_sqlite_query = tool_run_sqlite_query.__wrapped__
+tool_get_table_schema = cl.step(type="tool", show_input="json", language="str")(get_table_schema)
 # cl.instrument_openai() 
 # for automatic steps
 
-@cl.on_chat_start
-async def on_chat_start():
-    # build schema query
-    table_info_query = generate_sqlite_table_info_query(schema_table_pairs)
-
-    # execute query
-    result, column_names = await original_run_sqlite_query(table_info_query, markdown=False)
-
-    # format result into string to be used in prompt
-    # table_info = format_table_info(result, column_names)
-    table_info = '\n'.join([item[0] for item in result])
-
-    system_message = f"""You are a data analysis expert. Help users analyze data from the database by writing SQL queries and creating visualizations.
+def session_db_path():
+    """The uploader's database, from the signed dataset token in the chat page URL (None: the default)"""
+    referer = getattr(cl.context.session, "http_referer", None) or ""
+    token = parse_qs(urlparse(referer).query).get("dataset", [None])[0]
+    return db_path_for_token(token) if token else None
 
-CRITICAL WORKFLOW:
-1. ALWAYS call query_db FIRST to get actual data from the database
-2. ONLY call plot_chart AFTER you have real data from query_db
-3. Extract actual values from the query results to use in plot_chart
 
-RULES:
-- NEVER use placeholder or example data in plot_chart
-- ALWAYS use real data from query_db results
-- For charts: extract x_values (categories) and y_values (numbers) from query results
-- Keep responses business-friendly (no technical SQL details)
-- Limit results to 5-10 items for clarity
-- Choose appropriate chart types: bar (comparisons), pie (distributions), line (trends)
+@cl.on_chat_start
+async def on_chat_start():
+    # every tool call of this session queries the database of the user who opened the chat
+    db_path = session_db_path()
+    cl.user_session.set("db_path", db_path)
+    use_session_db(db_path)
 
-Database schema:
-{table_info}"""
+    # rules + schema are rendered once per dataset version and shared across sessions
+    try:
+        catalog = await get_catalog()
+    except DatabaseNotFoundError:
+        catalog = None
+    system_message = prompt_prefix(catalog).text
+    # large schemas: only the tables/columns relevant to each question are sent
+    schema = schema_index(catalog) if needs_pruning(catalog) else None
+    dataset = schema_key(catalog) if catalog is not None else None
 
     # print(system_message)
     
+    # keys must match the tool names in tools_schema; query_db is the name used in the prompt
     tool_functions = {
         "query_db": tool_run_sqlite_query,
+        "run_sqlite_query": tool_run_sqlite_query,
+        "get_table_schema": tool_get_table_schema,
 	    "plot_chart": tool_plot_chart
     }
 
-    cl.user_session.set("bot", ChatBot(system_message, tools_schema, tool_functions))
+    # history is kept in the conversation store under the Chainlit session id,
+    # so a session that moved here from another worker continues its conversation
+    bot = ChatBot(system_message, tools_schema, tool_functions, session_id=cl.user_session.get("id"),
+                  schema=schema, dataset=dataset)
+    cl.user_session.set("bot", bot)
+
+
+def cancel_running_turn():
+    """Cancel the session's in-flight turn (LLM stream and tool calls), if any"""
+    bot = cl.user_session.get("bot")
+    if bot:
+        bot.cancel()
+    task = cl.user_session.get("turn_task")
+    if task and not task.done() and task is not asyncio.current_task():
+        task.cancel()
+        print("🛑 Cancelled the previous turn")
+
+
+@cl.on_stop
+async def on_stop():
+    cancel_running_turn()
 
 
 @cl.on_message
 async def on_message(message: cl.Message):
     bot = cl.user_session.get("bot")
+    use_session_db(cl.user_session.get("db_path"))
+
+    # a new message supersedes whatever the previous one is still doing
+    cancel_running_turn()
+    cl.user_session.set("turn_task", asyncio.current_task())
+
+    timeline = bot.start_turn()
+    try:
+        await run_turn(bot, message)
+        bot.remember_answer()
+    except asyncio.CancelledError:
+        print("🛑 Turn cancelled")
+        raise
+    finally:
+        timeline.log()
+        bot.summarize_later()
+
 
+async def run_turn(bot, message):
     msg = cl.Message(author="Assistant", content="")
     await msg.send()
 
-    # step 1: user request and first response from the bot
+    # step 1: user request and first response from the bot, streamed token by token
     try:
-        response_message = await bot(message.content)
-        msg.content = response_message.content or ""
+        async for token in bot.stream(message.content):
+            await msg.stream_token(token)
+        response_message = bot.last_message
         
         # pending message to be sent
         if len(msg.content)>0:
@@ -117,40 +160,45 @@ async def on_message(message: cl.Message):
     # step 2: check tool_calls - as long as there are tool calls and it doesn't cross MAX_ITER count, call iteratively
     cur_iter = 0
     tool_calls = response_message.tool_calls
-    print(f"🐛 DEBUG: Initial tool_calls: {tool_calls}")
+    logging.debug(f"Initial tool_calls: {tool_calls}")
     while cur_iter <= MAX_ITERATIONS:
 
         # if tool_calls:
         if tool_calls:
-            print(f"🐛 DEBUG: Processing {len(tool_calls)} tool calls")
-            bot.messages.append(response_message) # add tool call to messages before calling executing function calls
+            logging.debug(f"Processing {len(tool_calls)} tool calls")
+            # the streamed tool call message is already in the conversation store
             try:
-                response_message, function_responses = await bot.call_functions(tool_calls)
+                function_responses = await bot.run_tools(tool_calls)
             except Exception as e:
                 print(f"❌ Error in function calls: {e}")
                 await cl.Message(author="Assistant", content=f"Error executing tools: {str(e)}").send()
                 break
 
-            # response_message is response after completing function calls and sending it back to the bot
-            if response_message.content and len(response_message.content)>0:
-                await cl.Message(author="Assistant", content=response_message.content).send()
+            # stream the response after completing function calls and sending it back to the bot
+            reply = cl.Message(author="Assistant", content="")
+            async for token in bot.stream():
+                await reply.stream_token(token)
+            response_message = bot.last_message
+            if len(reply.content)>0:
+                await reply.send()
 
             # reassign tool_calls from new response
             tool_calls = response_message.tool_calls
 
             # some responses like charts should be displayed explicitly
             function_responses_to_display = [res for res in function_responses if res['name'] in bot.exclude_functions]
-            print(f"🐛 DEBUG: function_responses_to_display: {function_responses_to_display}")
+            logging.debug(f"function_responses_to_display: {function_responses_to_display}")
             for function_res in function_responses_to_display:
-                print(f"🐛 DEBUG: Processing function response: {function_res['name']}")
-                print(f"🐛 DEBUG: Content type: {type(function_res['content'])}")
-                print(f"🐛 DEBUG: Is Figure? {isinstance(function_res['content'], Figure)}")
-                # plot chart
-                if isinstance(function_res["content"], Figure):
-                    chart = cl.Plotly(name="chart", figure=function_res['content'], display="inline")
+                logging.debug(f"Processing function response: {function_res['name']}")
+                logging.debug(f"Content type: {type(function_res['content'])}")
+                # plot chart: the tool result carries the key of the figure in the chart store
+                for key in find_chart_keys(function_res["content"]):
+                    figure = chart_store.figure(key)
+                    if figure is None:
+                        print(f"⚠️ Chart {key} is no longer in the chart store")
+                        continue
+                    chart = cl.Plotly(name="chart", figure=figure, display="inline")
                     await cl.Message(author="Assistant", content="", elements=[chart]).send()
-                else:
-                    print(f"🐛 DEBUG: Content is not a Figure, it's: {function_res['content']}")
         else:
             break
         cur_iter += 1
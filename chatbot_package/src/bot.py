@@ -2,12 +2,12 @@ import asyncio
 import logging
 import os
 import json
+import uuid
+from contextlib import nullcontext
 from pathlib import Path
+from types import SimpleNamespace
 from dotenv import load_dotenv
 
-import httpx
-from groq import AsyncGroq
-
 # Load environment variables if not already loaded
 if not os.environ.get("GROQ_API_KEY"):
     # Try to load from chatbot package root
@@ -20,74 +20,159 @@ if not os.environ.get("GROQ_API_KEY"):
 
 logging.info(f"User message")
 
-model = "llama3-70b-8192"  # Use regular model without tool-use-preview
-api_key = os.environ.get("GROQ_API_KEY")
-
-if not api_key:
-    raise ValueError("GROQ_API_KEY environment variable is required")
-
-# Configure Groq client
-client = AsyncGroq(api_key=api_key)
+# Imported after .env is loaded so provider settings (LLM_PROVIDER, GROQ_MODEL, ...) apply
+try:
+    from .encoder import fit_to_budget, TOOL_RESULT_TOKEN_BUDGET
+    from .llm import StreamedFunction, StreamedMessage, get_provider
+    from .scheduler import ToolScheduler, TurnTimeline, error_response
+    from .conversation_store import conversation_store
+    from .summarizer import Summarizer
+    from .prompts import prompt_log
+    from .answer_cache import ANSWER_CACHE, SQL_TOOLS, answer_cache
+except ImportError:
+    from encoder import fit_to_budget, TOOL_RESULT_TOKEN_BUDGET
+    from llm import StreamedFunction, StreamedMessage, get_provider
+    from scheduler import ToolScheduler, TurnTimeline, error_response
+    from conversation_store import conversation_store
+    from summarizer import Summarizer
+    from prompts import prompt_log
+    from answer_cache import ANSWER_CACHE, SQL_TOOLS, answer_cache
 
 # Main chatbot class
 class ChatBot:
-    def __init__(self, system, tools, tool_functions):
+    def __init__(self, system, tools, tool_functions, tool_token_budget=TOOL_RESULT_TOKEN_BUDGET, provider=None,
+                 session_id=None, store=conversation_store, summarizer=None, schema=None, dataset=None,
+                 answer_cache=answer_cache):
         self.system = system
+        self.provider = provider or get_provider()
         self.tools = tools
         self.exclude_functions = ["plot_chart"]
         self.tool_functions = tool_functions
-        self.messages = []
-        self.max_messages = 4  # Reduced to save tokens - only keep last 2 exchanges
-        if self.system:
-            self.messages.append({"role": "system", "content": system})
+        self.tool_token_budget = tool_token_budget
+        self.scheduler = ToolScheduler()
+        self.timeline = None
+        # The conversation lives in the store; a session id seen before continues its history
+        self.session_id = session_id or uuid.uuid4().hex
+        self.store = store
+        self.summarizer = summarizer or Summarizer(self.provider, store)
+        self.schema = schema  # SchemaIndex when only the relevant part of a large schema is sent
+        # answers are cached per dataset (see answer_cache.schema_key); no dataset, no cache
+        self.dataset = dataset
+        self.answer_cache = answer_cache if ANSWER_CACHE and dataset is not None else None
+        self.question = None
+        self.turn_queries = []  # (tool name, arguments) of this turn's successful SQL tool calls
+
+    def _load_history(self):
+        upto_seq, summary = self.store.summary(self.session_id)
+        return summary, self.store.window(self.session_id, after_seq=upto_seq)
+
+    async def prompt_messages(self):
+        """Messages for the next completion: system prompt, summary of older turns,
+        schema relevant to the latest question, recent history.
+
+        The system prompt is the stable prefix shared by all sessions (see
+        prompts.py); everything session-specific comes after it. The store is
+        read in a worker thread, off the event loop.
+        """
+        messages = [{"role": "system", "content": self.system}] if self.system else []
+        summary, history = await asyncio.to_thread(self._load_history)
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        if self.schema is not None:
+            questions = [message["content"] for message in history if message.get("role") == "user"]
+            # the previous question too, so short follow-ups keep their tables
+            messages.append(self.schema.message("\n".join(questions[-2:])))
+        return messages + history
+
+    def summarize_later(self):
+        """Refresh the rolling summary in the background once the turn is done"""
+        return self.summarizer.schedule(self.session_id)
+
+    async def append_message(self, *messages):
+        """Write messages to the store in a worker thread (the write can wait on the file lock)"""
+        await asyncio.to_thread(self.store.append, self.session_id, list(messages))
+
+    async def add_user_message(self, message):
+        self.question = message
+        self.turn_queries = []
+        await self.append_message({"role": "user", "content": f"""{message}"""})
+
+    async def replay_cached_answer(self):
+        """Run the SQL that answered a similar question before, so the model only writes the answer"""
+        if self.answer_cache is None:
+            return False
+        entry = self.answer_cache.lookup(self.dataset, self.question)
+        if entry is None:
+            return False
+        replay = StreamedMessage()
+        for index, (name, arguments) in enumerate(entry.tool_calls):
+            replay.add_tool_call_fragment(SimpleNamespace(
+                index=index, id=f"cached_{uuid.uuid4().hex[:12]}", function=StreamedFunction(name, arguments),
+            ))
+        hit_rate = self.answer_cache.stats()["hit_rate"]
+        print(f"♻️ Replaying {len(entry.tool_calls)} cached queries of '{entry.question}' (hit rate {hit_rate:.0%})")
+        await self.append_message(replay.to_dict())
+        await self.run_tools(replay.tool_calls)
+        return True
+
+    def remember_answer(self, message=None):
+        """Cache the turn's SQL for similar questions, once the turn ended in an answer"""
+        message = message or getattr(self, "last_message", None)
+        if self.answer_cache is None or not self.turn_queries or message is None:
+            return
+        if message.tool_calls or not message.content:
+            return
+        self.answer_cache.store(self.dataset, self.question, self.turn_queries)
+
+    def start_turn(self):
+        """Start recording a new per-turn timeline (LLM wait vs tool time)"""
+        self.timeline = TurnTimeline()
+        return self.timeline
+
+    def cancel(self):
+        """Cancel tool calls still running for this session"""
+        self.scheduler.cancel()
+
+    def _span(self, kind, name):
+        return self.timeline.span(kind, name) if self.timeline else nullcontext()
 
     async def __call__(self, message):
-        self.messages.append({"role": "user", "content": f"""{message}"""})
-        
-        # Keep only the last max_messages to save tokens
-        if len(self.messages) > self.max_messages:
-            # Always keep system message and only the most recent exchange
-            system_msg = self.messages[0] if self.messages[0]["role"] == "system" else None
-            recent_messages = self.messages[-(self.max_messages-1):]
-            self.messages = [system_msg] + recent_messages if system_msg else recent_messages
-            print(f"🔧 Trimmed conversation history to {len(self.messages)} messages to save tokens")
+        await self.add_user_message(message)
+        await self.replay_cached_answer()
         
         response_message = await self.execute()
         
         # Handle tool calls if present
         if hasattr(response_message, 'tool_calls') and response_message.tool_calls:
             print(f"🔧 Processing {len(response_message.tool_calls)} tool calls...")
+            await self.append_message(response_message)  # tool results must follow the assistant tool call message
             response_message, function_responses = await self.call_functions(response_message.tool_calls)
             print(f"✅ Tool calls completed, final response: {response_message.content[:200] if response_message.content else 'No content'}...")
         
         # Add assistant response to conversation if it has content
         if response_message.content:
-            self.messages.append({"role": "assistant", "content": response_message.content})
+            await self.append_message({"role": "assistant", "content": response_message.content})
 
         logging.info(f"User message: {message}")
         logging.info(f"Assistant response: {response_message.content}")
+        self.remember_answer(response_message)
+        self.summarize_later()
 
         return response_message
 
     async def execute(self):
         try:
-            # Use Groq's chat completion API (OpenAI-compatible)
-            completion = await client.chat.completions.create(
-                model=model,
-                messages=self.messages,
-                tools=self.tools if self.tools else None,
-                tool_choice="auto" if self.tools else None,
-                temperature=0.1,  # Lower temperature for more consistent function calling
-                max_tokens=4000   # Ensure enough tokens for responses
-            )
-            
-            assistant_message = completion.choices[0].message
-            print(f"🐛 DEBUG: Assistant message: {assistant_message}")
-            print(f"🐛 DEBUG: Tool calls: {assistant_message.tool_calls}")
+            # Chat completion through the configured provider (OpenAI-compatible messages)
+            messages = await self.prompt_messages()
+            prompt_log.record(messages)
+            with self._span("llm", self.provider.name):
+                assistant_message = await self.provider.complete(messages, self.tools)
+            logging.debug(f"Assistant message: {assistant_message}")
+            logging.debug(f"Tool calls: {assistant_message.tool_calls}")
             return assistant_message
                 
         except Exception as e:
-            logging.error(f"Error in Groq API call: {e}")
+            logging.error(f"Error in {self.provider.name} API call: {e}")
             print(f"❌ Full error details: {e}")
             
             # Create a response object similar to OpenAI's format
@@ -98,8 +183,43 @@ class ChatBot:
             
             return AssistantMessage(f"I encountered an error with the API. Let me try to help you differently. Could you please rephrase your request?")
 
+    async def stream(self, message=None):
+        """Stream the next assistant turn, yielding text deltas as they arrive.
+
+        Tool call fragments are reassembled; the complete message is appended
+        to the conversation and left in self.last_message for the caller.
+        """
+        if message is not None:
+            await self.add_user_message(message)
+            await self.replay_cached_answer()
+
+        response_message = StreamedMessage()
+        self.last_message = response_message
+        try:
+            messages = await self.prompt_messages()
+            prompt_log.record(messages)
+            with self._span("llm", self.provider.name):
+                async for delta in self.provider.stream(messages, self.tools):
+                    response_message.add_delta(delta)
+                    if delta.content:
+                        yield delta.content
+        except Exception as e:
+            logging.error(f"Error in {self.provider.name} streaming API call: {e}")
+            print(f"❌ Full error details: {e}")
+            error_text = "I encountered an error with the API. Let me try to help you differently. Could you please rephrase your request?"
+            response_message.add_content(error_text)
+            yield error_text
+            return
+
+        if response_message.content or response_message.tool_calls:
+            await self.append_message(response_message.to_dict())
+        logging.info(f"Assistant response (streamed): {response_message.content}")
+
     async def call_function(self, tool_call):
         function_name = tool_call.function.name
+        if function_name not in self.tool_functions:
+            logging.error(f"Model called unknown tool: {function_name}")
+            return error_response(tool_call, f"Error: unknown tool '{function_name}'. Available tools: {', '.join(self.tool_functions)}")
         function_to_call = self.tool_functions[function_name]
         
         # Handle Groq function call arguments (should be JSON string)
@@ -123,20 +243,36 @@ class ChatBot:
         }
 
     async def call_functions(self, tool_calls):
+        function_responses = await self.run_tools(tool_calls)
+        response_message = await self.execute()
+        return response_message, function_responses
 
-        # Use asyncio.gather to make function calls in parallel
-        function_responses = await asyncio.gather(
-            *(self.call_function(tool_call) for tool_call in tool_calls)
-            )
+    async def run_tools(self, tool_calls):
+        """Run tool calls and add their results to the conversation"""
+
+        # Independent calls run concurrently, bounded and with per-tool time budgets
+        try:
+            function_responses = await self.scheduler.run(tool_calls, self.call_function, self.timeline)
+        except asyncio.CancelledError:
+            # keep the history valid: every tool call message needs its tool results
+            await self.append_message(*(error_response(tool_call, "Cancelled: the user sent a new message.") for tool_call in tool_calls))
+            raise
 
-        # Extend conversation with all function responses
-        responses_in_str = [{**item, "content": str(item["content"])} for item in function_responses]
+        # Extend conversation with all function responses, each fitted to the token budget
+        responses_in_str = [
+            {**item, "content": fit_to_budget(str(item["content"]), self.tool_token_budget)}
+            for item in function_responses
+        ]
 
         # Log each tool call object separately
         for res in function_responses:
             logging.info(f"Tool Call: {res}")
 
-        self.messages.extend(responses_in_str)
+        # successful queries can answer a similar question later
+        arguments = {tool_call.id: tool_call.function.arguments for tool_call in tool_calls}
+        for res in function_responses:
+            if res["name"] in SQL_TOOLS and not str(res["content"]).startswith(("Error", "Cancelled")):
+                self.turn_queries.append((res["name"], arguments.get(res["tool_call_id"]) or "{}"))
 
-        response_message = await self.execute()
-        return response_message, function_responses
+        await self.append_message(*responses_in_str)
+        return function_responses
@@ -0,0 +1,131 @@
+"""
+In-memory LRU + TTL cache for query results
+"""
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+_WHITESPACE = re.compile(r"\s+")
+_PUNCTUATION_SPACING = re.compile(r"\s*([(),=<>+\-*/])\s*")
+
+
+def normalize_sql(sql_query):
+    """Canonical form of a query so near-identical SQL shares a cache entry.
+
+    Whitespace is collapsed, trailing semicolons are dropped and everything
+    outside quotes is lower-cased (SQLite keywords and identifiers are
+    case-insensitive). Double-quoted text is kept as written like string
+    literals: SQLite reads "Drama" as a string when no column has that name.
+    """
+    parts = _QUOTED.split(sql_query.strip().rstrip(";").strip())
+    for i in range(0, len(parts), 2):
+        part = _WHITESPACE.sub(" ", parts[i].lower())
+        parts[i] = _PUNCTUATION_SPACING.sub(r"\1", part)
+    return "".join(parts).strip()
+
+
+def estimate_rows_size(rows, sample_size=50):
+    """Approximate memory footprint of a list of row tuples in bytes"""
+    if not rows:
+        return sys.getsizeof(rows)
+    sample = rows[:sample_size]
+    sample_bytes = sum(sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in sample)
+    return sys.getsizeof(rows) + sample_bytes * len(rows) // len(sample)
+
+
+class ResultCache:
+    """Thread-safe LRU cache with per-entry TTL and a total size bound.
+
+    Keys start with the dataset version tuple (path first), so entries for a
+    changed dataset never match and are purged by check_version().
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._versions = {}  # dataset path -> last seen version
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, record=True):
+        """Look up a live entry; record=False leaves hit/miss counting to the caller"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                if record:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if record:
+                self.hits += 1
+            return entry[2]
+
+    def record(self, hit):
+        """Count one lookup that was resolved through several keys"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key, value, size):
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+        return True
+
+    def check_version(self, version):
+        """Drop every entry of a dataset whose file identity has changed"""
+        path = version[0]
+        with self._lock:
+            previous = self._versions.get(path)
+            self._versions[path] = version
+            if previous is None or previous == version:
+                return
+            stale = [key for key in self._entries if key[0][0] == path and key[0] != version]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.total_bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,184 @@
+"""
+Precomputed schema/profile snapshot of the dataset database
+"""
+import asyncio
+import json
+import logging
+import os
+
+try:
+    from .db import get_db_path, dataset_version
+    from .executor import run_db, get_executor
+    from .rollups import ROLLUP_TABLE_PREFIX
+except ImportError:
+    from db import get_db_path, dataset_version
+    from executor import run_db, get_executor
+    from rollups import ROLLUP_TABLE_PREFIX
+
+CATALOG_FORMAT = 1
+SAMPLE_ROWS = 3
+SIDECAR_SUFFIX = ".catalog.json"
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _build_tables(connection):
+    """Read schema, column stats and sample rows of every table; runs in the executor"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+    tables = []
+    for table_name, create_sql in cursor.fetchall():
+        if table_name.startswith(ROLLUP_TABLE_PREFIX):
+            continue  # internal pre-aggregates, not part of the schema shown to the model
+        cursor.execute(f"PRAGMA table_info({_quote(table_name)})")
+        columns = [{"name": info[1], "type": info[2]} for info in cursor.fetchall()]
+
+        # One scan per table for all column stats
+        aggregates = ["COUNT(*)"]
+        for column in columns:
+            name = _quote(column["name"])
+            aggregates += [f"COUNT({name})", f"COUNT(DISTINCT {name})", f"MIN({name})", f"MAX({name})"]
+        cursor.execute(f"SELECT {', '.join(aggregates)} FROM {_quote(table_name)}")
+        stats = cursor.fetchone()
+        for i, column in enumerate(columns):
+            non_null, distinct, min_value, max_value = stats[1 + 4 * i: 5 + 4 * i]
+            column.update(non_null=non_null, distinct=distinct, min=min_value, max=max_value)
+
+        cursor.execute(f"SELECT * FROM {_quote(table_name)} LIMIT {SAMPLE_ROWS}")
+        sample_rows = [list(row) for row in cursor.fetchall()]
+
+        tables.append({
+            "name": table_name,
+            "sql": create_sql,
+            "row_count": stats[0],
+            "columns": columns,
+            "sample_rows": sample_rows,
+        })
+    return tables
+
+
+def _json_safe(value):
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    return value
+
+
+class SchemaCatalog:
+    """Schema text, column stats and sample rows for one dataset version"""
+
+    def __init__(self, version, tables):
+        self.version = tuple(version)
+        self.tables = tables
+        self.table_info = "\n".join(table["sql"] for table in tables if table["sql"])
+        self.schema_text = self._render_schema_text()
+
+    def table(self, name):
+        for table in self.tables:
+            if table["name"] == name:
+                return table
+        return None
+
+    def _render_schema_text(self):
+        """Markdown description of main_table returned by get_table_schema"""
+        table = self.table("main_table")
+        if table is None:
+            return None
+
+        lines = ["## Dataset Schema", "", "**Table:** main_table", "", "**Columns:**"]
+        for column in table["columns"]:
+            line = f"- `{column['name']}` ({column['type']})"
+            if column["non_null"]:
+                line += f" - {column['distinct']} distinct"
+                if isinstance(column["min"], (int, float)) and column["min"] != column["max"]:
+                    line += f", range {column['min']} to {column['max']}"
+            lines.append(line)
+
+        lines += ["", f"**Sample Data (first {SAMPLE_ROWS} rows):**"]
+        names = [column["name"] for column in table["columns"]]
+        for i, row in enumerate(table["sample_rows"]):
+            values = ", ".join(f"{name}={value}" for name, value in zip(names, row))
+            lines.append(f"Row {i+1}: {values}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        tables = [
+            {
+                **table,
+                "columns": [{key: _json_safe(value) for key, value in column.items()} for column in table["columns"]],
+                "sample_rows": [[_json_safe(value) for value in row] for row in table["sample_rows"]],
+            }
+            for table in self.tables
+        ]
+        return {"format": CATALOG_FORMAT, "version": list(self.version[1:]), "tables": tables}
+
+    @classmethod
+    def from_dict(cls, data, version):
+        if data.get("format") != CATALOG_FORMAT or tuple(data.get("version", ())) != tuple(version[1:]):
+            return None
+        return cls(version, data["tables"])
+
+
+def sidecar_path(db_path):
+    return db_path + SIDECAR_SUFFIX
+
+
+def _load_sidecar(db_path, version):
+    try:
+        with open(sidecar_path(db_path)) as f:
+            return SchemaCatalog.from_dict(json.load(f), version)
+    except (OSError, ValueError, KeyError) as error:
+        if not isinstance(error, FileNotFoundError):
+            logging.warning(f"Ignoring unreadable schema catalog for {db_path}: {error}")
+        return None
+
+
+def _save_sidecar(db_path, catalog):
+    path = sidecar_path(db_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(catalog.to_dict(), f, separators=(",", ":"), default=str)
+        os.replace(tmp_path, path)
+    except OSError as error:
+        # The dataset directory may be read-only; the in-memory copy still works
+        logging.warning(f"Could not write schema catalog next to {db_path}: {error}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+_catalogs = {}  # db_path -> SchemaCatalog
+_build_locks = {}  # db_path -> asyncio.Lock
+
+
+async def get_catalog(db_path=None):
+    """Schema catalog for the current dataset version.
+
+    Served from memory, then from the sidecar file next to the database, and
+    only built from the database when the dataset changed. The sidecar is
+    read and written on the database executor, off the event loop.
+    """
+    db_path = db_path or get_db_path()
+    version = dataset_version(db_path)
+    catalog = _catalogs.get(db_path)
+    if catalog is not None and catalog.version == version:
+        return catalog
+
+    lock = _build_locks.setdefault(db_path, asyncio.Lock())
+    async with lock:
+        catalog = _catalogs.get(db_path)
+        if catalog is not None and catalog.version == version:
+            return catalog
+
+        loop = asyncio.get_running_loop()
+        catalog = await loop.run_in_executor(get_executor(), _load_sidecar, db_path, version)
+        if catalog is None:
+            logging.info(f"Building schema catalog for {db_path}")
+            tables = await run_db(_build_tables, db_path=db_path, version=version, timeout=0)
+            catalog = SchemaCatalog(version, tables)
+            await loop.run_in_executor(get_executor(), _save_sidecar, db_path, catalog)
+        _catalogs[db_path] = catalog
+        return catalog
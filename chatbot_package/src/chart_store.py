@@ -0,0 +1,92 @@
+"""
+Content-addressed in-memory store for chart figures
+
+plot_chart stores each figure as compact Plotly JSON under a key derived
+from (dataset version, normalized SQL, plot parameters), so the same chart
+requested again is served without rebuilding it. The key is returned to the
+model in the tool result ("chart:<key>") and the UI loads the figure from
+here to display it.
+"""
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+CHART_KEY_PREFIX = "chart:"
+_CHART_KEY_RE = re.compile(rf"{CHART_KEY_PREFIX}([0-9a-f]{{32}})")
+
+
+def chart_key(version, sql_key, params):
+    """Stable key of a chart: unlike hash(), sha256 is the same in every process"""
+    payload = json.dumps([list(version), sql_key, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def find_chart_keys(text):
+    """Chart keys mentioned in a tool result"""
+    return _CHART_KEY_RE.findall(text) if isinstance(text, str) else []
+
+
+class ChartStore:
+    """Thread-safe LRU of figure JSON bounded by entry count and total size"""
+
+    def __init__(self, max_entries=64, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (figure_json, summary)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """(figure_json, summary) of a stored chart, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, figure_json, summary):
+        size = len(figure_json)
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (figure_json, summary)
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def figure(self, key):
+        """Plotly Figure of a stored chart, or None when it was evicted"""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        import plotly.io as pio  # only loaded once there is a chart to show
+
+        return pio.from_json(entry[0])
+
+    def _remove(self, key):
+        figure_json, _ = self._entries.pop(key)
+        self.total_bytes -= len(figure_json)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
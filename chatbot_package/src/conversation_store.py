@@ -0,0 +1,182 @@
+"""
+Append-only on-disk conversation history with a token-budgeted window for the LLM
+
+Every message of a session is appended once to a SQLite table (compact JSON
+plus its token estimate) and never rewritten. ChatBot keeps no message list
+of its own: each completion gets the system prompt plus the most recent
+messages that fit HISTORY_TOKEN_BUDGET, always starting at a user message so
+tool results never lose their tool call. An idle session therefore costs no
+memory, the full history stays available, and since the file is shared, a
+session can continue on another worker. Older turns can be folded into a
+rolling summary (see summarizer.py); the window then only covers messages
+after it.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    from .encoder import estimate_tokens
+except ImportError:
+    from encoder import estimate_tokens
+
+CONVERSATION_DB_PATH = os.environ.get("CONVERSATION_DB_PATH", "/tmp/chatbot_conversations.db")
+CONVERSATION_TTL = float(os.environ.get("CONVERSATION_TTL", str(7 * 24 * 3600)))
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "3000"))
+HISTORY_MAX_MESSAGES = int(os.environ.get("HISTORY_MAX_MESSAGES", "40"))
+
+
+def message_dict(message):
+    """Plain dict of a chat message (SDK message objects from the non-streamed path included)"""
+    if isinstance(message, dict):
+        return message
+    if hasattr(message, "to_dict"):
+        return message.to_dict()
+    return message.model_dump(exclude_none=True)
+
+
+class ConversationStore:
+    """Thread-safe append-only message log per session in one SQLite file"""
+
+    def __init__(self, path=CONVERSATION_DB_PATH, ttl=CONVERSATION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS messages (session_id TEXT, seq INTEGER, role TEXT, "
+                "tokens INTEGER, created_at REAL, message TEXT, PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS summaries (session_id TEXT PRIMARY KEY, upto_seq INTEGER, "
+                "summary TEXT, created_at REAL)"
+            )
+            # drop expired sessions once per process
+            expired = connection.execute(
+                "DELETE FROM messages WHERE session_id IN "
+                "(SELECT session_id FROM messages GROUP BY session_id HAVING MAX(created_at) < ?)",
+                (time.time() - self.ttl,),
+            ).rowcount
+            connection.execute(
+                "DELETE FROM summaries WHERE session_id NOT IN (SELECT DISTINCT session_id FROM messages)"
+            )
+            if expired:
+                logging.info(f"Dropped {expired} expired conversation messages")
+            self._connection = connection
+        return self._connection
+
+    def append(self, session_id, messages):
+        """Add messages to the end of a session's history"""
+        rows = []
+        for message in messages:
+            message = message_dict(message)
+            encoded = json.dumps(message, separators=(",", ":"), default=str)
+            rows.append((message.get("role"), estimate_tokens(encoded), encoded))
+        if not rows:
+            return
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                (last,) = connection.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM messages WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                now = time.time()
+                connection.executemany(
+                    "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                    [(session_id, last + i, role, tokens, now, encoded)
+                     for i, (role, tokens, encoded) in enumerate(rows, 1)],
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def window(self, session_id, token_budget=HISTORY_TOKEN_BUDGET, max_messages=HISTORY_MAX_MESSAGES, after_seq=0):
+        """Most recent messages within the token budget, starting at a user message.
+
+        The latest user message and what followed it are always included,
+        even when they alone exceed the budget or max_messages (a turn with
+        many tool calls). Messages up to after_seq (already summarized) are
+        left out.
+        """
+        with self._lock:
+            connection = self._connect()
+            rows = connection.execute(
+                "SELECT role, tokens, message FROM messages WHERE session_id = ? AND seq > ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (session_id, after_seq, max_messages),
+            ).fetchall()
+            if len(rows) == max_messages and not any(role == "user" for role, _, _ in rows):
+                # the latest turn alone is longer than max_messages: send all of it
+                rows = connection.execute(
+                    "SELECT role, tokens, message FROM messages WHERE session_id = ? AND seq >= "
+                    "(SELECT MAX(seq) FROM messages WHERE session_id = ? AND seq > ? AND role = 'user') "
+                    "ORDER BY seq DESC",
+                    (session_id, session_id, after_seq),
+                ).fetchall()
+        start = None
+        used = 0
+        for i, (role, tokens, _) in enumerate(rows):
+            used += tokens
+            if used > token_budget and start is not None:
+                break
+            if role == "user":
+                start = i
+        if start is None:
+            return []
+        return [json.loads(message) for _, _, message in reversed(rows[:start + 1])]
+
+    def since(self, session_id, after_seq=0):
+        """(seq, role, tokens, message) of the messages after after_seq, oldest first"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT seq, role, tokens, message FROM messages WHERE session_id = ? AND seq > ? ORDER BY seq",
+                (session_id, after_seq),
+            ).fetchall()
+        return [(seq, role, tokens, json.loads(message)) for seq, role, tokens, message in rows]
+
+    def summary(self, session_id):
+        """(upto_seq, summary) of the session's rolling summary, or (0, None)"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT upto_seq, summary FROM summaries WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row or (0, None)
+
+    def save_summary(self, session_id, upto_seq, summary):
+        """Replace the session's summary, unless a newer one (covering more messages) is stored"""
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO summaries VALUES (?, ?, ?, ?) ON CONFLICT (session_id) DO UPDATE SET "
+                "upto_seq = excluded.upto_seq, summary = excluded.summary, created_at = excluded.created_at "
+                "WHERE excluded.upto_seq > summaries.upto_seq",
+                (session_id, upto_seq, summary, time.time()),
+            )
+
+    def history(self, session_id):
+        """Every stored message of a session, oldest first"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT message FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return [json.loads(message) for (message,) in rows]
+
+    def count(self, session_id):
+        with self._lock:
+            (count,) = self._connect().execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return count
+
+
+conversation_store = ConversationStore()
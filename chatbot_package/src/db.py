@@ -0,0 +1,195 @@
+"""
+Shared SQLite connection pools for the chatbot tools
+
+Each chat session queries its uploader's database when the chat page passes
+a dataset token signed by the Django site (see use_session_db); otherwise
+CHATBOT_DB_PATH is used.
+"""
+import contextvars
+import hashlib
+import hmac
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_DB_PATH = '/tmp/dataset_1.db'
+# Per-user databases written by the Django site, and the secret its dataset tokens are signed with
+DB_PATH_TEMPLATE = os.environ.get('CHATBOT_DB_PATH_TEMPLATE', '/tmp/dataset_{user_id}.db')
+DATASET_SECRET = os.environ.get('CHATBOT_DATASET_SECRET')
+
+# Pool settings
+POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", "8"))
+MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", "32768"))
+
+
+class DatabaseNotFoundError(Exception):
+    """Raised when the dataset database file does not exist"""
+
+
+_session_db_path = contextvars.ContextVar("session_db_path", default=None)
+
+
+def get_db_path():
+    """Path of the dataset database: the session's own, else CHATBOT_DB_PATH"""
+    return _session_db_path.get() or os.getenv('CHATBOT_DB_PATH', DEFAULT_DB_PATH)
+
+
+def use_session_db(db_path):
+    """Query db_path (None: CHATBOT_DB_PATH) for the rest of the current task"""
+    _session_db_path.set(db_path)
+
+
+def db_path_for_token(token, secret=None):
+    """Database of the user a dataset token "<user id>.<HMAC-SHA256>" was signed for, or None"""
+    secret = secret or DATASET_SECRET
+    user_id, _, signature = (token or "").partition(".")
+    if not secret or not user_id.isdigit():
+        return None
+    expected = hmac.new(secret.encode(), user_id.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(signature, expected):
+        logging.warning("Ignoring a dataset token with a bad signature")
+        return None
+    return DB_PATH_TEMPLATE.format(user_id=user_id)
+
+
+def dataset_version(db_path=None):
+    """Identity of the dataset file: (path, inode, mtime_ns, size).
+
+    Raises DatabaseNotFoundError when the file does not exist.
+    """
+    db_path = db_path or get_db_path()
+    try:
+        stat = os.stat(db_path)
+    except FileNotFoundError:
+        raise DatabaseNotFoundError(db_path)
+    return (db_path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class ConnectionPool:
+    """Pool of read-only connections to a single SQLite database"""
+
+    def __init__(self, db_path, max_size=POOL_SIZE, inode=None):
+        self.db_path = db_path
+        self.inode = inode
+        self.max_size = max_size
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    def _connect(self):
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        try:
+            connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        except sqlite3.OperationalError:
+            # Only look at the filesystem on the (rare) connect path
+            if not os.path.exists(self.db_path):
+                raise DatabaseNotFoundError(self.db_path)
+            raise
+
+        # Per-connection settings, applied once for the lifetime of the connection
+        connection.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        connection.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        connection.execute("PRAGMA query_only=ON")
+        return connection
+
+    def acquire(self):
+        """Get an idle connection or open a new one"""
+        with self._lock:
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop()
+            self.misses += 1
+        return self._connect()
+
+    def release(self, connection):
+        """Return a connection to the pool, closing it if the pool is full"""
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_size:
+                self._idle.append(connection)
+                return
+            self.discarded += 1
+        connection.close()
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        except Exception:
+            # Don't hand a connection with an open statement back to the pool
+            if connection.in_transaction:
+                connection.rollback()
+            raise
+        finally:
+            self.release(connection)
+
+    def close(self):
+        """Close all idle connections; connections in use are closed on release"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "db_path": self.db_path,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "discarded": self.discarded,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=None, version=None):
+    """Get the shared pool for a database, creating it on first use.
+
+    When a dataset version is given and the file was replaced (new inode),
+    the old pool is closed so no connection keeps reading the old file.
+    """
+    db_path = db_path or get_db_path()
+    inode = version[1] if version else None
+    pool = _pools.get(db_path)
+    if pool is not None and (inode is None or pool.inode == inode):
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is not None and inode is not None and pool.inode != inode:
+            logging.info(f"Dataset file {db_path} changed, resetting its connection pool")
+            pool.close()
+            pool = None
+        if pool is None:
+            pool = ConnectionPool(db_path, inode=inode)
+            _pools[db_path] = pool
+            logging.info(f"Created SQLite connection pool for {db_path}")
+    return pool
+
+
+def close_pool(db_path=None):
+    """Drop the pool for a database, e.g. after the dataset file was replaced"""
+    db_path = db_path or get_db_path()
+    with _pools_lock:
+        pool = _pools.pop(db_path, None)
+    if pool:
+        pool.close()
+
+
+def pool_stats():
+    """Hit/miss statistics for every pool"""
+    return [pool.stats() for pool in list(_pools.values())]
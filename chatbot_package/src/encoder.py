@@ -0,0 +1,181 @@
+"""
+Fit tool results into a token budget for the LLM context
+"""
+import math
+import os
+import re
+
+try:
+    from .utils import render_table
+except ImportError:
+    from utils import render_table
+
+TOOL_RESULT_TOKEN_BUDGET = int(os.environ.get("TOOL_RESULT_TOKEN_BUDGET", "1500"))
+DISTINCT_CAP = 1000
+CELL_WIDTHS = (80, 40, 20)
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """Cheap local token estimate: one token per punctuation mark and per ~4 word characters"""
+    return sum(1 + (len(piece) - 1) // 4 for piece in _TOKEN_PATTERN.findall(text))
+
+
+def fit_to_budget(text, budget=TOOL_RESULT_TOKEN_BUDGET):
+    """Truncate free text so its token estimate stays within budget"""
+    tokens = estimate_tokens(text)
+    if not budget or tokens <= budget:
+        return text
+    keep_chars = int(len(text) * budget / tokens)
+    return text[:keep_chars].rstrip() + f"\n...(truncated, about {tokens - budget} more tokens)"
+
+
+class ColumnProfile:
+    """Running summary of one result column, fed one value at a time"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.numeric = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.max_length = 0
+        self.distinct = set()
+        self.distinct_capped = False
+
+    def add(self, value):
+        self.count += 1
+        if value is None:
+            self.nulls += 1
+            return
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.numeric += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+        elif isinstance(value, str) and len(value) > self.max_length:
+            self.max_length = len(value)
+        if not self.distinct_capped:
+            self.distinct.add(value)
+            if len(self.distinct) >= DISTINCT_CAP:
+                self.distinct_capped = True
+
+    def summary(self):
+        """Plain dict so profiles can be cached and compared cheaply"""
+        return {
+            "name": self.name,
+            "count": self.count,
+            "nulls": self.nulls,
+            "numeric": self.numeric,
+            "mean": self.total / self.numeric if self.numeric else None,
+            "min": self.min,
+            "max": self.max,
+            "max_length": self.max_length,
+            "distinct": len(self.distinct),
+            "distinct_capped": self.distinct_capped,
+        }
+
+
+def profile_rows(profiles, rows):
+    for row in rows:
+        for profile, value in zip(profiles, row):
+            profile.add(value)
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def format_summaries(summaries):
+    """One line of statistics per column"""
+    lines = []
+    for summary in summaries:
+        distinct = f"{summary['distinct']}+" if summary["distinct_capped"] else str(summary["distinct"])
+        parts = [f"{distinct} distinct"]
+        if summary["numeric"]:
+            parts.append(
+                f"min {_format_number(summary['min'])}, max {_format_number(summary['max'])}, "
+                f"mean {_format_number(summary['mean'])}"
+            )
+        if summary["nulls"]:
+            parts.append(f"{summary['nulls']} nulls")
+        lines.append(f"- {summary['name']}: " + ", ".join(parts))
+    return "\n".join(lines)
+
+
+def _column_priority(summary):
+    """Lower sorts first: informative short columns before constant or long-text ones"""
+    if summary["distinct"] <= 1:
+        return 2
+    if summary["max_length"] > CELL_WIDTHS[-1] * 4:
+        return 1
+    return 0
+
+
+def encode_result(rows, column_names, total, capped=False, summaries=None,
+                  budget=TOOL_RESULT_TOKEN_BUDGET, fmt=None):
+    """Encode a query result so it fits a token budget.
+
+    Narrows long cells first, then drops the least informative columns (down
+    to half of them) and finally rows. When not every row or column is
+    shown, per-column statistics over the whole result are appended so the
+    model still sees its shape.
+    """
+    column_names = list(column_names)
+    order = list(range(len(column_names)))
+    if summaries:
+        order.sort(key=lambda i: _column_priority(summaries[i]))
+
+    def render(width, kept_columns, kept_rows):
+        columns = sorted(order[:kept_columns])
+        names = [column_names[i] for i in columns]
+        shown = [tuple(row[i] for i in columns) for row in rows[:kept_rows]]
+        table = render_table(shown, names, fmt, max_cell_chars=width)
+        stats_text = ""
+        partial = kept_rows < total or capped or kept_columns < len(column_names)
+        if partial and summaries:
+            scope = f"first {total} rows" if capped else "all rows"
+            stats_text = f"\n\n**Column statistics ({scope}):**\n" + format_summaries(summaries)
+        text = _with_footer(table, kept_rows, total, capped, kept_columns, len(column_names)) + stats_text
+        return text, estimate_tokens(text)
+
+    kept_columns = len(column_names)
+    kept_rows = len(rows)
+    for width in CELL_WIDTHS:
+        text, used = render(width, kept_columns, kept_rows)
+        if not budget or used <= budget:
+            return text
+
+    # Narrowest cells still don't fit: drop columns, then rows
+    min_columns = max(1, math.ceil(len(column_names) / 2))
+    while kept_columns > min_columns:
+        kept_columns -= 1
+        text, used = render(width, kept_columns, kept_rows)
+        if used <= budget:
+            return text
+    while kept_rows > 1:
+        kept_rows = max(1, min(kept_rows - 1, int(kept_rows * budget / used)))
+        text, used = render(width, kept_columns, kept_rows)
+        if used <= budget:
+            return text
+    return fit_to_budget(text, budget)
+
+
+def _with_footer(table, shown_rows, total, capped, shown_columns, total_columns):
+    footer = ""
+    if shown_rows < total or capped:
+        of_rows = f"more than {total}" if capped else str(total)
+        footer = f"\n\n*(Showing first {shown_rows} of {of_rows} rows"
+        if shown_columns < total_columns:
+            footer += f", {shown_columns} of {total_columns} columns"
+        footer += ")*"
+    elif shown_columns < total_columns:
+        footer = f"\n\n*(Showing {shown_columns} of {total_columns} columns)*"
+    return table + footer
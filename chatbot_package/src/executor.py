@@ -0,0 +1,89 @@
+"""
+Bounded thread pool that runs blocking SQLite work off the event loop
+"""
+import asyncio
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .db import get_pool
+except ImportError:
+    from db import get_pool
+
+# Executor settings
+SQLITE_MAX_WORKERS = int(os.environ.get("SQLITE_MAX_WORKERS", "4"))
+QUERY_TIMEOUT = float(os.environ.get("QUERY_TIMEOUT", "30"))
+PROGRESS_HANDLER_STEPS = 1000  # SQLite VM instructions between deadline checks
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a query runs past its time budget"""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Shared thread pool for database work, created on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=SQLITE_MAX_WORKERS, thread_name_prefix="sqlite")
+                logging.info(f"Started SQLite executor with {SQLITE_MAX_WORKERS} workers")
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_on_connection(fn, args, db_path, version, timeout, cancelled):
+    deadline = time.monotonic() + timeout if timeout else None
+
+    def check_abort():
+        # A non-zero return makes SQLite abort the running statement
+        if cancelled.is_set():
+            return 1
+        return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+    with get_pool(db_path, version).connection() as connection:
+        connection.set_progress_handler(check_abort, PROGRESS_HANDLER_STEPS)
+        try:
+            return fn(connection, *args)
+        except sqlite3.OperationalError as error:
+            if deadline is not None and time.monotonic() > deadline and not cancelled.is_set():
+                raise QueryTimeoutError(f"Query exceeded the {timeout:g}s time limit") from error
+            raise
+        finally:
+            connection.set_progress_handler(None, 0)
+
+
+async def run_db(fn, *args, db_path=None, version=None, timeout=None):
+    """Run fn(connection, *args) on a pooled connection in the executor.
+
+    The query is aborted through SQLite's progress handler once it passes
+    its timeout, or as soon as the awaiting task is cancelled.
+    """
+    timeout = QUERY_TIMEOUT if timeout is None else timeout
+    cancelled = threading.Event()
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(
+        get_executor(),
+        functools.partial(_run_on_connection, fn, args, db_path, version, timeout, cancelled),
+    )
+    try:
+        return await future
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
@@ -0,0 +1,265 @@
+"""
+Index advisor: builds indexes for full table scans that keep recurring in tool queries
+
+Off by default (INDEX_ADVISOR=1 turns it on): an index changes the dataset
+file's mtime and size, so the dataset version changes and every cache keyed
+on it (query results, charts, catalog, rollups) starts over. Files inside the
+chatbot package, such as the bundled data/movies.db, are never written.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+
+try:
+    from .db import dataset_version
+    from .executor import run_db, get_executor
+except ImportError:
+    from db import dataset_version
+    from executor import run_db, get_executor
+
+INDEX_ADVISOR_ENABLED = os.environ.get("INDEX_ADVISOR", "0") == "1"
+INDEX_ADVISOR_MIN_QUERIES = int(os.environ.get("INDEX_ADVISOR_MIN_QUERIES", "3"))
+INDEX_ADVISOR_MAX_INDEXES = int(os.environ.get("INDEX_ADVISOR_MAX_INDEXES", "4"))
+# Scans faster than this are not worth an index (and a write to the dataset file)
+INDEX_ADVISOR_MIN_MS = float(os.environ.get("INDEX_ADVISOR_MIN_MS", "20"))
+INDEX_ADVISOR_MAX_COLUMNS = 4  # widest index built to cover a query
+INDEX_MAX_KEY_COLUMNS = 3
+INDEX_MIN_SPEEDUP = 1.1  # indexes that don't make the query at least this much faster are dropped
+TIMING_RUNS = 2
+PACKAGE_ROOT = Path(__file__).resolve().parent.parent
+
+_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)$")  # a full scan, not "SCAN x USING INDEX"
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_COUNT_STAR_RE = re.compile(r"count\s*\(\s*\*\s*\)", re.IGNORECASE)
+_CLAUSE_RE = re.compile(r"\b(select|from|where|group\s+by|having|order\s+by|limit)\b", re.IGNORECASE)
+_FROM_RE = re.compile(r'\b(?:from|join)\s+"?(\w+)"?(?:\s+(?:as\s+)?(\w+))?', re.IGNORECASE)
+_NOT_ALIASES = {"where", "group", "order", "limit", "join", "inner", "left", "cross", "on", "having", "natural"}
+
+
+def explain(connection, sql_query):
+    """Query plan details and the columns of each table the plan reads"""
+    plan = [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql_query}")]
+    tables = {}
+    for table in _FROM_RE.findall(_STRING_RE.sub("?", sql_query)):
+        name = table[0]
+        if name not in tables:
+            tables[name] = [row[1] for row in connection.execute(f'PRAGMA table_info("{name}")')]
+    return plan, tables
+
+
+def time_query(connection, sql_query, runs=TIMING_RUNS):
+    """Best wall time of running a query to completion, rows discarded"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        cursor = connection.execute(sql_query)
+        while cursor.fetchmany(1000):
+            pass
+        cursor.close()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _clauses(sql_query):
+    """Text of each top-level clause keyword (select, where, group by, ...)"""
+    parts = _CLAUSE_RE.split(sql_query)
+    clauses = {}
+    for keyword, body in zip(parts[1::2], parts[2::2]):
+        keyword = " ".join(keyword.lower().split())
+        clauses[keyword] = clauses.get(keyword, "") + " " + body
+    return clauses
+
+
+def _column_pattern(column):
+    return rf'(?<![\w"]){re.escape(column)}(?![\w"])|"{re.escape(column)}"'
+
+
+def _mentioned(text, columns):
+    """Columns that occur in text, in order of first occurrence"""
+    positions = []
+    for column in columns:
+        match = re.search(_column_pattern(column), text, re.IGNORECASE)
+        if match:
+            positions.append((match.start(), column))
+    return [column for _, column in sorted(positions)]
+
+
+def _dedupe(columns):
+    return list(dict.fromkeys(columns))
+
+
+def recommend(sql_query, plan, tables):
+    """(table, columns) of an index for a query whose plan scans a whole table, or None.
+
+    Key columns are equality filters, then one range filter, then GROUP BY and
+    ORDER BY columns. When the query touches only a few columns of the table
+    they are all appended, so the index covers the query.
+    """
+    text = _STRING_RE.sub("?", sql_query)
+    aliases = {}
+    for table, alias in _FROM_RE.findall(text):
+        aliases[table] = table
+        if alias and alias.lower() not in _NOT_ALIASES:
+            aliases[alias] = table
+
+    scanned = [match.group(1) for match in map(_SCAN_RE.match, plan) if match]
+    if not scanned or scanned[0] not in aliases:
+        return None
+    table = aliases[scanned[0]]
+    columns = tables.get(table)
+    if not columns:
+        return None
+
+    clauses = _clauses(text)
+    where = clauses.get("where", "")
+    filters = _mentioned(where, columns)
+    equality = [
+        column for column in filters
+        if re.search(rf"(?:{_column_pattern(column)})\s*(?:=|\bin\b|\bis\b)", where, re.IGNORECASE)
+    ]
+    ranges = [column for column in filters if column not in equality]
+    keys = _dedupe(
+        equality + ranges[:1]
+        + _mentioned(clauses.get("group by", ""), columns)
+        + _mentioned(clauses.get("order by", ""), columns)
+    )[:INDEX_MAX_KEY_COLUMNS]
+    if not keys:
+        return None
+
+    if "*" not in _COUNT_STAR_RE.sub("", clauses.get("select", "")):
+        referenced = _mentioned(text, columns)
+        if len(_dedupe(keys + referenced)) <= INDEX_ADVISOR_MAX_COLUMNS:
+            keys = _dedupe(keys + referenced)
+    return table, tuple(keys)
+
+
+def writable_dataset(db_path):
+    """Whether the advisor may add indexes to the file: never to files shipped with the package"""
+    return not Path(db_path).resolve().is_relative_to(PACKAGE_ROOT)
+
+
+def index_name(table, columns):
+    digest = hashlib.sha1("\0".join((table,) + tuple(columns)).encode()).hexdigest()[:8]
+    readable = re.sub(r"\W+", "_", "_".join(columns))[:40]
+    return f"auto_idx_{table}_{readable}_{digest}"
+
+
+def create_index(db_path, name, table, columns):
+    """CREATE INDEX through a short-lived writable connection (the pools are read-only)"""
+    connection = sqlite3.connect(db_path, timeout=30)
+    try:
+        column_list = ", ".join('"' + column.replace('"', '""') + '"' for column in columns)
+        connection.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({column_list})')
+        connection.execute(f'ANALYZE "{name}"')
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def drop_index(db_path, name):
+    connection = sqlite3.connect(db_path, timeout=30)
+    try:
+        connection.execute(f'DROP INDEX IF EXISTS "{name}"')
+        connection.commit()
+    finally:
+        connection.close()
+
+
+class IndexAdvisor:
+    """Watches query plans of tool queries and indexes recurring table scans.
+
+    Every executed query is explained in the background. Once the same index
+    candidate has come up for min_queries slow queries on a dataset, it is built,
+    the query is timed before and after, and the index is dropped again if it
+    doesn't help. Results are kept in reports.
+    """
+
+    def __init__(self, min_queries=INDEX_ADVISOR_MIN_QUERIES, max_indexes=INDEX_ADVISOR_MAX_INDEXES,
+                 enabled=INDEX_ADVISOR_ENABLED):
+        self.min_queries = min_queries
+        self.max_indexes = max_indexes
+        self.enabled = enabled
+        self.counts = Counter()  # (db_path, inode, table, columns) -> scanning queries seen
+        self.reports = []
+        self._decided = set()
+        self._tasks = set()
+
+    def observe(self, sql_query, db_path, version, elapsed):
+        """Record an executed query; analysis and index builds run in the background"""
+        if not self.enabled or not writable_dataset(db_path):
+            return
+        task = asyncio.ensure_future(self._observe(sql_query, db_path, version, elapsed))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _observe(self, sql_query, db_path, version, elapsed):
+        try:
+            plan, tables = await run_db(explain, sql_query, db_path=db_path, version=version)
+        except Exception as error:
+            logging.debug(f"Could not explain query: {error}")
+            return
+        logging.info(f"Query plan ({elapsed * 1000:.0f} ms): {' | '.join(plan)} :: {sql_query}")
+
+        if elapsed * 1000 < INDEX_ADVISOR_MIN_MS:
+            return
+        candidate = recommend(sql_query, plan, tables)
+        if candidate is None:
+            return
+        key = (db_path, version[1]) + candidate
+        self.counts[key] += 1
+        built = sum(1 for report in self.reports if report["key"][:2] == key[:2] and report["kept"])
+        if self.counts[key] < self.min_queries or key in self._decided or built >= self.max_indexes:
+            return
+        self._decided.add(key)
+        await self._build(key, sql_query, db_path, version)
+
+    async def _build(self, key, sql_query, db_path, version):
+        table, columns = key[2], key[3]
+        name = index_name(table, columns)
+        loop = asyncio.get_running_loop()
+        try:
+            before = await run_db(time_query, sql_query, db_path=db_path, version=version)
+            await loop.run_in_executor(get_executor(), create_index, db_path, name, table, columns)
+            # the new index changes the file's mtime and size, so queries see a new dataset version
+            after = await run_db(time_query, sql_query, db_path=db_path, version=dataset_version(db_path))
+            kept = before / max(after, 1e-9) >= INDEX_MIN_SPEEDUP
+            if not kept:
+                await loop.run_in_executor(get_executor(), drop_index, db_path, name)
+        except Exception as error:
+            logging.warning(f"Index advisor could not index {table}({', '.join(columns)}): {error}")
+            return
+
+        report = {
+            "key": key,
+            "index": name,
+            "table": table,
+            "columns": list(columns),
+            "queries": self.counts[key],
+            "before_ms": round(before * 1000, 2),
+            "after_ms": round(after * 1000, 2),
+            "speedup": round(before / max(after, 1e-9), 1),
+            "kept": kept,
+        }
+        self.reports.append(report)
+        line = (
+            f"🗂️ Index advisor {'built' if kept else 'dropped'} {name} on {table}({', '.join(columns)}): "
+            f"{report['before_ms']:.1f} ms -> {report['after_ms']:.1f} ms ({report['speedup']}x)"
+        )
+        print(line)
+        logging.info(line)
+
+    def report(self):
+        """Indexes tried so far with their before/after latency"""
+        return [{k: v for k, v in report.items() if k != "key"} for report in self.reports]
+
+    async def wait(self):
+        """Wait for pending analysis and builds (used by scripts and benchmarks)"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
@@ -0,0 +1,262 @@
+"""
+LLM provider backends used by ChatBot
+"""
+import asyncio
+import json
+import logging
+import os
+from types import SimpleNamespace
+
+# Provider settings
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "groq")
+GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama3-70b-8192")
+LLM_TEMPERATURE = 0.1  # Lower temperature for more consistent function calling
+LLM_MAX_TOKENS = 4000
+
+# HTTP connection settings for the Groq client
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE = int(os.environ.get("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP2 = os.environ.get("LLM_HTTP2", "1") == "1"
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+
+# Mock provider settings
+LLM_MOCK_SCRIPT = os.environ.get("LLM_MOCK_SCRIPT")
+LLM_MOCK_LATENCY = float(os.environ.get("LLM_MOCK_LATENCY", "0"))
+LLM_MOCK_TOKEN_DELAY = float(os.environ.get("LLM_MOCK_TOKEN_DELAY", "0"))
+
+
+class StreamedFunction:
+    def __init__(self, name="", arguments=""):
+        self.name = name
+        self.arguments = arguments
+
+
+class StreamedToolCall:
+    def __init__(self, id=None, name="", arguments=""):
+        self.id = id
+        self.type = "function"
+        self.function = StreamedFunction(name, arguments)
+
+
+class StreamedMessage:
+    """Assistant message reassembled from streamed completion chunks"""
+
+    def __init__(self):
+        self._content_parts = []
+        self._tool_calls = {}  # index -> StreamedToolCall
+
+    @property
+    def content(self):
+        return "".join(self._content_parts)
+
+    @property
+    def tool_calls(self):
+        return [self._tool_calls[index] for index in sorted(self._tool_calls)]
+
+    def add_content(self, text):
+        self._content_parts.append(text)
+
+    def add_tool_call_fragment(self, fragment):
+        """Merge one streamed tool call delta; arguments arrive in pieces"""
+        tool_call = self._tool_calls.setdefault(fragment.index, StreamedToolCall())
+        if fragment.id:
+            tool_call.id = fragment.id
+        if fragment.function:
+            if fragment.function.name:
+                tool_call.function.name += fragment.function.name
+            if fragment.function.arguments:
+                tool_call.function.arguments += fragment.function.arguments
+
+    def add_delta(self, delta):
+        if delta.content:
+            self.add_content(delta.content)
+        for fragment in delta.tool_calls or []:
+            self.add_tool_call_fragment(fragment)
+
+    def to_dict(self):
+        message = {"role": "assistant", "content": self.content or None}
+        if self._tool_calls:
+            message["tool_calls"] = [
+                {
+                    "id": tool_call.id,
+                    "type": "function",
+                    "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments},
+                }
+                for tool_call in self.tool_calls
+            ]
+        return message
+
+
+class LLMProvider:
+    """Interface of a chat completion backend"""
+
+    name = "base"
+
+    async def complete(self, messages, tools=None):
+        """Return the assistant message (with .content and .tool_calls)"""
+        raise NotImplementedError
+
+    async def stream(self, messages, tools=None):
+        """Yield completion deltas (with .content and .tool_calls fragments)"""
+        raise NotImplementedError
+        yield
+
+    async def aclose(self):
+        pass
+
+
+def build_http_client():
+    """Shared httpx client with explicit pool limits, keep-alive and timeouts"""
+    import httpx
+
+    http2 = LLM_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logging.warning("LLM_HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+    )
+
+
+class GroqProvider(LLMProvider):
+    """Groq chat completions over a tuned, reused HTTP connection pool"""
+
+    name = "groq"
+
+    def __init__(self, api_key=None, model=GROQ_MODEL, base_url=None):
+        from groq import AsyncGroq
+
+        api_key = api_key or os.environ.get("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY environment variable is required")
+        self.model = model
+        self.http_client = build_http_client()
+        # GROQ_BASE_URL points the client at another endpoint, e.g. a local fake server
+        self.client = AsyncGroq(
+            api_key=api_key,
+            base_url=base_url or os.environ.get("GROQ_BASE_URL") or None,
+            http_client=self.http_client,
+            max_retries=LLM_MAX_RETRIES,
+        )
+
+    def _request(self, messages, tools):
+        return dict(
+            model=self.model,
+            messages=messages,
+            tools=tools if tools else None,
+            tool_choice="auto" if tools else None,
+            temperature=LLM_TEMPERATURE,
+            max_tokens=LLM_MAX_TOKENS,
+        )
+
+    async def complete(self, messages, tools=None):
+        completion = await self.client.chat.completions.create(**self._request(messages, tools))
+        return completion.choices[0].message
+
+    async def stream(self, messages, tools=None):
+        stream = await self.client.chat.completions.create(**self._request(messages, tools), stream=True)
+        async for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+
+DEFAULT_MOCK_SCRIPT = [
+    {"tool_calls": [{"name": "run_sqlite_query",
+                     "arguments": {"sql_query": "SELECT name FROM sqlite_master WHERE type='table'"}}]},
+    {"content": "Here is what I found:\n{tool_result}"},
+]
+
+
+class MockProvider(LLMProvider):
+    """Deterministic offline backend that replays a scripted agent loop.
+
+    The script is a list of rounds, each either {"tool_calls": [{"name",
+    "arguments"}]} or {"content": "..."}. The round is chosen by how many
+    assistant messages followed the latest user message, so any number of
+    sessions can replay the same script concurrently. "{tool_result}" in
+    content is replaced with the start of the latest tool result.
+    """
+
+    name = "mock"
+
+    def __init__(self, script=None, latency=LLM_MOCK_LATENCY, token_delay=LLM_MOCK_TOKEN_DELAY):
+        if script is None and LLM_MOCK_SCRIPT:
+            with open(LLM_MOCK_SCRIPT) as f:
+                script = json.load(f)
+        self.script = script or DEFAULT_MOCK_SCRIPT
+        self.latency = latency
+        self.token_delay = token_delay
+        self.calls = 0
+
+    def _next_round(self, messages):
+        rounds = 0
+        tool_result = ""
+        for message in reversed(messages):
+            role = message["role"] if isinstance(message, dict) else message.role
+            if role == "user":
+                break
+            if role == "assistant":
+                rounds += 1
+            elif role == "tool" and not tool_result:
+                tool_result = str(message["content"] if isinstance(message, dict) else message.content)
+        step = self.script[min(rounds, len(self.script) - 1)]
+        return step, tool_result
+
+    def _deltas(self, messages):
+        step, tool_result = self._next_round(messages)
+        self.calls += 1
+        if "tool_calls" in step:
+            for index, tool_call in enumerate(step["tool_calls"]):
+                arguments = json.dumps(tool_call.get("arguments", {}))
+                function = SimpleNamespace(name=tool_call["name"], arguments=arguments)
+                fragment = SimpleNamespace(index=index, id=f"call_{self.calls}_{index}", function=function)
+                yield SimpleNamespace(content=None, tool_calls=[fragment])
+            return
+        content = step.get("content", "").replace("{tool_result}", "\n".join(tool_result.splitlines()[:6]))
+        for i, word in enumerate(content.split(" ")):
+            yield SimpleNamespace(content=word if i == 0 else " " + word, tool_calls=None)
+
+    async def complete(self, messages, tools=None):
+        await asyncio.sleep(self.latency)
+        message = StreamedMessage()
+        for delta in self._deltas(messages):
+            message.add_delta(delta)
+        if self.token_delay:
+            await asyncio.sleep(self.token_delay * len(message._content_parts))
+        return message
+
+    async def stream(self, messages, tools=None):
+        await asyncio.sleep(self.latency)
+        for delta in self._deltas(messages):
+            yield delta
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+
+
+_PROVIDERS = {"groq": GroqProvider, "mock": MockProvider}
+_shared_providers = {}
+
+
+def get_provider(name=None):
+    """Process-wide provider instance, so every session reuses one connection pool"""
+    name = name or LLM_PROVIDER
+    if name not in _PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER '{name}', expected one of {sorted(_PROVIDERS)}")
+    if name not in _shared_providers:
+        _shared_providers[name] = _PROVIDERS[name]()
+    return _shared_providers[name]
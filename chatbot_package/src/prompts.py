@@ -0,0 +1,112 @@
+"""
+System prompt split into a stable, versioned prefix and a variable suffix
+
+The prefix (workflow rules plus the CREATE statements of the dataset, or
+only the table names when the schema is pruned per question) is rendered
+once per prompt version and dataset version and the same string is shared
+by every session, so each request starts with the same bytes and providers
+with prefix caching can reuse it. Per-session context (the rolling summary,
+the relevant schema, then the history) always comes after it. Request sizes
+are logged split into prefix and variable bytes.
+"""
+import hashlib
+import logging
+
+try:
+    from .schema_index import needs_pruning
+except ImportError:
+    from schema_index import needs_pruning
+
+PROMPT_VERSION = 1  # bump whenever SYSTEM_RULES change
+
+SYSTEM_RULES = """You are a data analysis expert. Help users analyze data from the database by writing SQL queries and creating visualizations.
+
+CRITICAL WORKFLOW:
+1. ALWAYS call query_db FIRST to get actual data from the database
+2. ONLY call plot_chart AFTER you have real data from query_db
+3. Extract actual values from the query results to use in plot_chart
+
+RULES:
+- NEVER use placeholder or example data in plot_chart
+- ALWAYS use real data from query_db results
+- For charts: extract x_values (categories) and y_values (numbers) from query results
+- Keep responses business-friendly (no technical SQL details)
+- Limit results to 5-10 items for clarity
+- Choose appropriate chart types: bar (comparisons), pie (distributions), line (trends)"""
+
+MAX_PREFIXES = 16
+
+
+class PromptPrefix:
+    """The byte-identical start of every request for one prompt and dataset version"""
+
+    def __init__(self, text):
+        self.text = text
+        self.size = len(text.encode())
+        self.key = f"v{PROMPT_VERSION}-{hashlib.sha256(text.encode()).hexdigest()[:12]}"
+
+
+_prefixes = {}  # (PROMPT_VERSION, dataset version) -> PromptPrefix
+
+
+def prompt_prefix(catalog=None):
+    """Shared system prompt for the catalog's dataset version (rules only without a dataset)"""
+    version = catalog.version if catalog is not None else None
+    prefix = _prefixes.get((PROMPT_VERSION, version))
+    if prefix is None:
+        text = SYSTEM_RULES
+        if needs_pruning(catalog):
+            # the CREATE statements relevant to each question are sent after the prefix
+            names = ", ".join(table["name"] for table in catalog.tables)
+            text += f"\n\nDatabase tables: {names}"
+        elif catalog is not None:
+            text += f"\n\nDatabase schema:\n{catalog.table_info}"
+        if len(_prefixes) >= MAX_PREFIXES:
+            _prefixes.clear()
+        prefix = _prefixes[(PROMPT_VERSION, version)] = PromptPrefix(text)
+        logging.info(f"Built prompt prefix {prefix.key} ({prefix.size} bytes)")
+    return prefix
+
+
+class PromptLog:
+    """Byte counts of LLM requests, split into the stable prefix and the variable rest"""
+
+    def __init__(self):
+        self.requests = 0
+        self.prefix_bytes = 0
+        self.variable_bytes = 0
+        self._seen = {}  # prefix text -> PromptPrefix; the shared string hashes once
+
+    def _prefix(self, text):
+        prefix = self._seen.get(text)
+        if prefix is None:
+            if len(self._seen) >= MAX_PREFIXES:
+                self._seen.clear()
+            prefix = self._seen[text] = PromptPrefix(text)
+        return prefix
+
+    def record(self, messages):
+        """Log the size of one request's messages"""
+        prefix = self._prefix(messages[0]["content"] if messages and messages[0].get("role") == "system" else "")
+        variable_size = sum(
+            len(str(message.get("content") or "").encode())
+            + sum(len(tool_call["function"].get("arguments") or "") for tool_call in message.get("tool_calls") or [])
+            for message in messages[1:]
+        )
+        self.requests += 1
+        self.prefix_bytes += prefix.size
+        self.variable_bytes += variable_size
+        logging.info(f"Prompt: {prefix.size} bytes prefix {prefix.key} + {variable_size} bytes variable")
+
+    def stats(self):
+        total = self.prefix_bytes + self.variable_bytes
+        return {
+            "requests": self.requests,
+            "prefix_bytes": self.prefix_bytes,
+            "variable_bytes": self.variable_bytes,
+            "prefix_share": self.prefix_bytes / total if total else 0.0,
+            "prefixes": len(self._seen),
+        }
+
+
+prompt_log = PromptLog()
@@ -0,0 +1,206 @@
+"""
+Answers simple GROUP BY queries from the rollup tables built when a dataset is ingested
+
+The Django ingestion writes _rollup_counts, _rollup_stats and _rollup_meta
+next to main_table. A query of the form
+
+    SELECT x, SUM(y) [AS a] FROM main_table GROUP BY x [ORDER BY ...] [LIMIT n]
+
+(with COUNT/SUM/AVG/MIN/MAX) is rewritten to read those small tables instead
+of scanning main_table. Anything else runs unchanged.
+"""
+import logging
+import os
+import re
+import sqlite3
+
+try:
+    from .executor import run_db
+except ImportError:
+    from executor import run_db
+
+ROLLUPS_ENABLED = os.environ.get("ROLLUPS", "1") == "1"
+ROLLUP_TABLE_PREFIX = "_rollup_"
+ROLLUP_FORMAT = 1
+
+_IDENT = r'(?:"(?:[^"]|"")+"|`[^`]+`|\[[^\]]+\]|[A-Za-z_]\w*)'
+_IDENT_RE = re.compile(_IDENT)
+_QUERY_RE = re.compile(
+    rf"^\s*select\s+(?P<select>.+?)\s+from\s+(?P<table>{_IDENT})\s+group\s+by\s+(?P<group>{_IDENT}|\d+)"
+    rf"(?:\s+order\s+by\s+(?P<order>.+?))?(?:\s+limit\s+(?P<limit>\d+))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_ITEM_RE = re.compile(rf"^(?P<expr>.+?)(?:\s+(?:as\s+)?(?P<alias>{_IDENT}))?$", re.IGNORECASE | re.DOTALL)
+_AGGREGATE_RE = re.compile(rf"^(?P<fn>sum|avg|count|min|max)\s*\(\s*(?P<arg>\*|{_IDENT})\s*\)$", re.IGNORECASE)
+_ORDER_RE = re.compile(r"^(?P<expr>.+?)(?:\s+(?P<direction>asc|desc))?$", re.IGNORECASE | re.DOTALL)
+
+# SQL expression over _rollup_stats for each aggregate of the value column
+_STAT_EXPRESSIONS = {
+    "sum": "total",
+    "avg": "total * 1.0 / value_count",
+    "count": "value_count",
+    "min": "min_value",
+    "max": "max_value",
+}
+
+
+def _unquote(identifier):
+    if identifier[0] == '"':
+        return identifier[1:-1].replace('""', '"')
+    if identifier[0] in "`[":
+        return identifier[1:-1]
+    return identifier
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _normalize(expression):
+    expression = expression.strip()
+    if _IDENT_RE.fullmatch(expression):
+        expression = _unquote(expression)
+    return re.sub(r"\s+", "", expression).lower()
+
+
+class Rollups:
+    """Columns of main_table covered by the rollup tables of one dataset version"""
+
+    def __init__(self, columns, counted, stat_pairs):
+        self.columns = {column.lower(): column for column in columns}
+        self.counted = set(counted)
+        self.stat_pairs = set(stat_pairs)
+
+    def _column(self, identifier):
+        return self.columns.get(_unquote(identifier).lower())
+
+    def rewrite(self, sql_query):
+        """Equivalent query over the rollup tables, or None when it doesn't apply"""
+        match = _QUERY_RE.match(sql_query)
+        if not match or _unquote(match.group("table")).lower() != "main_table":
+            return None
+        parts = match.group("select").split(",")
+        if len(parts) != 2:
+            return None
+
+        items = []
+        for position, part in enumerate(parts, 1):
+            item = _ITEM_RE.match(part.strip())
+            expression, alias = item.group("expr").strip(), item.group("alias")
+            aggregate = _AGGREGATE_RE.match(expression)
+            if not aggregate and not _IDENT_RE.fullmatch(expression):
+                return None
+            items.append({
+                "position": str(position),
+                "expression": expression,
+                "aggregate": aggregate,
+                "name": _unquote(alias) if alias else (expression if aggregate else _unquote(expression)),
+                "alias": alias,
+            })
+        groups = [item for item in items if not item["aggregate"]]
+        aggregates = [item for item in items if item["aggregate"]]
+        if len(groups) != 1 or len(aggregates) != 1:
+            return None
+        group_item, aggregate_item = groups[0], aggregates[0]
+
+        group_column = self._column(group_item["expression"])
+        group_by = match.group("group")
+        if group_column is None or (
+            group_by != group_item["position"] and self._column(group_by) != group_column
+        ):
+            return None
+
+        function = aggregate_item["aggregate"].group("fn").lower()
+        argument = aggregate_item["aggregate"].group("arg")
+        if function == "count" and (argument == "*" or self._column(argument) == group_column):
+            if group_column not in self.counted:
+                return None
+            table, group_expression = "_rollup_counts", "value"
+            value_expression = "row_count" if argument == "*" else "CASE WHEN value IS NULL THEN 0 ELSE row_count END"
+            where = f"column_name = {_literal(group_column)}"
+        else:
+            value_column = self._column(argument) if argument != "*" else None
+            if value_column is None or (group_column, value_column) not in self.stat_pairs:
+                return None
+            table, group_expression = "_rollup_stats", "group_value"
+            value_expression = _STAT_EXPRESSIONS[function]
+            where = f"group_column = {_literal(group_column)} AND value_column = {_literal(value_column)}"
+
+        order_expression = group_expression
+        if match.group("order"):
+            order = _ORDER_RE.match(match.group("order").strip())
+            if "," in order.group("expr"):
+                return None
+            key = _normalize(order.group("expr"))
+            if key in self._names(group_item):
+                order_expression = group_expression
+            elif key in self._names(aggregate_item):
+                order_expression = value_expression
+            else:
+                return None
+            if (order.group("direction") or "").lower() == "desc":
+                order_expression += " DESC"
+
+        select = {
+            id(group_item): f"{group_expression} AS {_quote(group_item['name'])}",
+            id(aggregate_item): f"{value_expression} AS {_quote(aggregate_item['name'])}",
+        }
+        sql = f"SELECT {', '.join(select[id(item)] for item in items)} FROM {table} WHERE {where} ORDER BY {order_expression}"
+        if match.group("limit"):
+            sql += f" LIMIT {int(match.group('limit'))}"
+        return sql
+
+    @staticmethod
+    def _names(item):
+        names = {item["position"], _normalize(item["expression"])}
+        if item["alias"]:
+            names.add(_normalize(item["alias"]))
+        return names
+
+
+def _load_rollups(connection):
+    """Rollup coverage of the dataset, or None when it has no (current) rollups"""
+    try:
+        meta = dict(connection.execute("SELECT key, value FROM _rollup_meta"))
+    except sqlite3.OperationalError:
+        return None
+    if meta.get("format") != ROLLUP_FORMAT:
+        return None
+    # rollups are written in the same transaction as main_table; make sure no rows were added since
+    (last_rowid,) = connection.execute("SELECT MAX(rowid) FROM main_table").fetchone()
+    if (last_rowid or 0) != meta.get("rows"):
+        logging.warning("Ignoring rollup tables that don't match main_table")
+        return None
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(main_table)")]
+    counted = [row[0] for row in connection.execute("SELECT DISTINCT column_name FROM _rollup_counts")]
+    stat_pairs = connection.execute("SELECT DISTINCT group_column, value_column FROM _rollup_stats").fetchall()
+    return Rollups(columns, counted, stat_pairs)
+
+
+_rollups = {}  # db_path -> (version, Rollups or None)
+
+
+async def rollup_query(sql_query, db_path, version):
+    """The query rewritten over the rollup tables, or None to run it as is"""
+    if not ROLLUPS_ENABLED:
+        return None
+    cached = _rollups.get(db_path)
+    if cached is None or cached[0] != version:
+        try:
+            rollups = await run_db(_load_rollups, db_path=db_path, version=version)
+        except sqlite3.Error as error:
+            logging.warning(f"Could not read rollup tables of {db_path}: {error}")
+            rollups = None
+        cached = _rollups[db_path] = (version, rollups)
+    rollups = cached[1]
+    if rollups is None:
+        return None
+    rewritten = rollups.rewrite(sql_query)
+    if rewritten:
+        print("📦 Answering query from rollup tables")
+        logging.info(f"Rollup rewrite: {sql_query} -> {rewritten}")
+    return rewritten
@@ -0,0 +1,170 @@
+"""
+Concurrent tool execution with time budgets, cancellation and per-turn timelines
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    from .cache import normalize_sql
+except ImportError:
+    from cache import normalize_sql
+
+TOOL_MAX_CONCURRENCY = int(os.environ.get("TOOL_MAX_CONCURRENCY", "4"))
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", "45"))
+# Per-tool overrides, e.g. "plot_chart=60,get_table_schema=10"
+TOOL_TIMEOUTS = {
+    name.strip(): float(seconds)
+    for name, seconds in (
+        item.split("=", 1) for item in os.environ.get("TOOL_TIMEOUTS", "").split(",") if "=" in item
+    )
+}
+
+# A tool waits for calls of these tools in the same round that use the same SQL,
+# so e.g. plot_chart is served from the result cache instead of re-running the query
+TOOL_DEPENDENCIES = {"plot_chart": ("run_sqlite_query", "query_db")}
+
+
+def _merged_duration(spans):
+    """Wall-clock time covered by possibly overlapping (start, end) spans"""
+    total = 0.0
+    current_start = current_end = None
+    for start, end in sorted(spans):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+class TurnTimeline:
+    """Records where the time of one user turn goes (LLM wait vs tool time)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []  # (kind, name, start, end)
+
+    @contextmanager
+    def span(self, kind, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((kind, name, start, time.perf_counter()))
+
+    def summary(self):
+        total = time.perf_counter() - self.started
+        llm = [(start, end) for kind, _, start, end in self.spans if kind == "llm"]
+        tools = [(start, end) for kind, _, start, end in self.spans if kind == "tool"]
+        busy = _merged_duration(llm + tools)
+        return {
+            "total": total,
+            "llm_wait": _merged_duration(llm),
+            "llm_calls": len(llm),
+            "tool_time": _merged_duration(tools),
+            "tool_time_summed": sum(end - start for start, end in tools),
+            "tool_calls": len(tools),
+            "other": max(0.0, total - busy),
+            "spans": [
+                {"kind": kind, "name": name, "start": start - self.started, "duration": end - start}
+                for kind, name, start, end in self.spans
+            ],
+        }
+
+    def log(self):
+        summary = self.summary()
+        line = (
+            f"⏱️ Turn {summary['total']:.2f}s: LLM {summary['llm_wait']:.2f}s ({summary['llm_calls']} calls), "
+            f"tools {summary['tool_time']:.2f}s ({summary['tool_calls']} calls, {summary['tool_time_summed']:.2f}s summed), "
+            f"other {summary['other']:.2f}s"
+        )
+        print(line)
+        logging.info(line)
+        return summary
+
+
+def _sql_argument(tool_call):
+    try:
+        arguments = json.loads(tool_call.function.arguments or "{}")
+    except (json.JSONDecodeError, TypeError):
+        return None
+    sql_query = arguments.get("sql_query") if isinstance(arguments, dict) else None
+    return normalize_sql(sql_query) if isinstance(sql_query, str) else None
+
+
+def error_response(tool_call, message):
+    return {
+        "tool_call_id": tool_call.id,
+        "role": "tool",
+        "name": tool_call.function.name,
+        "content": message,
+    }
+
+
+class ToolScheduler:
+    """Runs the tool calls of one model round concurrently.
+
+    Concurrency is bounded, every call gets a time budget, calls that depend
+    on another call in the round wait for it, and cancel() stops everything
+    in flight (e.g. when the user sends a new message).
+    """
+
+    def __init__(self, max_concurrency=TOOL_MAX_CONCURRENCY, timeout=TOOL_TIMEOUT, timeouts=None):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.timeout = timeout
+        self.timeouts = TOOL_TIMEOUTS if timeouts is None else timeouts
+        self._tasks = set()
+
+    def timeout_for(self, name):
+        return self.timeouts.get(name, self.timeout)
+
+    async def _run_one(self, tool_call, call_function, dependencies, timeline):
+        if dependencies:
+            await asyncio.gather(*dependencies, return_exceptions=True)
+        name = tool_call.function.name
+        timeout = self.timeout_for(name)
+        async with self.semaphore:
+            with timeline.span("tool", name) if timeline else nullcontext():
+                try:
+                    return await asyncio.wait_for(call_function(tool_call), timeout)
+                except asyncio.TimeoutError:
+                    logging.warning(f"Tool {name} timed out after {timeout:g}s")
+                    return error_response(tool_call, f"Error: {name} timed out after {timeout:g}s. Try a simpler request.")
+                except Exception as error:
+                    logging.error(f"Tool {name} failed: {error}")
+                    return error_response(tool_call, f"Error running {name}: {error}")
+
+    async def run(self, tool_calls, call_function, timeline=None):
+        """Run tool calls and return their responses in the original order"""
+        tasks = []
+        for i, tool_call in enumerate(tool_calls):
+            name = tool_call.function.name
+            sql_key = _sql_argument(tool_call) if name in TOOL_DEPENDENCIES else None
+            dependencies = [
+                tasks[j] for j in range(i)
+                if sql_key is not None
+                and tool_calls[j].function.name in TOOL_DEPENDENCIES[name]
+                and _sql_argument(tool_calls[j]) == sql_key
+            ]
+            task = asyncio.ensure_future(self._run_one(tool_call, call_function, dependencies, timeline))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            tasks.append(task)
+        try:
+            return await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    def cancel(self):
+        """Cancel every tool call still in flight"""
+        for task in list(self._tasks):
+            task.cancel()
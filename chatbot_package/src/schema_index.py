@@ -0,0 +1,174 @@
+"""
+Offline relevance index over the dataset schema, to send only relevant tables/columns
+
+For a schema too large to paste whole into every prompt (more than
+SCHEMA_PRUNE_MIN_TOKENS), tables and columns are scored against the user's
+question with BM25 over their names (split into words), SQL comments and
+sample values. Only the top SCHEMA_TOP_TABLES tables, each with at most
+SCHEMA_TOP_COLUMNS columns, are rendered as CREATE statements for that
+question (the full schema when the question has no words to match). The index
+is built once per dataset version from the schema catalog.
+"""
+import math
+import os
+import re
+from collections import Counter, OrderedDict
+
+try:
+    from .encoder import estimate_tokens
+except ImportError:
+    from encoder import estimate_tokens
+
+SCHEMA_PRUNE_MIN_TOKENS = int(os.environ.get("SCHEMA_PRUNE_MIN_TOKENS", "1000"))
+SCHEMA_TOP_TABLES = int(os.environ.get("SCHEMA_TOP_TABLES", "3"))
+SCHEMA_TOP_COLUMNS = int(os.environ.get("SCHEMA_TOP_COLUMNS", "12"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+SAMPLE_VALUE_CHARS = 40
+RENDER_CACHE_SIZE = 128
+MAX_INDEXES = 16
+
+_WORD_PATTERN = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|[0-9]+")
+_COMMENT_PATTERN = re.compile(r"--([^\n]*)|/\*(.*?)\*/", re.DOTALL)
+
+
+def terms(text):
+    """Lowercase word terms, splitting snake_case and camelCase, with plural 's' dropped"""
+    words = []
+    for word in _WORD_PATTERN.findall(str(text)):
+        word = word.lower()
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def is_key_column(name):
+    """Columns kept in every pruned table so joins stay possible"""
+    name = name.lower()
+    return name == "id" or name.endswith("_id")
+
+
+def needs_pruning(catalog):
+    """Whether the catalog's schema is too large to send whole with every request"""
+    return catalog is not None and estimate_tokens(catalog.table_info) > SCHEMA_PRUNE_MIN_TOKENS
+
+
+class BM25:
+    """Okapi BM25 over documents given as term lists"""
+
+    def __init__(self, documents):
+        self.counts = [Counter(document) for document in documents]
+        self.lengths = [len(document) for document in documents]
+        self.average_length = sum(self.lengths) / len(documents) if documents else 0
+        frequency = Counter(term for counts in self.counts for term in counts)
+        total = len(documents)
+        self.idf = {term: math.log(1 + (total - n + 0.5) / (n + 0.5)) for term, n in frequency.items()}
+
+    def score(self, query_terms, index):
+        counts = self.counts[index]
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[index] / (self.average_length or 1))
+        score = 0.0
+        for term in query_terms:
+            count = counts.get(term)
+            if count:
+                score += self.idf[term] * count * (BM25_K1 + 1) / (count + norm)
+        return score
+
+
+class SchemaIndex:
+    """Per-question selection of relevant tables and columns for one dataset version"""
+
+    def __init__(self, catalog, top_tables=SCHEMA_TOP_TABLES, top_columns=SCHEMA_TOP_COLUMNS):
+        self.version = catalog.version
+        self.tables = catalog.tables
+        self.top_tables = top_tables
+        self.top_columns = top_columns
+        self._rendered = OrderedDict()  # question -> rendered schema
+
+        table_documents = []
+        column_documents = []
+        self._column_index = []  # (table position, column position) per column document
+        for t, table in enumerate(self.tables):
+            comments = " ".join(a or b for a, b in _COMMENT_PATTERN.findall(table["sql"] or ""))
+            table_terms = terms(table["name"]) * 3 + terms(comments)
+            for c, column in enumerate(table["columns"]):
+                samples = " ".join(
+                    str(row[c])[:SAMPLE_VALUE_CHARS] for row in table["sample_rows"]
+                    if c < len(row) and isinstance(row[c], str)
+                )
+                column_terms = terms(column["name"]) * 2 + terms(samples)
+                table_terms += column_terms
+                column_documents.append(column_terms + terms(table["name"]))
+                self._column_index.append((t, c))
+            table_documents.append(table_terms)
+        self.table_bm25 = BM25(table_documents)
+        self.column_bm25 = BM25(column_documents)
+
+    def select(self, question):
+        """[(table, [column, ...]), ...] most relevant to the question, columns in table order.
+
+        A question without any words to match falls back to the full schema.
+        """
+        query = terms(question)
+        if not query:
+            return [(table, list(table["columns"])) for table in self.tables]
+        scores = [self.table_bm25.score(query, t) for t in range(len(self.tables))]
+        ranked = sorted(range(len(self.tables)), key=lambda t: -scores[t])
+        chosen = [t for t in ranked if scores[t] > 0][:self.top_tables] or ranked[:self.top_tables]
+
+        column_scores = {}
+        for i, (t, c) in enumerate(self._column_index):
+            if t in chosen:
+                column_scores[(t, c)] = self.column_bm25.score(query, i)
+
+        selection = []
+        for t in chosen:
+            columns = self.tables[t]["columns"]
+            keep = {c for c, column in enumerate(columns) if is_key_column(column["name"])}
+            by_score = sorted(range(len(columns)), key=lambda c: -column_scores[(t, c)])
+            for c in [c for c in by_score if column_scores[(t, c)] > 0] + list(range(len(columns))):
+                if len(keep) >= self.top_columns:
+                    break
+                keep.add(c)
+            selection.append((self.tables[t], [columns[c] for c in sorted(keep)]))
+        return selection
+
+    def render(self, question):
+        """CREATE statements of the selected tables and columns, cached per question"""
+        text = self._rendered.get(question)
+        if text is not None:
+            self._rendered.move_to_end(question)
+            return text
+
+        blocks = []
+        for table, columns in self.select(question):
+            lines = [f"  {column['name']} {column['type']}".rstrip() for column in columns]
+            block = f"CREATE TABLE {table['name']} (\n" + ",\n".join(lines) + "\n)"
+            omitted = len(table["columns"]) - len(columns)
+            if omitted:
+                block += f" -- {omitted} more columns not shown"
+            blocks.append(block)
+        text = "\n".join(blocks)
+
+        self._rendered[question] = text
+        if len(self._rendered) > RENDER_CACHE_SIZE:
+            self._rendered.popitem(last=False)
+        return text
+
+    def message(self, question):
+        """System message with the schema relevant to the question"""
+        return {"role": "system", "content": f"Relevant database schema for this question:\n{self.render(question)}"}
+
+
+_indexes = {}  # dataset version -> SchemaIndex
+
+
+def schema_index(catalog):
+    """Index for the catalog's dataset version, shared by all sessions"""
+    index = _indexes.get(catalog.version)
+    if index is None:
+        if len(_indexes) >= MAX_INDEXES:
+            _indexes.clear()
+        index = _indexes[catalog.version] = SchemaIndex(catalog)
+    return index
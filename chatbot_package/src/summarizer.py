@@ -0,0 +1,147 @@
+"""
+Rolling summary of older conversation turns, so prompts stay flat as a session grows
+
+After a turn, once the messages not yet summarized pass SUMMARY_TRIGGER_TOKENS,
+everything except the newest SUMMARY_KEEP_TOKENS (cut at a user message) is
+merged with the previous summary into a new one by the LLM, in a background
+task. The summary is cached per session in the conversation store and sent
+in place of the messages it covers. When the LLM gives no usable summary, a
+local extractive one (questions, tool calls, answers) is used instead.
+"""
+import asyncio
+import logging
+import os
+
+try:
+    from .conversation_store import conversation_store
+    from .encoder import estimate_tokens, fit_to_budget
+except ImportError:
+    from conversation_store import conversation_store
+    from encoder import estimate_tokens, fit_to_budget
+
+SUMMARIZER = os.environ.get("SUMMARIZER", "1") == "1"
+SUMMARY_TRIGGER_TOKENS = int(os.environ.get("SUMMARY_TRIGGER_TOKENS", "1500"))
+SUMMARY_KEEP_TOKENS = int(os.environ.get("SUMMARY_KEEP_TOKENS", "500"))
+SUMMARY_MAX_TOKENS = int(os.environ.get("SUMMARY_MAX_TOKENS", "300"))
+SUMMARY_TOOL_RESULT_TOKENS = 150
+
+SUMMARY_PROMPT = """You maintain the running summary of a data analysis conversation.
+Merge the previous summary and the new messages into one updated summary of at most {words} words.
+Keep the user's goals, the tables, columns and SQL that worked, key numbers and conclusions, and open questions.
+Reply with the summary only."""
+
+
+def transcript_lines(messages):
+    """One short line per message; tool results are cut to a few tokens"""
+    lines = []
+    for message in messages:
+        role = message.get("role")
+        content = message.get("content") or ""
+        if role == "user":
+            lines.append(f"User: {content}")
+        elif role == "assistant":
+            for tool_call in message.get("tool_calls") or []:
+                function = tool_call["function"]
+                lines.append(f"Assistant called {function['name']}({function.get('arguments') or ''})")
+            if content:
+                lines.append(f"Assistant: {content}")
+        elif role == "tool":
+            result = fit_to_budget(str(content), SUMMARY_TOOL_RESULT_TOKENS)
+            lines.append(f"{message.get('name', 'tool')} result: {result}")
+    return lines
+
+
+def local_summary(previous, messages, max_tokens=SUMMARY_MAX_TOKENS):
+    """Extractive summary: the newest transcript lines (and earlier summary) that fit max_tokens"""
+    lines = previous.splitlines() if previous else []
+    lines += [line.splitlines()[0] for line in transcript_lines(messages) if line.strip()]
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        used += estimate_tokens(line)
+        if used > max_tokens:
+            break
+        kept.append(line)
+    return "\n".join(reversed(kept))
+
+
+def split_point(rows, keep_tokens):
+    """Seq of the last message to summarize: what precedes the newest keep_tokens, cut at a user message.
+
+    rows are (seq, role, tokens, message) oldest first; None when nothing
+    before the latest user message can be summarized.
+    """
+    boundary = None
+    kept = 0
+    for index in range(len(rows) - 1, 0, -1):
+        seq, role, tokens, _ = rows[index]
+        kept += tokens
+        if role == "user":
+            if boundary is not None and kept > keep_tokens:
+                break
+            boundary = rows[index - 1][0]
+    return boundary
+
+
+class Summarizer:
+    """Keeps each session's rolling summary up to date, off the request path"""
+
+    def __init__(self, provider, store=conversation_store, trigger_tokens=SUMMARY_TRIGGER_TOKENS,
+                 keep_tokens=SUMMARY_KEEP_TOKENS, max_tokens=SUMMARY_MAX_TOKENS, enabled=SUMMARIZER):
+        self.provider = provider
+        self.store = store
+        self.trigger_tokens = trigger_tokens
+        self.keep_tokens = keep_tokens
+        self.max_tokens = max_tokens
+        self.enabled = enabled
+        self._tasks = {}
+
+    def schedule(self, session_id):
+        """Update the session's summary in a background task; returns the task (or None)"""
+        if not self.enabled:
+            return None
+        task = self._tasks.get(session_id)
+        if task is None:
+            task = asyncio.create_task(self.update(session_id))
+            self._tasks[session_id] = task
+            task.add_done_callback(lambda _: self._tasks.pop(session_id, None))
+        return task
+
+    async def update(self, session_id):
+        """Fold older messages into the summary once the unsummarized part passes the trigger"""
+        try:
+            upto_seq, previous = await asyncio.to_thread(self.store.summary, session_id)
+            rows = await asyncio.to_thread(self.store.since, session_id, upto_seq)
+            if sum(tokens for _, _, tokens, _ in rows) < self.trigger_tokens:
+                return None
+            boundary = split_point(rows, self.keep_tokens)
+            if boundary is None:
+                return None
+            older = [message for seq, _, _, message in rows if seq <= boundary]
+
+            summary = await self._llm_summary(previous, older)
+            if not summary:
+                summary = local_summary(previous, older, self.max_tokens)
+            summary = fit_to_budget(summary, self.max_tokens)
+            await asyncio.to_thread(self.store.save_summary, session_id, boundary, summary)
+            print(f"📝 Summarized {len(older)} messages into {estimate_tokens(summary)} tokens")
+            return summary
+        except Exception as e:
+            logging.warning(f"Could not update the conversation summary: {e}")
+            return None
+
+    async def _llm_summary(self, previous, messages):
+        request = "\n".join(transcript_lines(messages))
+        if previous:
+            request = f"Previous summary:\n{previous}\n\nNew messages:\n{request}"
+        try:
+            response = await self.provider.complete([
+                {"role": "system", "content": SUMMARY_PROMPT.format(words=int(self.max_tokens * 0.7))},
+                {"role": "user", "content": request},
+            ])
+        except Exception as e:
+            logging.warning(f"LLM summary failed, using a local summary: {e}")
+            return None
+        if getattr(response, "tool_calls", None):
+            return None
+        return (response.content or "").strip() or None
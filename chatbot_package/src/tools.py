@@ -1,21 +1,94 @@
-import sqlite3
+import importlib.util
 import os
+import time
+
+# Plotly is imported on the first chart (see _plotly), not at startup
+PLOTLY_AVAILABLE = importlib.util.find_spec("plotly") is not None
+if not PLOTLY_AVAILABLE:
+    print("Warning: Plotly not available, charts will be text-based")
+
 try:
-    import plotly.graph_objs as go
-    import plotly.io as pio
-    PLOTLY_AVAILABLE = True
+    from .utils import render_table
 except ImportError:
-    PLOTLY_AVAILABLE = False
-    print("Warning: Plotly not available, charts will be text-based")
+    from utils import render_table
+
+try:
+    from .db import get_db_path, dataset_version, DatabaseNotFoundError
+except ImportError:
+    from db import get_db_path, dataset_version, DatabaseNotFoundError
+
+try:
+    from .cache import ResultCache, normalize_sql, estimate_rows_size
+except ImportError:
+    from cache import ResultCache, normalize_sql, estimate_rows_size
+
+try:
+    from .executor import run_db, QueryTimeoutError
+except ImportError:
+    from executor import run_db, QueryTimeoutError
+
+try:
+    from .catalog import get_catalog
+except ImportError:
+    from catalog import get_catalog
+
+try:
+    from .encoder import ColumnProfile, profile_rows, encode_result
+except ImportError:
+    from encoder import ColumnProfile, profile_rows, encode_result
+
+try:
+    from .index_advisor import IndexAdvisor
+except ImportError:
+    from index_advisor import IndexAdvisor
 
 try:
-    from .utils import convert_to_json, json_to_markdown_table
+    from .rollups import rollup_query
 except ImportError:
-    # Fallback functions if utils import fails
-    def convert_to_json(data):
-        return str(data)
-    def json_to_markdown_table(data):
-        return str(data)
+    from rollups import rollup_query
+
+try:
+    from .chart_store import ChartStore, chart_key, CHART_KEY_PREFIX
+except ImportError:
+    from chart_store import ChartStore, chart_key, CHART_KEY_PREFIX
+
+# Result preview settings
+PREVIEW_ROWS = int(os.environ.get("RESULT_PREVIEW_ROWS", "20"))
+RESULT_COUNT_CAP = int(os.environ.get("RESULT_COUNT_CAP", "100000"))
+COUNT_BATCH_SIZE = 1000
+
+# Result cache settings
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "300"))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "256"))
+RESULT_CACHE_MAX_MB = float(os.environ.get("RESULT_CACHE_MAX_MB", "64"))
+
+# Shared by run_sqlite_query and plot_chart, keyed by dataset version + normalized SQL
+result_cache = ResultCache(
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=int(RESULT_CACHE_MAX_MB * 1024 * 1024),
+    ttl=RESULT_CACHE_TTL,
+)
+
+# Chart store settings
+CHART_STORE_MAX_ENTRIES = int(os.environ.get("CHART_STORE_MAX_ENTRIES", "64"))
+CHART_STORE_MAX_MB = float(os.environ.get("CHART_STORE_MAX_MB", "32"))
+
+# Figures built by plot_chart, keyed by dataset version + normalized SQL + plot parameters
+chart_store = ChartStore(
+    max_entries=CHART_STORE_MAX_ENTRIES,
+    max_bytes=int(CHART_STORE_MAX_MB * 1024 * 1024),
+)
+
+
+def _plotly():
+    """plotly.graph_objs and plotly.io, imported on first use"""
+    import plotly.graph_objs as go
+    import plotly.io as pio
+    return go, pio
+
+
+# Explains executed queries and indexes recurring table scans in the background
+index_advisor = IndexAdvisor()
 
 # function calling
 # avialable tools
@@ -94,60 +167,122 @@ tools_schema = [
 ]
 
 
+def _fetch_all(connection, sql_query):
+    """Execute a query and return (rows, column_names); runs in the executor"""
+    cursor = connection.cursor()
+    cursor.execute(sql_query)
+    column_names = [desc[0] for desc in cursor.description]
+    return cursor.fetchall(), column_names
+
+
+def _fetch_preview(connection, sql_query, limit, count_cap):
+    """Read the first `limit` rows and count and profile the rest without keeping them.
+
+    Returns (rows, column_names, total, capped, summaries); capped is True when
+    counting stopped at count_cap. Runs in the executor.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(sql_query)
+        column_names = [desc[0] for desc in cursor.description]
+        profiles = [ColumnProfile(name) for name in column_names]
+        rows = cursor.fetchmany(limit)
+        profile_rows(profiles, rows)
+        total = len(rows)
+        capped = False
+        if total == limit:
+            # Only one batch of rows is alive at a time, so memory stays flat
+            while total < count_cap:
+                batch = cursor.fetchmany(min(COUNT_BATCH_SIZE, count_cap - total))
+                if not batch:
+                    break
+                profile_rows(profiles, batch)
+                total += len(batch)
+            capped = total >= count_cap and cursor.fetchone() is not None
+        return rows, column_names, total, capped, [profile.summary() for profile in profiles]
+    finally:
+        cursor.close()
+
+
+async def _query_preview(sql_query, db_path):
+    """Preview rows and row count of a query, served from the result cache when possible"""
+    version = dataset_version(db_path)
+    result_cache.check_version(version)
+    sql_key = normalize_sql(sql_query)
+
+    cached = result_cache.get((version, sql_key, "preview"), record=False)
+    if cached is None:
+        full = result_cache.get((version, sql_key, "full"), record=False)
+        if full is not None:
+            rows, column_names = full
+            profiles = [ColumnProfile(name) for name in column_names]
+            profile_rows(profiles, rows)
+            summaries = [profile.summary() for profile in profiles]
+            cached = (rows[:PREVIEW_ROWS], column_names, len(rows), False, summaries)
+    result_cache.record(cached is not None)
+    if cached is not None:
+        return cached
+
+    # Simple GROUP BY queries are answered from the rollup tables built at ingestion
+    executed_sql = await rollup_query(sql_query, db_path, version) or sql_query
+    started = time.perf_counter()
+    preview = await run_db(
+        _fetch_preview, executed_sql, PREVIEW_ROWS, RESULT_COUNT_CAP, db_path=db_path, version=version
+    )
+    index_advisor.observe(executed_sql, db_path, version, time.perf_counter() - started)
+    result_cache.put((version, sql_key, "preview"), preview, estimate_rows_size(preview[0]))
+    return preview
+
+
+async def _query_all(sql_query, db_path):
+    """All rows of a query, served from the result cache when possible"""
+    version = dataset_version(db_path)
+    result_cache.check_version(version)
+    sql_key = normalize_sql(sql_query)
+
+    cached = result_cache.get((version, sql_key, "full"), record=False)
+    if cached is None:
+        # A preview that already holds every row is as good as a full result
+        preview = result_cache.get((version, sql_key, "preview"), record=False)
+        if preview is not None and preview[2] == len(preview[0]):
+            cached = (preview[0], preview[1])
+    result_cache.record(cached is not None)
+    if cached is not None:
+        return cached
+
+    executed_sql = await rollup_query(sql_query, db_path, version) or sql_query
+    started = time.perf_counter()
+    result = await run_db(_fetch_all, executed_sql, db_path=db_path, version=version)
+    index_advisor.observe(executed_sql, db_path, version, time.perf_counter() - started)
+    result_cache.put((version, sql_key, "full"), result, estimate_rows_size(result[0]))
+    return result
+
+
 async def get_table_schema():
     """Get the schema and column information of the main_table"""
     try:
         # Get database path from environment
-        db_path = os.getenv('CHATBOT_DB_PATH', '/tmp/dataset_1.db')
+        db_path = get_db_path()
         print(f"Getting schema for database: {db_path}")
         
-        if not os.path.exists(db_path):
-            return "Error: Database not found. Please upload a dataset first."
-        
-        connection = sqlite3.connect(db_path)
-        cursor = connection.cursor()
-        
-        # Get table schema
-        cursor.execute("PRAGMA table_info(main_table)")
-        schema_info = cursor.fetchall()
-        
-        # Get sample data to understand the content
-        cursor.execute("SELECT * FROM main_table LIMIT 3")
-        sample_data = cursor.fetchall()
-        
-        # Get column names
-        cursor.execute("SELECT * FROM main_table LIMIT 1")
-        column_names = [desc[0] for desc in cursor.description]
-        
-        connection.close()
+        # Built once per dataset version and shared by every session
+        catalog = await get_catalog(db_path)
         
-        if not schema_info:
+        if catalog.schema_text is None:
             return "Error: main_table not found in database."
         
-        # Format schema information
-        schema_text = "## Dataset Schema\n\n"
-        schema_text += "**Table:** main_table\n\n"
-        schema_text += "**Columns:**\n"
-        
-        for info in schema_info:
-            col_name, col_type, not_null, default_val, pk = info
-            schema_text += f"- `{col_name}` ({col_type})\n"
-        
-        schema_text += f"\n**Sample Data (first 3 rows):**\n"
-        for i, row in enumerate(sample_data):
-            schema_text += f"Row {i+1}: "
-            for j, col_name in enumerate(column_names):
-                schema_text += f"{col_name}={row[j]}, "
-            schema_text = schema_text.rstrip(", ") + "\n"
-            
-        return schema_text
+        return catalog.schema_text
         
+    except DatabaseNotFoundError:
+        return "Error: Database not found. Please upload a dataset first."
     except Exception as error:
         print(f"Error getting schema: {error}")
         return f"Error getting schema: {error}"
 
 
 async def run_postgres_query(sql_query, markdown=True):
+    import psycopg2  # optional, only needed for PostgreSQL datasets
+
     connection = None  # Initialize connection variable outside the try block
     try:
         # Establish the connection
@@ -173,8 +308,7 @@ async def run_postgres_query(sql_query, markdown=True):
         result = cursor.fetchall()
         if markdown:
             # get result in json
-            json_data = convert_to_json(result,column_names)
-            markdown_data = json_to_markdown_table(json_data)
+            markdown_data = render_table(result, column_names)
 
             return markdown_data
 
@@ -195,72 +329,54 @@ async def run_postgres_query(sql_query, markdown=True):
 
 async def run_sqlite_query(sql_query, markdown=True):
     """Execute SQL query on the uploaded dataset"""
-    connection = None
+    db_path = get_db_path()
     try:
-        # Get database path from environment (set by backend when dataset is uploaded)
-        db_path = os.getenv('CHATBOT_DB_PATH', '/tmp/dataset_1.db')
         print(f"Using database: {db_path}")
         
-        if not os.path.exists(db_path):
-            return f"Error: Database not found at {db_path}. Please upload a dataset first."
-        
-        connection = sqlite3.connect(db_path)
-        cursor = connection.cursor()
-
-        # Execute the query
-        cursor.execute(sql_query)
-
-        # Fetch the column names
-        column_names = [desc[0] for desc in cursor.description]
-
-        # Fetch all rows
-        result = cursor.fetchall()
-        
         if markdown:
-            # Convert to JSON format for better display
-            json_data = convert_to_json(result, column_names)
-            
-            # Limit results to prevent token overflow
-            if len(result) > 20:
-                limited_json = json_data[:20]
-                markdown_data = json_to_markdown_table(limited_json)
-                markdown_data += f"\n\n*(Showing first 20 of {len(result)} rows)*"
-                return markdown_data
-            else:
-                markdown_data = json_to_markdown_table(json_data)
-                return markdown_data
+            # Stream only the preview rows to prevent token overflow
+            result, column_names, total, capped, summaries = await _query_preview(sql_query, db_path)
+            # Pick rows/columns and add column statistics to stay within the token budget
+            return encode_result(result, column_names, total, capped, summaries)
         
+        result, column_names = await _query_all(sql_query, db_path)
         return result, column_names
         
+    except DatabaseNotFoundError:
+        if markdown:
+            return f"Error: Database not found at {db_path}. Please upload a dataset first."
+        return [], []
+    except QueryTimeoutError as error:
+        print("SQLite query timed out:", error)
+        if markdown:
+            return f"Error: {error}. Try a more selective query."
+        return [], []
     except Exception as error:
         print("Error while executing SQLite query:", error)
         if markdown:
             return f"Error while executing the query: {error}"
         return [], []
 
-    finally:
-        if connection:
-            connection.close()
-
 
 async def plot_chart(plot_type, sql_query, plot_title, x_label, y_label, x_column, y_column):
     """Create charts from SQL query results"""
     try:
         # Get database path from environment
-        db_path = os.getenv('CHATBOT_DB_PATH', '/tmp/dataset_1.db')
+        db_path = get_db_path()
         
-        if not os.path.exists(db_path):
-            return "Error: Database not found. Please upload a dataset first."
+        # The same chart of the same data is served from the chart store
+        key = None
+        if PLOTLY_AVAILABLE:
+            params = {"plot_type": plot_type, "plot_title": plot_title, "x_label": x_label,
+                      "y_label": y_label, "x_column": x_column, "y_column": y_column}
+            key = chart_key(dataset_version(db_path), normalize_sql(sql_query), params)
+            stored = chart_store.get(key)
+            if stored is not None:
+                print(f"📊 Chart {key} served from the chart store")
+                return stored[1]
         
         # Execute SQL query to get data
-        connection = sqlite3.connect(db_path)
-        cursor = connection.cursor()
-        cursor.execute(sql_query)
-        
-        # Fetch column names and data
-        column_names = [desc[0] for desc in cursor.description]
-        result = cursor.fetchall()
-        connection.close()
+        result, column_names = await _query_all(sql_query, db_path)
         
         if not result:
             return "No data returned from query."
@@ -291,6 +407,7 @@ async def plot_chart(plot_type, sql_query, plot_title, x_label, y_label, x_colum
             return chart_text
         
         # Create Plotly chart
+        go, pio = _plotly()
         if plot_type == "bar":
             fig = go.Figure(data=[go.Bar(x=x_values, y=y_values)])
         elif plot_type == "line":
@@ -312,24 +429,20 @@ async def plot_chart(plot_type, sql_query, plot_title, x_label, y_label, x_colum
             template="plotly_white"
         )
         
-        # Convert to HTML and save to file instead of returning full HTML
-        chart_html = pio.to_html(fig, include_plotlyjs='cdn')
-        
-        # Save chart to file
-        chart_filename = f"chart_{hash(plot_title)}_{plot_type}.html"
-        chart_path = f"/tmp/{chart_filename}"
-        
-        with open(chart_path, 'w') as f:
-            f.write(chart_html)
-        
-        # Return concise summary instead of full HTML
+        # Return concise summary instead of the figure; the UI loads it by key
         summary = f"✅ {plot_type.title()} chart '{plot_title}' created successfully!\n"
         summary += f"📊 Data points: {len(x_values)}\n"
         summary += f"📈 Range: {min(y_values):.2f} to {max(y_values):.2f}\n"
-        summary += f"💾 Chart saved to: {chart_path}"
+        summary += f"🔑 Chart: {CHART_KEY_PREFIX}{key}"
+        
+        chart_store.put(key, pio.to_json(fig, validate=False), summary)
         
         return summary
         
+    except DatabaseNotFoundError:
+        return "Error: Database not found. Please upload a dataset first."
+    except QueryTimeoutError as error:
+        return f"Error: {error}. Try a more selective query."
     except Exception as error:
         print(f"Error creating chart: {error}")
         return f"Error creating chart: {error}"
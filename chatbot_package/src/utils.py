@@ -1,3 +1,7 @@
+import csv
+import io
+import json
+import os
 import sqlite3 
 
 EXTRA_SCHEMA_INFO = """
@@ -139,14 +143,91 @@ def convert_to_json(rows, column_names):
 def json_to_markdown_table(json_data):
     # Extract columns and data from JSON
     columns = json_data["columns"]
-    data = json_data["data"]
-
-    # Generate Markdown table header
-    markdown_table = "| " + " | ".join(columns) + " |\n"
-    markdown_table += "| " + " | ".join(["---"] * len(columns)) + " |\n"
-
-    # Generate Markdown table rows
-    for row in data:
-        markdown_table += "| " + " | ".join(str(row[column]) for column in columns) + " |\n"
-
-    return markdown_table
+    rows = [[row[column] for column in columns] for row in json_data["data"]]
+    return render_table(rows, columns, "markdown", max_cell_chars=None)
+
+
+# Table rendering settings
+TABLE_FORMATS = ("markdown", "csv", "json")
+TABLE_FORMAT = os.environ.get("TOOL_RESULT_FORMAT", "markdown")
+TABLE_MAX_CELL_CHARS = int(os.environ.get("TABLE_MAX_CELL_CHARS", "80"))
+
+
+def _truncate(text, limit):
+    if limit and len(text) > limit:
+        return text[:limit - 1] + "…"
+    return text
+
+
+def _markdown_cell(limit):
+    def format_cell(value):
+        if value is None:
+            return ""
+        text = _truncate(str(value), limit)
+        if "|" in text or "\n" in text:
+            text = text.replace("|", "\\|").replace("\r", " ").replace("\n", " ")
+        return text
+    return format_cell
+
+
+def _text_cell(limit):
+    def format_cell(value):
+        return "" if value is None else _truncate(str(value), limit)
+    return format_cell
+
+
+def _json_cell(limit):
+    def format_cell(value):
+        if isinstance(value, str):
+            return _truncate(value, limit)
+        if isinstance(value, bytes):
+            return f"<{len(value)} bytes>"
+        return value
+    return format_cell
+
+
+_CELL_FORMATTERS = {"markdown": _markdown_cell, "csv": _text_cell, "json": _json_cell}
+
+
+def render_table(rows, column_names, fmt=None, max_cell_chars=TABLE_MAX_CELL_CHARS, column_limits=None):
+    """Render row tuples as a markdown table, compact CSV or compact JSON.
+
+    Cells are formatted column by column straight from the row tuples and
+    joined once, so no per-row dicts or repeated string concatenation.
+    column_limits maps a column name to its own truncation width, overriding
+    max_cell_chars; None disables truncation.
+    """
+    fmt = fmt or TABLE_FORMAT
+    if fmt not in _CELL_FORMATTERS:
+        raise ValueError(f"Unknown table format: {fmt}")
+    column_names = list(column_names)
+    column_limits = column_limits or {}
+    make_formatter = _CELL_FORMATTERS[fmt]
+
+    # Columnar pass: one formatter per column applied with map()
+    columns = [
+        list(map(make_formatter(column_limits.get(name, max_cell_chars)), values))
+        for name, values in zip(column_names, zip(*rows))
+    ]
+    formatted_rows = zip(*columns) if columns else ()
+
+    if fmt == "json":
+        return json.dumps(
+            {"columns": column_names, "rows": [list(row) for row in formatted_rows]},
+            separators=(",", ":"), ensure_ascii=False, default=str,
+        )
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(column_names)
+        writer.writerows(formatted_rows)
+        return buffer.getvalue()
+
+    header = _markdown_cell(None)
+    lines = [
+        "| " + " | ".join(map(header, column_names)) + " |",
+        "| " + " | ".join(["---"] * len(column_names)) + " |",
+    ]
+    lines.extend("| " + " | ".join(row) + " |" for row in formatted_rows)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,23 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+# the chatbot modules import each other as top-level modules, like app.py does
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """A small dataset database with main_table(category, amount)"""
+    db_path = tmp_path / "dataset.db"
+    connection = sqlite3.connect(db_path)
+    connection.execute("CREATE TABLE main_table (category TEXT, amount INTEGER)")
+    connection.executemany(
+        "INSERT INTO main_table VALUES (?, ?)",
+        [("a", 1), ("b", 2), ("a", 3), ("c", None), (None, 5)],
+    )
+    connection.commit()
+    connection.close()
+    return str(db_path)
@@ -0,0 +1,91 @@
+import pytest
+
+from answer_cache import AnswerCache, features, guard_terms
+
+DATASET = ("/data/movies.db", "abc")
+CALLS = [("run_sqlite_query", '{"sql_query": "SELECT 1"}')]
+
+
+def _cache_with(question):
+    cache = AnswerCache(max_entries=8, min_similarity=0.75)
+    cache.store(DATASET, question, CALLS)
+    return cache
+
+
+def test_exact_match_ignores_case_punctuation_and_stopwords():
+    cache = _cache_with("What are the top 5 highest rated movies?")
+    assert cache.lookup(DATASET, "top 5 highest rated movies") is not None
+    assert cache.stats()["exact_hits"] == 1
+
+
+REPHRASINGS = [
+    ("average runtime of drama movies per director and release year",
+     "average runtime of drama movies per director and year"),
+    ("number of drama movies per director and release year with total revenue and votes",
+     "count of drama movies per director and release year with total revenue and votes"),
+]
+
+BASE = "drama movies per director and release year with total revenue, average budget and votes"
+MEANING_FLIPS = [
+    # direction
+    ("highest total revenue of drama movies per director and release year with average budget and votes",
+     "lowest total revenue of drama movies per director and release year with average budget and votes"),
+    ("drama movies per director and release year with the most votes, total revenue and average budget",
+     "drama movies per director and release year with the least votes, total revenue and average budget"),
+    ("top rated " + BASE, "bottom rated " + BASE),
+    # comparison
+    ("drama movies released before 2000 per director and year with total revenue, average budget and votes",
+     "drama movies released after 2000 per director and year with total revenue, average budget and votes"),
+    ("drama movies with budget above 100 per director and release year with total revenue and average votes",
+     "drama movies with budget below 100 per director and release year with total revenue and average votes"),
+    # negation
+    (BASE, BASE + " not in english"),
+    (BASE, BASE.replace("with total", "without total")),
+    ("drama movies that did win an oscar per director and release year with total revenue, average budget and votes",
+     "drama movies that didn't win an oscar per director and release year with total revenue, average budget and votes"),
+]
+
+
+def _similarity(a, b):
+    a, b = features(a), features(b)
+    return len(a & b) / len(a | b)
+
+
+@pytest.mark.parametrize("stored, asked", REPHRASINGS)
+def test_rephrasings_reuse_the_sql(stored, asked):
+    cache = _cache_with(stored)
+    assert cache.lookup(DATASET, asked) is not None
+    assert cache.stats()["fuzzy_hits"] == 1
+
+
+@pytest.mark.parametrize("stored, asked", MEANING_FLIPS)
+def test_meaning_flips_do_not_reuse_the_sql(stored, asked):
+    # similar enough wording that only the guard words tell them apart
+    assert _similarity(stored, asked) >= 0.75
+    cache = _cache_with(stored)
+    assert cache.lookup(DATASET, asked) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_different_numbers_do_not_match():
+    cache = _cache_with("top 5 highest rated movies per director and year")
+    assert cache.lookup(DATASET, "top 10 highest rated movies per director and year") is None
+
+
+def test_other_dataset_does_not_match():
+    cache = _cache_with("top 5 highest rated movies")
+    assert cache.lookup(("/data/other.db", "abc"), "top 5 highest rated movies") is None
+
+
+def test_guard_terms():
+    assert guard_terms("Movies with the HIGHEST score, excluding dramas") == {"highest", "excluding"}
+    assert guard_terms("movies that aren't dramas") == {"not"}
+    assert guard_terms("average score of movies") == frozenset()
+
+
+def test_lru_eviction():
+    cache = AnswerCache(max_entries=2)
+    for question in ("movies per year", "actors per movie", "directors per genre"):
+        cache.store(DATASET, question, CALLS)
+    assert cache.lookup(DATASET, "movies per year") is None
+    assert cache.stats()["evictions"] == 1
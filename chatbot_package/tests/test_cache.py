@@ -0,0 +1,72 @@
+import sqlite3
+import time
+
+from cache import ResultCache, normalize_sql
+
+VERSION = ("/data/a.db", 1, 100, 10)
+NEW_VERSION = ("/data/a.db", 1, 200, 20)
+OTHER_DATASET = ("/data/b.db", 2, 100, 10)
+
+
+def test_normalize_sql_ignores_case_whitespace_and_semicolons_outside_literals():
+    assert normalize_sql("SELECT  *\nFROM Main_Table WHERE x = 'A b';") == "select*from main_table where x='A b'"
+    assert normalize_sql("select * from t where x='a'") != normalize_sql("select * from t where x='A'")
+
+
+def test_lru_eviction_by_entry_count():
+    cache = ResultCache(max_entries=2)
+    cache.put((VERSION, "a"), 1, 10)
+    cache.put((VERSION, "b"), 2, 10)
+    cache.get((VERSION, "a"))  # a is now the most recently used
+    cache.put((VERSION, "c"), 3, 10)
+    assert cache.get((VERSION, "b")) is None
+    assert cache.get((VERSION, "a")) == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_by_total_size():
+    cache = ResultCache(max_bytes=100)
+    cache.put((VERSION, "a"), 1, 60)
+    cache.put((VERSION, "b"), 2, 60)
+    assert cache.get((VERSION, "a")) is None
+    assert cache.stats()["bytes"] == 60
+    assert not cache.put((VERSION, "huge"), 3, 101)
+
+
+def test_entries_expire_after_ttl():
+    cache = ResultCache(ttl=0.01)
+    cache.put((VERSION, "a"), 1, 10)
+    time.sleep(0.02)
+    assert cache.get((VERSION, "a")) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_changed_dataset_version_drops_only_that_datasets_entries():
+    cache = ResultCache()
+    cache.check_version(VERSION)
+    cache.check_version(OTHER_DATASET)
+    cache.put((VERSION, "a"), 1, 10)
+    cache.put((OTHER_DATASET, "a"), 2, 10)
+    cache.check_version(NEW_VERSION)
+    assert cache.get((VERSION, "a")) is None
+    assert cache.get((OTHER_DATASET, "a")) == 2
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_hit_rate():
+    cache = ResultCache()
+    cache.put((VERSION, "a"), 1, 10)
+    cache.get((VERSION, "a"))
+    cache.get((VERSION, "missing"))
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_normalize_sql_keeps_double_quoted_text_as_written(dataset):
+    upper = 'SELECT COUNT(*) FROM main_table WHERE category = "A"'
+    lower = 'SELECT COUNT(*) FROM main_table WHERE category = "a"'
+    with sqlite3.connect(dataset) as connection:
+        # no column is called a or A, so SQLite compares against the string
+        assert connection.execute(upper).fetchone() != connection.execute(lower).fetchone()
+    assert normalize_sql(upper) != normalize_sql(lower)
+    assert normalize_sql(upper) == 'select count(*)from main_table where category="A"'
+    assert normalize_sql('SELECT "x ""Y""" FROM t') == 'select "x ""Y""" from t'
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import sqlite3
+import threading
+
+import pytest
+
+import catalog
+from catalog import get_catalog, sidecar_path
+
+
+def _catalog(path):
+    return asyncio.run(get_catalog(path))
+
+
+def _forget(path):
+    """Drop the in-memory copy, as a new process would start without it"""
+    catalog._catalogs.pop(path, None)
+
+
+def _main_table(schema):
+    return schema.table("main_table")
+
+
+def test_the_catalog_is_built_once_and_written_next_to_the_database(dataset):
+    first = _catalog(dataset)
+    assert _main_table(first)["row_count"] == 5
+    assert [column["name"] for column in _main_table(first)["columns"]] == ["category", "amount"]
+    assert _catalog(dataset) is first
+    assert json.loads(open(sidecar_path(dataset)).read())["version"] == list(first.version[1:])
+
+
+def test_a_matching_sidecar_is_used_without_touching_the_database(dataset, monkeypatch):
+    built = _catalog(dataset)
+    _forget(dataset)
+    monkeypatch.setattr(catalog, "_build_tables", lambda connection: pytest.fail("the catalog was rebuilt"))
+    loaded = _catalog(dataset)
+    assert loaded is not built
+    assert loaded.table_info == built.table_info
+
+
+def test_a_sidecar_of_another_dataset_version_is_rebuilt(dataset):
+    _catalog(dataset)
+    _forget(dataset)
+    with sqlite3.connect(dataset) as connection:
+        connection.execute("INSERT INTO main_table VALUES ('d', 9)")
+    connection.close()
+
+    rebuilt = _catalog(dataset)
+    assert _main_table(rebuilt)["row_count"] == 6
+    assert json.loads(open(sidecar_path(dataset)).read())["version"] == list(rebuilt.version[1:])
+
+
+def test_a_stale_sidecar_left_by_an_older_dataset_is_rebuilt(dataset):
+    stale = {"format": catalog.CATALOG_FORMAT, "version": [0, 0, 0],
+             "tables": [{"name": "old", "sql": "CREATE TABLE old (x)", "columns": [], "sample_rows": []}]}
+    with open(sidecar_path(dataset), "w") as f:
+        json.dump(stale, f)
+
+    rebuilt = _catalog(dataset)
+    assert rebuilt.table("old") is None
+    assert _main_table(rebuilt)["row_count"] == 5
+
+
+def test_the_sidecar_is_read_and_written_off_the_event_loop(dataset, monkeypatch):
+    threads = []
+    for name in ("_load_sidecar", "_save_sidecar"):
+        original = getattr(catalog, name)
+
+        def record(*args, original=original, name=name):
+            threads.append((name, threading.current_thread()))
+            return original(*args)
+        monkeypatch.setattr(catalog, name, record)
+
+    _catalog(dataset)
+    assert [name for name, _ in threads] == ["_load_sidecar", "_save_sidecar"]
+    assert all(thread is not threading.main_thread() for _, thread in threads)
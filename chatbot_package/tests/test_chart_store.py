@@ -0,0 +1,47 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import tools
+from cache import normalize_sql
+from chart_store import chart_key, find_chart_keys
+from db import use_session_db
+
+PARAMS = {"plot_type": "bar", "plot_title": "Movies", "x_label": "Genre", "y_label": "Count",
+          "x_column": "genre", "y_column": "n"}
+
+
+@pytest.fixture
+def movies(tmp_path):
+    db_path = tmp_path / "movies.db"
+    with sqlite3.connect(db_path) as connection:
+        connection.execute("CREATE TABLE main_table (genre TEXT)")
+        connection.executemany("INSERT INTO main_table VALUES (?)", [("Drama",), ("drama",), ("drama",)])
+    return str(db_path)
+
+
+def _chart(db_path, value):
+    sql = f'SELECT genre, COUNT(*) AS n FROM main_table WHERE genre = "{value}" GROUP BY genre'
+
+    async def run():
+        use_session_db(db_path)
+        return await tools.plot_chart(sql_query=sql, **PARAMS)
+    return asyncio.run(run())
+
+
+def test_chart_key_keeps_double_quoted_values_apart():
+    version = ("/data/a.db", 1, 100, 10)
+    upper = normalize_sql('SELECT genre FROM main_table WHERE genre = "Drama"')
+    lower = normalize_sql('SELECT genre FROM main_table WHERE genre = "drama"')
+    assert chart_key(version, upper, PARAMS) != chart_key(version, lower, PARAMS)
+    spaced = normalize_sql('select genre  from MAIN_TABLE where genre="Drama";')
+    assert chart_key(version, upper, PARAMS) == chart_key(version, spaced, PARAMS)
+
+
+def test_plot_chart_serves_each_quoted_value_its_own_chart(movies):
+    upper, lower = _chart(movies, "Drama"), _chart(movies, "drama")
+    assert find_chart_keys(upper) != find_chart_keys(lower)
+    assert "Range: 1.00 to 1.00" in upper
+    assert "Range: 2.00 to 2.00" in lower
+    assert _chart(movies, "Drama") == upper
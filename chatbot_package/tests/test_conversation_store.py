@@ -0,0 +1,90 @@
+import asyncio
+import threading
+
+import pytest
+
+from conversation_store import ConversationStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ConversationStore(str(tmp_path / "conversations.db"))
+
+
+def _turn(question, tool_results=0, answer="ok"):
+    messages = [{"role": "user", "content": question}]
+    for i in range(tool_results):
+        messages.append({"role": "assistant", "tool_calls": [{"id": f"c{i}", "function": {"name": "q"}}]})
+        messages.append({"role": "tool", "tool_call_id": f"c{i}", "content": "x"})
+    return messages + [{"role": "assistant", "content": answer}]
+
+
+def test_window_starts_at_a_user_message_within_the_budget(store):
+    store.append("s", _turn("first " + "word " * 200))
+    store.append("s", _turn("second"))
+    window = store.window("s", token_budget=50)
+    assert window[0] == {"role": "user", "content": "second"}
+    assert len(window) == 2
+    assert [m["role"] for m in store.window("s", token_budget=10_000)] == ["user", "assistant"] * 2
+
+
+def test_window_keeps_the_latest_turn_even_over_budget(store):
+    store.append("s", _turn("only " + "word " * 500))
+    assert store.window("s", token_budget=10)[0]["role"] == "user"
+
+
+def test_window_keeps_a_turn_longer_than_max_messages(store):
+    store.append("s", _turn("earlier"))
+    store.append("s", _turn("many tools", tool_results=30))
+    window = store.window("s", token_budget=100_000, max_messages=40)
+    assert window[0] == {"role": "user", "content": "many tools"}
+    assert len(window) == 62
+
+
+def test_window_skips_summarized_messages(store):
+    store.append("s", _turn("first"))
+    store.append("s", _turn("second"))
+    assert store.window("s", after_seq=2)[0]["content"] == "second"
+    assert store.window("s", after_seq=4) == []
+
+
+def test_summary_only_moves_forward(store):
+    store.append("s", _turn("first"))
+    store.save_summary("s", 2, "newer")
+    store.save_summary("s", 1, "older")
+    assert store.summary("s") == (2, "newer")
+    assert store.summary("other") == (0, None)
+
+
+def test_sessions_are_separate(store):
+    store.append("a", _turn("for a"))
+    store.append("b", _turn("for b"))
+    assert store.count("a") == 2
+    assert store.history("b")[0]["content"] == "for b"
+
+
+def test_bot_reads_and_writes_the_store_off_the_event_loop(store):
+    from bot import ChatBot
+    from llm import MockProvider
+
+    threads = set()
+
+    class RecordingStore(ConversationStore):
+        def append(self, *args):
+            threads.add(threading.current_thread())
+            return super().append(*args)
+
+        def window(self, *args, **kwargs):
+            threads.add(threading.current_thread())
+            return super().window(*args, **kwargs)
+
+    async def turn():
+        bot = ChatBot("rules", [], {}, provider=MockProvider(script=[{"content": "answer"}]),
+                      store=RecordingStore(store.path))
+        async for _ in bot.stream("question"):
+            pass
+        return bot
+
+    bot = asyncio.run(turn())
+    assert threads and threading.main_thread() not in threads
+    assert [m["role"] for m in bot.store.history(bot.session_id)] == ["user", "assistant"]
@@ -0,0 +1,86 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import sqlite3
+
+import pytest
+
+import db
+
+
+def test_pool_reuses_released_connections(dataset):
+    pool = db.ConnectionPool(dataset, max_size=2)
+    with pool.connection() as connection:
+        first = connection
+        assert connection.execute("SELECT COUNT(*) FROM main_table").fetchone() == (5,)
+    with pool.connection() as connection:
+        assert connection is first
+    assert pool.stats()["hits"] == 1
+    assert pool.stats()["misses"] == 1
+    pool.close()
+
+
+def test_pool_connections_are_read_only(dataset):
+    pool = db.ConnectionPool(dataset)
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as connection:
+            connection.execute("DELETE FROM main_table")
+    pool.close()
+
+
+def test_pool_discards_connections_beyond_max_size(dataset):
+    pool = db.ConnectionPool(dataset, max_size=1)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    assert pool.stats()["idle"] == 1
+    assert pool.stats()["discarded"] == 1
+    pool.close()
+
+
+def test_missing_database_raises(tmp_path):
+    pool = db.ConnectionPool(str(tmp_path / "missing.db"))
+    with pytest.raises(db.DatabaseNotFoundError):
+        pool.acquire()
+    with pytest.raises(db.DatabaseNotFoundError):
+        db.dataset_version(str(tmp_path / "missing.db"))
+
+
+def test_get_pool_resets_when_the_file_is_replaced(dataset, tmp_path):
+    old_pool = db.get_pool(dataset, db.dataset_version(dataset))
+    assert db.get_pool(dataset, db.dataset_version(dataset)) is old_pool
+
+    replacement = tmp_path / "replacement.db"
+    sqlite3.connect(replacement).execute("CREATE TABLE main_table (x)").connection.close()
+    os.replace(replacement, dataset)
+    new_pool = db.get_pool(dataset, db.dataset_version(dataset))
+    assert new_pool is not old_pool
+    db.close_pool(dataset)
+
+
+def _token(user_id, secret):
+    # how the Django site signs it (chatbot.ingest.dataset_token)
+    return f"{user_id}." + hmac.new(secret.encode(), str(user_id).encode(), hashlib.sha256).hexdigest()
+
+
+def test_dataset_token_selects_the_users_database(monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH_TEMPLATE", "/data/dataset_{user_id}.db")
+    assert db.db_path_for_token(_token(7, "s3cret"), secret="s3cret") == "/data/dataset_7.db"
+    assert db.db_path_for_token(_token(7, "other"), secret="s3cret") is None
+    assert db.db_path_for_token("7.", secret="s3cret") is None
+    assert db.db_path_for_token("../x." + "0" * 64, secret="s3cret") is None
+    assert db.db_path_for_token(_token(7, "s3cret"), secret=None) is None
+
+
+def test_session_database_overrides_the_default(monkeypatch):
+    monkeypatch.setenv("CHATBOT_DB_PATH", "/data/default.db")
+
+    async def session(path):
+        db.use_session_db(path)
+        return db.get_db_path()
+
+    assert asyncio.run(session("/data/dataset_7.db")) == "/data/dataset_7.db"
+    assert asyncio.run(session(None)) == "/data/default.db"
+    # the override stays inside the task that set it
+    assert db.get_db_path() == "/data/default.db"
@@ -0,0 +1,42 @@
+from encoder import ColumnProfile, encode_result, estimate_tokens, fit_to_budget, profile_rows
+
+
+def test_estimate_tokens_counts_words_and_punctuation():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a, b") == 3
+    assert estimate_tokens("abcdefgh") == 2
+
+
+def test_fit_to_budget_keeps_short_text_and_truncates_long_text():
+    assert fit_to_budget("short text", 100) == "short text"
+    text = " ".join(["word"] * 1000)
+    fitted = fit_to_budget(text, 100)
+    assert "truncated" in fitted
+    assert estimate_tokens(fitted) < 120
+
+
+def test_encode_result_fits_budget_and_reports_what_was_cut():
+    names = ["id", "name", "description"]
+    rows = [(i, f"name {i}", "long text " * 30) for i in range(200)]
+    profiles = [ColumnProfile(name) for name in names]
+    profile_rows(profiles, rows)
+    text = encode_result(rows, names, total=200, summaries=[p.summary() for p in profiles], budget=300)
+    assert estimate_tokens(text) <= 300
+    assert "Showing first" in text
+    assert "Column statistics" in text
+
+
+def test_encode_result_unchanged_when_it_fits():
+    text = encode_result([(1, "a")], ["id", "name"], total=1, budget=1000)
+    assert "Showing" not in text
+    assert "a" in text
+
+
+def test_column_profile_summary():
+    profile = ColumnProfile("x")
+    for value in (1, 3, None, 2):
+        profile.add(value)
+    summary = profile.summary()
+    assert (summary["count"], summary["nulls"], summary["min"], summary["max"]) == (4, 1, 1, 3)
+    assert summary["mean"] == 2
+    assert summary["distinct"] == 3
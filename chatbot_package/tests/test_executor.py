@@ -0,0 +1,57 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from executor import QueryTimeoutError, run_db
+
+ENDLESS = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT COUNT(*) FROM c"
+
+
+def _fetch(connection, sql):
+    return connection.execute(sql).fetchall()
+
+
+def test_runs_the_query_on_a_worker_thread(dataset):
+    def fetch(connection):
+        return threading.current_thread(), connection.execute("SELECT COUNT(*) FROM main_table").fetchone()
+
+    thread, row = asyncio.run(run_db(fetch, db_path=dataset))
+    assert row == (5,)
+    assert thread is not threading.main_thread()
+
+
+def test_a_query_past_its_deadline_raises_query_timeout_error(dataset):
+    started = time.monotonic()
+    with pytest.raises(QueryTimeoutError, match="0.2s time limit"):
+        asyncio.run(run_db(_fetch, ENDLESS, db_path=dataset, timeout=0.2))
+    assert time.monotonic() - started < 5
+    # the pooled connection comes back without the deadline
+    assert asyncio.run(run_db(_fetch, "SELECT COUNT(*) FROM main_table", db_path=dataset, timeout=0.2)) == [(5,)]
+
+
+def test_cancelling_the_awaiting_task_interrupts_sqlite(dataset):
+    outcome = {}
+    finished = threading.Event()
+
+    def fetch(connection):
+        try:
+            return connection.execute(ENDLESS).fetchall()
+        except sqlite3.OperationalError as error:
+            outcome["error"] = error
+            raise
+        finally:
+            finished.set()
+
+    async def turn():
+        task = asyncio.ensure_future(run_db(fetch, db_path=dataset, timeout=60))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(turn())
+    assert finished.wait(5)
+    assert "interrupted" in str(outcome["error"])
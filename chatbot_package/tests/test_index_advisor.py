@@ -0,0 +1,46 @@
+import asyncio
+import sqlite3
+
+import db
+import index_advisor
+from index_advisor import IndexAdvisor, recommend, writable_dataset
+
+QUERY = "SELECT amount FROM main_table WHERE category = 'a'"
+
+
+def _indexes(path):
+    with sqlite3.connect(path) as connection:
+        return [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+
+
+def _observe(advisor, path, times=3):
+    async def run():
+        for _ in range(times):
+            advisor.observe(QUERY, path, db.dataset_version(path), elapsed=1.0)
+            await advisor.wait()
+    asyncio.run(run())
+
+
+def test_recommend_indexes_the_filter_column():
+    plan = ["SCAN main_table"]
+    assert recommend(QUERY, plan, {"main_table": ["category", "amount"]}) == ("main_table", ("category", "amount"))
+    assert recommend(QUERY, ["SEARCH main_table USING INDEX i (category=?)"], {"main_table": ["category"]}) is None
+
+
+def test_disabled_advisor_never_writes(dataset):
+    _observe(IndexAdvisor(min_queries=1, enabled=False), dataset)
+    assert _indexes(dataset) == []
+
+
+def test_bundled_datasets_are_never_written():
+    assert not writable_dataset(index_advisor.PACKAGE_ROOT / "data" / "movies.db")
+    assert writable_dataset("/tmp/dataset_1.db")
+
+
+def test_enabled_advisor_builds_an_index_after_repeated_scans(dataset):
+    advisor = IndexAdvisor(min_queries=2, enabled=True)
+    _observe(advisor, dataset, times=1)
+    assert _indexes(dataset) == []
+    _observe(advisor, dataset, times=1)
+    assert len(advisor.report()) == 1
+    assert advisor.report()[0]["columns"] == ["category", "amount"]
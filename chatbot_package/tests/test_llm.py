@@ -0,0 +1,91 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from bot import ChatBot
+from conversation_store import ConversationStore
+from llm import MockProvider, StreamedMessage
+
+SCRIPT = [
+    {"tool_calls": [{"name": "run_sqlite_query", "arguments": {"sql_query": "SELECT COUNT(*) FROM main_table"}}]},
+    {"content": "There are {tool_result} rows."},
+]
+
+
+def _fragment(index, id=None, name=None, arguments=None):
+    function = SimpleNamespace(name=name, arguments=arguments) if name or arguments else None
+    return SimpleNamespace(index=index, id=id, function=function)
+
+
+def _delta(content=None, *fragments):
+    return SimpleNamespace(content=content, tool_calls=list(fragments) or None)
+
+
+def test_tool_calls_split_across_chunks_are_reassembled():
+    message = StreamedMessage()
+    for delta in [
+        _delta("Let me "),
+        _delta("check.", _fragment(0, id="call_a", name="run_sqlite_")),
+        _delta(None, _fragment(0, name="query", arguments='{"sql_query": "SELECT ')),
+        _delta(None, _fragment(1, id="call_b", name="get_table_schema", arguments="{")),
+        _delta(None, _fragment(0, arguments='COUNT(*) FROM main_table"}'), _fragment(1, arguments="}")),
+    ]:
+        message.add_delta(delta)
+
+    assert message.content == "Let me check."
+    assert [(call.id, call.function.name) for call in message.tool_calls] == [
+        ("call_a", "run_sqlite_query"), ("call_b", "get_table_schema"),
+    ]
+    assert json.loads(message.tool_calls[0].function.arguments) == {"sql_query": "SELECT COUNT(*) FROM main_table"}
+    assert message.to_dict()["tool_calls"][1] == {
+        "id": "call_b", "type": "function", "function": {"name": "get_table_schema", "arguments": "{}"},
+    }
+
+
+def test_a_message_without_tool_calls_has_none_in_its_dict():
+    message = StreamedMessage()
+    message.add_delta(_delta("hi"))
+    assert message.to_dict() == {"role": "assistant", "content": "hi"}
+
+
+@pytest.fixture
+def bot(tmp_path):
+    queries = []
+
+    async def run_sqlite_query(sql_query):
+        queries.append(sql_query)
+        return "42"
+
+    chatbot = ChatBot("rules", [], {"run_sqlite_query": run_sqlite_query}, provider=MockProvider(script=SCRIPT),
+                      store=ConversationStore(str(tmp_path / "conversations.db")))
+    chatbot.queries = queries
+    return chatbot
+
+
+def test_bot_runs_the_scripted_tool_round_then_answers(bot):
+    response = asyncio.run(bot("How many rows?"))
+
+    assert response.content == "There are 42 rows."
+    assert bot.queries == ["SELECT COUNT(*) FROM main_table"]
+    history = bot.store.history(bot.session_id)
+    assert [message["role"] for message in history] == ["user", "assistant", "tool", "assistant"]
+    assert history[1]["tool_calls"][0]["function"]["name"] == "run_sqlite_query"
+    assert history[2]["tool_call_id"] == history[1]["tool_calls"][0]["id"]
+
+
+def test_streamed_rounds_replay_the_same_script(bot):
+    async def turn():
+        chunks = [chunk async for chunk in bot.stream("How many rows?")]
+        assert chunks == []
+        await bot.run_tools(bot.last_message.tool_calls)
+        return [chunk async for chunk in bot.stream()]
+
+    chunks = asyncio.run(turn())
+    assert "".join(chunks) == "There are 42 rows."
+    assert len(chunks) == 4
+    assert bot.provider.calls == 2
+    # the next question starts the script over
+    assert asyncio.run(bot("And now?")).content == "There are 42 rows."
+    assert len(bot.queries) == 2
@@ -0,0 +1,76 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import prompts
+from bot import ChatBot
+from catalog import SchemaCatalog, _build_tables
+from conversation_store import ConversationStore
+from llm import MockProvider
+from prompts import PromptLog, prompt_prefix
+
+
+@pytest.fixture(autouse=True)
+def fresh_prefixes():
+    prompts._prefixes.clear()
+
+
+def _catalog(path, version=("db", 1, 2, 3)):
+    with sqlite3.connect(path) as connection:
+        tables = _build_tables(connection)
+    connection.close()
+    return SchemaCatalog(version, tables)
+
+
+def test_the_same_schema_gives_a_byte_identical_prefix(dataset):
+    first = prompt_prefix(_catalog(dataset)).text
+    prompts._prefixes.clear()  # as in another worker process
+    second = prompt_prefix(_catalog(dataset)).text
+    assert first == second
+    assert first.startswith(prompts.SYSTEM_RULES)
+    assert "CREATE TABLE main_table" in first
+
+
+def test_a_changed_schema_changes_the_prefix(dataset):
+    before = prompt_prefix(_catalog(dataset))
+    with sqlite3.connect(dataset) as connection:
+        connection.execute("ALTER TABLE main_table ADD COLUMN region TEXT")
+    connection.close()
+    after = prompt_prefix(_catalog(dataset, version=("db", 1, 3, 4)))
+    assert after.text != before.text
+    assert after.key != before.key
+    assert "region" in after.text
+
+
+def test_prefix_is_rules_only_without_a_dataset():
+    assert prompt_prefix(None).text == prompts.SYSTEM_RULES
+
+
+def test_every_turn_starts_with_the_same_prefix(dataset, tmp_path):
+    prefix = prompt_prefix(_catalog(dataset)).text
+    bot = ChatBot(prefix, [], {}, provider=MockProvider(script=[{"content": "ok"}]),
+                  store=ConversationStore(str(tmp_path / "conversations.db")))
+
+    async def two_turns():
+        first = await bot.prompt_messages()
+        await bot("How many rows?")
+        await bot("And per category?")
+        return first, await bot.prompt_messages()
+
+    first, later = asyncio.run(two_turns())
+    assert first[0] == later[0] == {"role": "system", "content": prefix}
+    assert len(later) == 5
+
+
+def test_prompt_log_splits_prefix_and_variable_bytes():
+    log = PromptLog()
+    messages = [{"role": "system", "content": "rules"}, {"role": "user", "content": "héllo"}]
+    log.record(messages)
+    log.record(messages + [{"role": "assistant", "content": None,
+                            "tool_calls": [{"function": {"name": "q", "arguments": "{}"}}]}])
+    stats = log.stats()
+    assert stats["requests"] == 2
+    assert stats["prefix_bytes"] == 10
+    assert stats["variable_bytes"] == 6 + 6 + 2
+    assert stats["prefixes"] == 1
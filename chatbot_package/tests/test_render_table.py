@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+
+import pytest
+
+from utils import json_to_markdown_table, render_table
+
+COLUMNS = ["title", "note", "score"]
+ROWS = [("Heat", "a | b", 8.3), ("Up", "line one\nline two", None), (None, "x\r\ny", 7)]
+
+
+def test_markdown_escapes_pipes_and_flattens_newlines():
+    assert render_table(ROWS, COLUMNS, "markdown") == (
+        "| title | note | score |\n"
+        "| --- | --- | --- |\n"
+        "| Heat | a \\| b | 8.3 |\n"
+        "| Up | line one line two |  |\n"
+        "|  | x  y | 7 |\n"
+    )
+
+
+def test_markdown_escapes_the_header_too():
+    table = render_table([(1,)], ["a|b"], "markdown")
+    assert table.splitlines()[0] == "| a\\|b |"
+
+
+def test_none_cells_are_empty_in_markdown_and_csv_and_null_in_json():
+    rows = list(csv.reader(io.StringIO(render_table(ROWS, COLUMNS, "csv"))))
+    assert rows[2] == ["Up", "line one\nline two", ""]
+    assert rows[3][0] == ""
+    assert json.loads(render_table(ROWS, COLUMNS, "json"))["rows"][1] == ["Up", "line one\nline two", None]
+
+
+def test_long_cells_are_truncated_with_an_ellipsis():
+    rows = [("x" * 100, "y" * 100, 123456789)]
+    cells = render_table(rows, COLUMNS, "markdown", max_cell_chars=10).splitlines()[2].split(" | ")
+    assert cells[0] == "| " + "x" * 9 + "…"
+    assert cells[1] == "y" * 9 + "…"
+    assert cells[2] == "123456789 |"
+    assert json.loads(render_table(rows, COLUMNS, "json", max_cell_chars=10))["rows"][0][2] == 123456789
+
+
+def test_column_limits_override_the_default_and_none_disables_truncation():
+    rows = [("x" * 100, "y" * 100, 1)]
+    data = json.loads(render_table(rows, COLUMNS, "json", max_cell_chars=10, column_limits={"note": 50}))
+    assert data["rows"][0][:2] == ["x" * 9 + "…", "y" * 49 + "…"]
+    assert "x" * 100 in render_table(rows, COLUMNS, "csv", max_cell_chars=None)
+
+
+def test_truncation_happens_before_escaping():
+    cell = render_table([("ab|cd|ef",)], ["c"], "markdown", max_cell_chars=5).splitlines()[2]
+    assert cell == "| ab\\|c… |"
+
+
+def test_empty_results_keep_the_header():
+    assert render_table([], COLUMNS, "markdown") == "| title | note | score |\n| --- | --- | --- |\n"
+    assert json.loads(render_table([], COLUMNS, "json")) == {"columns": COLUMNS, "rows": []}
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        render_table(ROWS, COLUMNS, "xml")
+
+
+def test_json_to_markdown_table_keeps_every_character():
+    data = {"columns": ["a"], "data": [{"a": "z" * 200}]}
+    assert "z" * 200 in json_to_markdown_table(data)
@@ -0,0 +1,35 @@
+import pytest
+
+from rollups import Rollups
+
+
+@pytest.fixture
+def rollups():
+    return Rollups(["category", "amount", "region"], counted=["category"], stat_pairs=[("category", "amount")])
+
+
+def test_count_per_group_reads_rollup_counts(rollups):
+    sql = rollups.rewrite("SELECT category, COUNT(*) AS n FROM main_table GROUP BY category ORDER BY n DESC LIMIT 5")
+    assert sql == ('SELECT value AS "category", row_count AS "n" FROM _rollup_counts '
+                   "WHERE column_name = 'category' ORDER BY row_count DESC LIMIT 5")
+
+
+@pytest.mark.parametrize("function,expression", [
+    ("SUM", "total"), ("AVG", "total * 1.0 / value_count"), ("MIN", "min_value"), ("MAX", "max_value"),
+])
+def test_aggregate_per_group_reads_rollup_stats(rollups, function, expression):
+    sql = rollups.rewrite(f"select category, {function}(amount) from main_table group by 1")
+    assert sql.startswith(f'SELECT group_value AS "category", {expression} AS')
+    assert "group_column = 'category' AND value_column = 'amount'" in sql
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT region, COUNT(*) FROM main_table GROUP BY region",  # column not rolled up
+    "SELECT category, SUM(amount) FROM main_table WHERE amount > 1 GROUP BY category",
+    "SELECT category, SUM(amount), COUNT(*) FROM main_table GROUP BY category",
+    "SELECT category, SUM(amount) FROM other_table GROUP BY category",
+    "SELECT category, SUM(amount) FROM main_table GROUP BY region",
+    "SELECT category, SUM(amount) FROM main_table GROUP BY category ORDER BY region",
+])
+def test_other_queries_are_not_rewritten(rollups, query):
+    assert rollups.rewrite(query) is None
@@ -0,0 +1,96 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from scheduler import ToolScheduler, TurnTimeline
+
+
+def _call(call_id, name, sql_query=None):
+    arguments = json.dumps({"sql_query": sql_query} if sql_query else {})
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def _tool(events, delays=None):
+    async def call_function(tool_call):
+        events.append(("start", tool_call.id))
+        try:
+            await asyncio.sleep((delays or {}).get(tool_call.id, 0.01))
+        except asyncio.CancelledError:
+            events.append(("cancelled", tool_call.id))
+            raise
+        events.append(("end", tool_call.id))
+        return {"tool_call_id": tool_call.id, "role": "tool", "name": tool_call.function.name, "content": "ok"}
+    return call_function
+
+
+def test_a_call_past_its_timeout_gets_an_error_and_the_others_still_answer():
+    events = []
+    scheduler = ToolScheduler(timeout=5, timeouts={"get_table_schema": 0.05})
+    calls = [_call("slow", "get_table_schema"), _call("fast", "run_sqlite_query", "SELECT 1")]
+    timeline = TurnTimeline()
+
+    responses = asyncio.run(scheduler.run(calls, _tool(events, {"slow": 10}), timeline))
+
+    assert [response["tool_call_id"] for response in responses] == ["slow", "fast"]
+    assert "timed out after 0.05s" in responses[0]["content"]
+    assert responses[1]["content"] == "ok"
+    assert ("cancelled", "slow") in events
+    assert timeline.summary()["tool_calls"] == 2
+
+
+def test_cancel_stops_every_call_in_flight():
+    events = []
+    scheduler = ToolScheduler(timeout=5)
+    calls = [_call("a", "run_sqlite_query", "SELECT 1"), _call("b", "get_table_schema")]
+
+    async def turn():
+        run = asyncio.ensure_future(scheduler.run(calls, _tool(events, {"a": 10, "b": 10})))
+        await asyncio.sleep(0.05)
+        scheduler.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await run
+        assert not scheduler._tasks
+
+    asyncio.run(turn())
+    assert sorted(events) == [("cancelled", "a"), ("cancelled", "b"), ("start", "a"), ("start", "b")]
+
+
+def test_plot_chart_waits_for_the_query_with_the_same_sql():
+    events = []
+    calls = [
+        _call("query", "run_sqlite_query", "SELECT genre, COUNT(*) FROM main_table GROUP BY genre"),
+        _call("chart", "plot_chart", "select genre, count(*)\nfrom MAIN_TABLE group by genre;"),
+        _call("other", "plot_chart", "SELECT year FROM main_table"),
+    ]
+    asyncio.run(ToolScheduler().run(calls, _tool(events, {"query": 0.1})))
+
+    assert events.index(("end", "query")) < events.index(("start", "chart"))
+    assert events.index(("start", "other")) < events.index(("end", "query"))
+
+
+def test_plot_chart_does_not_wait_for_a_query_with_another_quoted_value():
+    events = []
+    calls = [
+        _call("query", "run_sqlite_query", 'SELECT COUNT(*) FROM main_table WHERE genre = "Drama"'),
+        _call("chart", "plot_chart", 'SELECT COUNT(*) FROM main_table WHERE genre = "drama"'),
+    ]
+    asyncio.run(ToolScheduler().run(calls, _tool(events, {"query": 0.1})))
+
+    assert events.index(("start", "chart")) < events.index(("end", "query"))
+
+
+def test_concurrency_is_bounded():
+    running, peak = set(), []
+
+    async def call_function(tool_call):
+        running.add(tool_call.id)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.discard(tool_call.id)
+        return {"tool_call_id": tool_call.id}
+
+    calls = [_call(str(i), "get_table_schema") for i in range(6)]
+    asyncio.run(ToolScheduler(max_concurrency=2).run(calls, call_function))
+    assert max(peak) == 2
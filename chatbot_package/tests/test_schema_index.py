@@ -0,0 +1,61 @@
+from catalog import SchemaCatalog
+from schema_index import SchemaIndex
+
+VERSION = ("/data/shop.db", 1, 100, 10)
+
+
+def _table(name, columns, sample_rows=()):
+    definitions = ", ".join(f"{column} TEXT" for column in columns)
+    return {
+        "name": name,
+        "sql": f"CREATE TABLE {name} ({definitions})",
+        "row_count": len(sample_rows),
+        "columns": [{"name": column, "type": "TEXT"} for column in columns],
+        "sample_rows": [list(row) for row in sample_rows],
+    }
+
+
+def _index(top_tables=2, top_columns=3):
+    tables = [
+        _table("customers", ["id", "name", "email", "city", "signup_date"], [(1, "Ann", "a@x.io", "Oslo", "2024")]),
+        _table("orders", ["id", "customer_id", "order_date", "total", "status"], [(1, 1, "2024", 9.5, "shipped")]),
+        _table("products", ["id", "title", "price", "stock", "category"], [(1, "Lamp", 20, 3, "lighting")]),
+        _table("warehouses", ["id", "region", "capacity", "manager", "opened"], [(1, "north", 100, "Bo", "2020")]),
+    ]
+    return SchemaIndex(SchemaCatalog(VERSION, tables), top_tables=top_tables, top_columns=top_columns)
+
+
+def _names(selection):
+    return {table["name"]: [column["name"] for column in columns] for table, columns in selection}
+
+
+def test_the_matching_tables_and_columns_are_selected():
+    selection = _names(_index().select("Which city do customers order from most?"))
+    assert set(selection) == {"customers", "orders"}
+    assert "city" in selection["customers"]
+
+
+def test_key_and_join_columns_are_always_kept():
+    selection = _names(_index(top_columns=2).select("total of shipped orders by status"))
+    assert selection["orders"][:2] == ["id", "customer_id"]
+    assert len(selection["orders"]) == 2
+    # a table's key is kept even when other columns score higher
+    assert "id" in _names(_index(top_columns=1).select("product price and stock"))["products"]
+
+
+def test_only_the_top_k_tables_are_rendered():
+    index = _index(top_tables=1)
+    text = index.render("price of each product category")
+    assert text.count("CREATE TABLE") == 1
+    assert text.startswith("CREATE TABLE products (")
+    assert "-- 2 more columns not shown" in text
+    assert "customers" not in text and "warehouses" not in text
+
+
+def test_an_empty_question_falls_back_to_the_full_schema():
+    index = _index(top_tables=1, top_columns=2)
+    for question in ("", "   ", "?!"):
+        selection = _names(index.select(question))
+        assert list(selection) == ["customers", "orders", "products", "warehouses"]
+        assert all(len(columns) == 5 for columns in selection.values())
+    assert "not shown" not in index.render("")
@@ -0,0 +1,106 @@
+import asyncio
+import itertools
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from conversation_store import ConversationStore
+from summarizer import Summarizer, local_summary, split_point
+
+
+def _rows(roles, tokens=10):
+    return [(seq, role, tokens, {"role": role}) for seq, role in enumerate(roles, start=1)]
+
+
+def _turn(question, answer):
+    return [
+        {"role": "user", "content": question},
+        {"role": "assistant", "tool_calls": [{"id": "c", "function": {"name": "run_sqlite_query", "arguments": "{}"}}]},
+        {"role": "tool", "tool_call_id": "c", "name": "run_sqlite_query", "content": "rows " * 20},
+        {"role": "assistant", "content": answer},
+    ]
+
+
+class RecordingProvider:
+    """Answers each summary request with "summary N" and keeps the requests"""
+
+    def __init__(self):
+        self.requests = []
+        self.count = itertools.count(1)
+
+    async def complete(self, messages, tools=None):
+        self.requests.append(messages[-1]["content"])
+        return SimpleNamespace(content=f"summary {next(self.count)}", tool_calls=None)
+
+
+class FailingProvider:
+    async def complete(self, messages, tools=None):
+        raise ConnectionError("offline")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ConversationStore(str(tmp_path / "conversations.db"))
+
+
+def test_split_point_always_falls_just_before_a_user_message():
+    generator = random.Random(7)
+    for _ in range(500):
+        roles = ["user"] + [generator.choice(["user", "assistant", "tool"]) for _ in range(generator.randrange(1, 20))]
+        rows = _rows(roles, tokens=generator.randrange(1, 50))
+        boundary = split_point(rows, keep_tokens=generator.randrange(0, 200))
+        if boundary is not None:
+            assert rows[boundary][1] == "user"  # seq starts at 1, so rows[boundary] follows it
+            assert boundary < rows[-1][0]
+
+
+def test_split_point_keeps_the_newest_turns_within_the_budget():
+    rows = _rows(["user", "assistant"] * 4)
+    assert split_point(rows, keep_tokens=20) == 6
+    assert split_point(rows, keep_tokens=45) == 4
+    assert split_point(_rows(["user", "assistant", "tool", "assistant"]), keep_tokens=0) is None
+
+
+def test_nothing_is_summarized_below_the_trigger(store):
+    provider = RecordingProvider()
+    store.append("s", _turn("first", "one") + _turn("second", "two"))
+    summarizer = Summarizer(provider, store, trigger_tokens=10_000, keep_tokens=10)
+
+    assert asyncio.run(summarizer.update("s")) is None
+    assert store.summary("s") == (0, None)
+    assert provider.requests == []
+
+
+def test_the_summary_carries_forward_across_updates(store):
+    provider = RecordingProvider()
+    summarizer = Summarizer(provider, store, trigger_tokens=20, keep_tokens=10, max_tokens=100)
+    store.append("s", _turn("first", "one") + _turn("second", "two"))
+
+    assert asyncio.run(summarizer.update("s")) == "summary 1"
+    assert store.summary("s") == (4, "summary 1")
+    assert "User: first" in provider.requests[0] and "second" not in provider.requests[0]
+
+    store.append("s", _turn("third", "three"))
+    assert asyncio.run(summarizer.update("s")) == "summary 2"
+    assert store.summary("s") == (8, "summary 2")
+    assert provider.requests[1].startswith("Previous summary:\nsummary 1\n")
+    assert "User: second" in provider.requests[1] and "User: first" not in provider.requests[1]
+
+
+def test_the_local_summary_carries_the_previous_one_forward(store):
+    summarizer = Summarizer(FailingProvider(), store, trigger_tokens=20, keep_tokens=10, max_tokens=100)
+    store.append("s", _turn("first", "one") + _turn("second", "two"))
+    asyncio.run(summarizer.update("s"))
+    store.append("s", _turn("third", "three"))
+    summary = asyncio.run(summarizer.update("s"))
+
+    assert summary.splitlines()[0] == "User: first"
+    assert "User: second" in summary and "Assistant: two" in summary
+    assert "third" not in summary
+
+
+def test_local_summary_keeps_the_newest_lines_within_the_budget():
+    summary = local_summary("User: old question", _turn("new question", "answer"), max_tokens=12)
+    assert summary.splitlines()[-1] == "Assistant: answer"
+    assert "User: old question" not in summary
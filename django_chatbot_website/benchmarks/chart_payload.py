@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Bytes on the wire and serialization time of the chart API payload: the old
+double-JSON response (chart_json string inside JSON) against the typed-array
+encoding, each with and without gzip
+"""
+import argparse
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from chatbot.chart_payload import encode_figure
+
+
+def figures(points):
+    """A line chart, a scatter plot and a histogram of the given size"""
+    rng = np.random.default_rng(0)
+    x = np.arange(points)
+    y = np.cumsum(rng.normal(size=points))
+    layout = {'title': 'benchmark', 'xaxis': {'title': 'x'}, 'yaxis': {'title': 'y'}}
+    counts, edges = np.histogram(rng.normal(size=points), bins=min(points, 2000))
+    return {
+        'line': {'data': [{'x': x.tolist(), 'y': y.tolist(), 'type': 'scatter', 'mode': 'lines'}], 'layout': layout},
+        'scatter': {'data': [{'x': rng.random(points).tolist(), 'y': rng.integers(0, 1000, points).tolist(),
+                              'type': 'scatter', 'mode': 'markers'}], 'layout': layout},
+        'histogram': {'data': [{'x': ((edges[:-1] + edges[1:]) / 2).tolist(), 'y': counts.tolist(),
+                                'width': np.diff(edges).tolist(), 'type': 'bar'}], 'layout': layout},
+    }
+
+
+def old_payload(chart_data):
+    return json.dumps({'success': True, 'chart_json': json.dumps(chart_data)}).encode()
+
+
+def new_payload(chart_data):
+    return json.dumps({'success': True, 'chart': encode_figure(chart_data)}).encode()
+
+
+def measure(serialize, chart_data, repeats):
+    """(raw bytes, gzipped bytes, serialize ms, serialize + gzip ms)"""
+    serialize_times, total_times = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        body = serialize(chart_data)
+        serialized = time.perf_counter()
+        compressed = gzip.compress(body, compresslevel=6, mtime=0)  # what gzip_page does
+        serialize_times.append(serialized - start)
+        total_times.append(time.perf_counter() - start)
+    return len(body), len(compressed), min(serialize_times) * 1000, min(total_times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--points', type=int, nargs='+', default=[2000, 20000, 200000])
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'chart':<10} {'points':>7} {'format':<7} {'bytes':>10} {'gzipped':>9} {'encode ms':>10} {'+gzip ms':>9}")
+    for points in args.points:
+        for name, chart_data in figures(points).items():
+            for label, serialize in (('old', old_payload), ('new', new_payload)):
+                raw, compressed, encode_ms, total_ms = measure(serialize, chart_data, args.repeats)
+                print(f"{name:<10} {points:>7} {label:<7} {raw:>10} {compressed:>9} {encode_ms:>10.2f} {total_ms:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Load test of the sticky router: requests/sec through one public port with 1, 2, 4... workers
+
+Each worker is a stand-in for a Chainlit process that burns --work-ms of CPU
+per request (the pandas/Plotly/markdown work of a turn) and echoes the
+request body. Every simulated browser keeps the router cookie it is given,
+reuses its connection for --keep-alive requests, and mixes GETs with POSTs of
+--post-bytes; the test checks that every POST body comes back intact and that
+each browser is always served by the same worker. Throughput can only scale
+up to the number of CPU cores.
+"""
+import argparse
+import http.client
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from chatbot.router import ROUTER_COOKIE
+from chatbot.supervisor import ManagedProcess, Supervisor
+
+BASE_PORT = 8700
+LOG_DIR = Path('/tmp/router_load_logs')
+
+
+def serve_worker(port, work_ms):
+    """Stub worker: CPU-bound work per request, keep-alive, answers with its port and the request body"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _answer(self, body):
+            deadline = time.process_time() + work_ms / 1000
+            total = 0
+            while time.process_time() < deadline:
+                total += sum(i * i for i in range(1000))
+            self.send_response(200)
+            self.send_header('X-Worker', str(port))
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._answer(f'worker {port}\n'.encode())
+
+        def do_POST(self):
+            self._answer(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer(('127.0.0.1', port), Handler).serve_forever()
+
+
+def client(port, duration, keep_alive, post_bytes, results):
+    """One browser: keeps its router cookie and records which workers answered it and any bad echo"""
+    cookie = None
+    seen = set()
+    count = 0
+    bad = 0
+    payload = os.urandom(post_bytes // 2).hex().encode()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        # every other request posts a body; the first one on a connection posts, as a login or upload would
+        for i in range(keep_alive):
+            headers = {'Cookie': cookie} if cookie else {}
+            if i % 2 == 0:
+                connection.request('POST', '/', body=payload, headers=headers)
+            else:
+                connection.request('GET', '/', headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+            if i % 2 == 0 and body != payload:
+                bad += 1
+            set_cookie = response.getheader('Set-Cookie')
+            if set_cookie and set_cookie.startswith(ROUTER_COOKIE):
+                cookie = set_cookie.split(';')[0]
+            seen.add(response.getheader('X-Worker'))
+            count += 1
+        connection.close()
+    results.append((count, seen, bad))
+
+
+def run(workers, clients, duration, work_ms, keep_alive, post_bytes):
+    worker_ports = [BASE_PORT + 1 + i for i in range(workers)]
+    script = Path(__file__).resolve()
+    processes = [
+        ManagedProcess(f'worker-{port}', [sys.executable, script, '--serve-worker', port, '--work-ms', work_ms],
+                       port, log_dir=LOG_DIR)
+        for port in worker_ports
+    ]
+    processes.append(ManagedProcess(
+        'router', [sys.executable, '-m', 'chatbot.router', '--port', BASE_PORT, '--workers', *worker_ports],
+        BASE_PORT, cwd=script.parent.parent, log_dir=LOG_DIR,
+    ))
+    supervisor = Supervisor(processes)
+    try:
+        if not supervisor.start(timeout=20):
+            raise RuntimeError(f'servers did not start, see {LOG_DIR}')
+        results = []
+        threads = [threading.Thread(target=client, args=(BASE_PORT, duration, keep_alive, post_bytes, results)) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        supervisor.stop()
+    requests = sum(count for count, _, _ in results)
+    sticky = all(len(seen) == 1 for _, seen, _ in results)
+    used = len(set().union(*(seen for _, seen, _ in results)))
+    bad = sum(bad for _, _, bad in results)
+    return requests / duration, sticky, used, bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent simulated browsers')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per run')
+    parser.add_argument('--work-ms', type=float, default=20.0, help='CPU time per request in a worker')
+    parser.add_argument('--keep-alive', type=int, default=4, help='Requests per client connection')
+    parser.add_argument('--post-bytes', type=int, default=16 * 1024, help='Body size of the POST requests')
+    parser.add_argument('--serve-worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_worker:
+        serve_worker(args.serve_worker, args.work_ms)
+        return
+
+    print(f'{os.cpu_count()} CPU cores, {args.clients} clients, {args.work_ms:.0f} ms CPU per request, '
+          f'{args.keep_alive} requests per connection, {args.post_bytes} byte POST bodies\n')
+    print(f"{'workers':>7} {'req/s':>8} {'speedup':>8} {'workers used':>13} {'sticky':>7} {'bad bodies':>11}")
+    baseline = None
+    for workers in args.workers:
+        throughput, sticky, used, bad = run(workers, args.clients, args.duration, args.work_ms,
+                                            args.keep_alive, args.post_bytes)
+        baseline = baseline or throughput
+        print(f'{workers:>7} {throughput:>8.1f} {throughput / baseline:>7.2f}x {used:>13} '
+              f'{"yes" if sticky else "NO":>7} {bad:>11}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Compact encoding of Plotly figures for the chart API
+
+Numeric arrays in traces are sent as base64 typed arrays in the shape
+Plotly.js uses for typed-array specs:
+
+    {"dtype": "f8", "bdata": "<base64>", "shape": [rows, cols]}
+
+dtype is little-endian and as small as the values allow (i1/u1/i2/u2/i4/u4
+or f8); shape is only set for 2D arrays such as heatmap z. Arrays holding
+text, dates, booleans or missing values stay plain JSON lists. The browser
+decodes them back to typed arrays (see decodeChart in dashboard.html).
+"""
+import base64
+
+import numpy as np
+
+# Trace keys whose values may be numeric arrays
+ARRAY_KEYS = ('x', 'y', 'z', 'values', 'width')
+# Arrays shorter than this are cheaper as plain JSON
+MIN_ENCODED_LENGTH = 16
+
+_INTEGER_TYPES = [('i1', np.int8), ('u1', np.uint8), ('i2', np.int16), ('u2', np.uint16),
+                  ('i4', np.int32), ('u4', np.uint32)]
+
+
+def _dtype(array):
+    """Smallest typed-array dtype that holds every value exactly"""
+    if array.dtype.kind in 'iu' or (array == np.round(array)).all():
+        low, high = array.min(), array.max()
+        for name, dtype in _INTEGER_TYPES:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return name, dtype
+    return 'f8', np.float64
+
+
+def encode_array(values):
+    """Typed-array spec for a (1D or 2D) list of numbers, or the list itself when it can't be encoded"""
+    try:
+        array = np.asarray(values)
+    except ValueError:
+        return values  # ragged rows
+    # bools, text, dates and None (object arrays) stay JSON
+    if array.size < MIN_ENCODED_LENGTH or array.dtype.kind not in 'iuf' or array.ndim > 2:
+        return values
+    if array.dtype.kind == 'f' and not np.isfinite(array).all():
+        return values  # NaN/inf have no JSON equivalent Plotly would read the same way
+    name, dtype = _dtype(array)
+    spec = {'dtype': name, 'bdata': base64.b64encode(array.astype(np.dtype(dtype).newbyteorder('<')).tobytes()).decode('ascii')}
+    if array.ndim == 2:
+        spec['shape'] = list(array.shape)
+    return spec
+
+
+def encode_figure(chart_data):
+    """Copy of a {'data': [...], 'layout': {...}} figure with numeric arrays encoded"""
+    traces = []
+    for trace in chart_data.get('data', []):
+        trace = dict(trace)
+        for key in ARRAY_KEYS:
+            if isinstance(trace.get(key), list):
+                trace[key] = encode_array(trace[key])
+        traces.append(trace)
+    return {**chart_data, 'data': traces}
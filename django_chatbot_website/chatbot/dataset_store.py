@@ -0,0 +1,250 @@
+"""
+Parse-once columnar store for uploaded datasets
+
+An upload is parsed once (CSV/Excel) and written next to the original as an
+uncompressed Arrow IPC (Feather v2) file plus a JSON sidecar with the dataset
+info. Later requests read the info from the sidecar and load only the columns
+they need through memory-mapped, zero-copy reads of the Arrow file.
+
+StoreWriter takes the file chunk by chunk, the same chunks that are loaded
+into SQLite (see uploads.py), so the file is read once and memory stays
+bounded. A column whose type changes in a later chunk (integers, then
+decimals or text) is widened and the parts written so far are converted
+batch by batch.
+"""
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from .ingest import read_chunks
+
+USER_DATA_ROOT = Path('user_data')
+ALLOWED_EXTENSIONS = ['.csv', '.xlsx', '.xls']
+STORE_SUFFIX = '.arrow'
+INFO_SUFFIX = '.info.json'
+SAMPLE_ROWS = 10
+
+
+class DatasetError(Exception):
+    """Unsupported, missing or unreadable dataset"""
+
+
+def user_data_dir(user_id):
+    path = USER_DATA_ROOT / str(user_id)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def store_path(file_path):
+    return file_path.with_name(file_path.name + STORE_SUFFIX)
+
+
+def info_path(file_path):
+    return file_path.with_name(file_path.name + INFO_SUFFIX)
+
+
+def _arrow_compatible(df):
+    """Column names must be strings and object columns must hold one type"""
+    df.columns = [str(column) for column in df.columns]
+    for column in df.columns:
+        if df[column].dtype == object and pd.api.types.infer_dtype(df[column], skipna=True).startswith('mixed'):
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    return df
+
+
+def _widen(current, new):
+    """Arrow type that holds the values of both types"""
+    if current == new or pa.types.is_null(new):
+        return current
+    if pa.types.is_null(current):
+        return new
+    if pa.types.is_integer(current) and pa.types.is_integer(new):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in (current, new)):
+        return pa.float64()
+    return pa.large_string()
+
+
+def build_info(table, filename, size):
+    """Dataset info from the memory-mapped Arrow table, one numeric column in memory at a time"""
+    empty = {}
+    summary_stats = {}
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+            series = column.to_pandas()
+            summary_stats[name] = json.loads(series.describe().to_json())
+            empty[name] = series.iloc[:0]
+        else:
+            empty[name] = column.slice(0, 0).to_pandas()
+    dtypes = pd.DataFrame(empty)
+    numeric_columns = dtypes.select_dtypes(include=['number']).columns.tolist()
+    sample = table.slice(0, SAMPLE_ROWS).to_pandas()
+    return {
+        'filename': filename,
+        'rows': table.num_rows,
+        'columns': table.num_columns,
+        'size': f"{size / 1024:.1f} KB",
+        'column_names': table.column_names,
+        'column_types': dtypes.dtypes.astype(str).to_dict(),
+        'numeric_columns': numeric_columns,
+        'categorical_columns': dtypes.select_dtypes(include=['object']).columns.tolist(),
+        'missing_values': {name: int(column.null_count) for name, column in zip(table.column_names, table.columns)},
+        # round-trip through pandas' JSON writer so timestamps and numpy scalars serialise
+        'sample_data': json.loads(sample.to_json(orient='records', date_format='iso')),
+        'preview_data': json.loads(sample.to_json(orient='values', date_format='iso')),
+        'summary_stats': summary_stats if numeric_columns else {},
+    }
+
+
+def _write_atomic(path, write):
+    tmp_path = path.with_name(path.name + '.tmp')
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class StoreWriter:
+    """Builds the Arrow file and info sidecar of a dataset from its chunks.
+
+    add() each chunk, then close() to swap the files in and get the info, or
+    abort() to drop what was written.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = Path(file_path)
+        self.schema = None
+        self._writer = None
+        self._parts = []  # files written so far, one per schema
+
+    def _part_path(self, number):
+        path = store_path(self.file_path)
+        return path.with_name(f'{path.name}.part{number}')
+
+    def _open_part(self, schema):
+        if self._writer is not None:
+            self._writer.close()
+        path = self._part_path(len(self._parts))
+        self._parts.append(path)
+        self._writer = pa.ipc.new_file(path, schema)
+        self.schema = schema
+
+    def add(self, chunk):
+        table = pa.Table.from_pandas(_arrow_compatible(chunk.copy(deep=False)), preserve_index=False)
+        table = table.replace_schema_metadata(None)
+        if self.schema is None:
+            self._open_part(table.schema)
+        try:
+            table = table.cast(self.schema)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            # e.g. decimals in a column of integers: continue in a new part with wider types
+            schema = pa.schema(
+                pa.field(name, _widen(self.schema.field(name).type, table.schema.field(name).type))
+                for name in self.schema.names
+            )
+            self._open_part(schema)
+            table = table.cast(schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        """Swap the finished Arrow file and info sidecar in; returns the info"""
+        if self._writer is None:
+            raise DatasetError('The uploaded file has no rows')
+        self._writer.close()
+        self._writer = None
+        path = store_path(self.file_path)
+        if len(self._parts) == 1:
+            os.replace(self._parts[0], path)
+        else:
+            _write_atomic(path, self._merge_parts)
+            for part in self._parts:
+                part.unlink()
+        self._parts = []
+        table = feather.read_table(path, memory_map=True)
+        info = build_info(table, self.file_path.name, self.file_path.stat().st_size)
+        _write_atomic(info_path(self.file_path), lambda tmp_path: tmp_path.write_text(json.dumps(info)))
+        return info
+
+    def _merge_parts(self, tmp_path):
+        # batch by batch, so only one chunk is in memory
+        with pa.ipc.new_file(tmp_path, self.schema) as writer:
+            for part in self._parts:
+                with pa.memory_map(str(part)) as source:
+                    reader = pa.ipc.open_file(source)
+                    for i in range(reader.num_record_batches):
+                        writer.write_table(pa.Table.from_batches([reader.get_batch(i)]).cast(self.schema))
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for part in self._parts:
+            part.unlink(missing_ok=True)
+        self._parts = []
+
+
+def convert(file_path):
+    """Read the source file in chunks and write the Arrow file and info sidecar"""
+    writer = StoreWriter(file_path)
+    try:
+        for chunk in read_chunks(file_path):
+            writer.add(chunk)
+        return writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def _is_fresh(file_path):
+    try:
+        source_mtime = file_path.stat().st_mtime_ns
+        return (store_path(file_path).stat().st_mtime_ns >= source_mtime
+                and info_path(file_path).stat().st_mtime_ns >= source_mtime)
+    except FileNotFoundError:
+        return False
+
+
+def _ensure_converted(file_path):
+    if not file_path.exists():
+        raise DatasetError('Dataset not found')
+    if not _is_fresh(file_path):
+        # uploads from before the store existed are converted on first use
+        return convert(file_path)
+    return None
+
+
+def save_upload(uploaded_file, user_id):
+    """Validate and save an uploaded file; returns its path (uploads.py converts it)"""
+    file_extension = Path(uploaded_file.name).suffix.lower()
+    if file_extension not in ALLOWED_EXTENSIONS:
+        raise DatasetError('Only CSV and Excel files are supported')
+
+    file_path = user_data_dir(user_id) / Path(uploaded_file.name).name
+    with open(file_path, 'wb+') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+    return file_path
+
+
+def dataset_file(user_id, filename):
+    return user_data_dir(user_id) / Path(filename).name
+
+
+def load_info(user_id, filename):
+    """Dataset info from the sidecar, without touching the data itself"""
+    file_path = dataset_file(user_id, filename)
+    info = _ensure_converted(file_path)
+    if info is None:
+        info = json.loads(info_path(file_path).read_text())
+    return info
+
+
+def load_columns(user_id, filename, columns):
+    """DataFrame with only the requested columns, memory-mapped from the Arrow file"""
+    file_path = dataset_file(user_id, filename)
+    _ensure_converted(file_path)
+    columns = list(dict.fromkeys(column for column in columns if column))
+    table = feather.read_table(store_path(file_path), columns=columns, memory_map=True)
+    return table.to_pandas(split_blocks=True)
@@ -0,0 +1,175 @@
+"""
+Server-side downsampling of chart data to a fixed point budget
+
+Line charts keep their shape with LTTB (Largest-Triangle-Three-Buckets) or
+min-max decimation, scatter plots are uniformly sampled or binned into a
+density grid, and histograms are computed here so only bin edges and counts
+are sent. The payload size stays constant however large the dataset grows.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+CHART_MAX_POINTS = int(os.environ.get('CHART_MAX_POINTS', '2000'))
+CHART_MAX_POINTS_LIMIT = 20000  # upper bound for the per-request max_points
+SAMPLE_SEED = 0  # fixed so the same request always returns the same sample
+
+
+def point_budget(requested=None):
+    """Points to send for one chart: the request's max_points, clamped"""
+    try:
+        requested = int(requested)
+    except (TypeError, ValueError):
+        return CHART_MAX_POINTS
+    return max(10, min(requested, CHART_MAX_POINTS_LIMIT))
+
+
+def lttb(x, y, n_out):
+    """Indices of n_out points chosen by Largest-Triangle-Three-Buckets"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # First and last point are always kept; the rest is split into n_out - 2 buckets
+    every = (n - 2) / (n_out - 2)
+    edges = np.floor(np.arange(n_out - 1) * every).astype(np.int64) + 1
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for k in range(n_out - 2):
+        lo, hi = edges[k], edges[k + 1]
+        next_lo, next_hi = (edges[k + 1], edges[k + 2]) if k + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        # pick the point forming the largest triangle with the previous pick and the next bucket's average
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        indices[k + 1] = a
+    return indices
+
+
+def minmax(y, n_out):
+    """Indices of the minimum and maximum of each of n_out / 2 buckets, in order"""
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(0, n, max(n_out // 2, 1) + 1).astype(np.int64)
+    indices = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            bucket = y[lo:hi]
+            indices += sorted({lo + int(bucket.argmin()), lo + int(bucket.argmax())})
+    return np.asarray(indices, dtype=np.int64)
+
+
+def sample(n, n_out):
+    """Sorted indices of a uniform random sample of n_out out of n rows"""
+    if n_out >= n:
+        return np.arange(n)
+    rng = np.random.default_rng(SAMPLE_SEED)
+    return np.sort(rng.choice(n, size=n_out, replace=False))
+
+
+def _numeric(values):
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+
+
+def _dates(values):
+    """values as datetimes when the column is (or fully parses as) dates, else None"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if not (values.dtype == object or pd.api.types.is_string_dtype(values)):
+        return None
+    present = values.notna().sum()
+    # cheap rejection of text columns before parsing every row
+    if not present or pd.to_datetime(values.dropna().head(20), errors='coerce', format='mixed').isna().any():
+        return None
+    for date_format in ('ISO8601', 'mixed'):
+        dates = pd.to_datetime(values, errors='coerce', format=date_format)
+        if dates.notna().sum() == present:
+            return dates
+    return None
+
+
+def _nanoseconds(dates):
+    return dates.dt.as_unit('ns').astype('int64').to_numpy(dtype=float)
+
+
+def _axis(values):
+    """Numeric positions for an x axis: numbers, dates, or the row order"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float)
+    dates = _dates(values)
+    if dates is not None and dates.notna().all():
+        return _nanoseconds(dates)
+    return np.arange(len(values), dtype=float)
+
+
+def line_points(x, y, max_points, method='lttb'):
+    """(x values, y values, info) of a line chart reduced to at most max_points"""
+    y_values = _numeric(y)
+    keep = ~np.isnan(y_values)
+    x = x[keep]
+    y_values = y_values[keep]
+    if method == 'minmax':
+        indices = minmax(y_values, max_points)
+    else:
+        method = 'lttb'
+        indices = lttb(_axis(x), y_values, max_points)
+    info = {'method': method, 'points_in': len(y_values), 'points_out': len(indices)}
+    return x.iloc[indices].tolist(), y_values[indices].tolist(), info
+
+
+def scatter_points(x, y, max_points):
+    """(x values, y values, info) of a uniform sample of at most max_points points"""
+    y_values = _numeric(y)
+    keep = ~np.isnan(y_values)
+    x = x[keep]
+    y_values = y_values[keep]
+    indices = sample(len(y_values), max_points)
+    info = {'method': 'sample', 'points_in': len(y_values), 'points_out': len(indices)}
+    return x.iloc[indices].tolist(), y_values[indices].tolist(), info
+
+
+def density_grid(x, y, max_points):
+    """2D histogram (x bin centers, y bin centers, counts) with at most max_points cells"""
+    x_values, y_values = _numeric(x), _numeric(y)
+    keep = ~(np.isnan(x_values) | np.isnan(y_values))
+    bins = max(int(np.sqrt(max_points)), 2)
+    counts, x_edges, y_edges = np.histogram2d(x_values[keep], y_values[keep], bins=bins)
+    info = {'method': 'density', 'points_in': int(keep.sum()), 'points_out': int(counts.size)}
+    return (
+        ((x_edges[:-1] + x_edges[1:]) / 2).tolist(),
+        ((y_edges[:-1] + y_edges[1:]) / 2).tolist(),
+        counts.T.astype(int).tolist(),
+        info,
+    )
+
+
+def histogram(values, max_points):
+    """(bin centers, counts, bin widths, info); categories are counted instead of binned"""
+    dates = None if pd.api.types.is_numeric_dtype(values) else _dates(values)
+    if dates is None and not pd.api.types.is_numeric_dtype(values):
+        counts = values.value_counts().head(max_points)
+        info = {'method': 'categories', 'points_in': int(values.notna().sum()), 'points_out': len(counts)}
+        return counts.index.tolist(), counts.values.tolist(), None, info
+
+    if dates is not None:
+        data = _nanoseconds(dates.dropna())
+    else:
+        data = values.dropna().to_numpy(dtype=float)
+    if len(data) == 0:
+        return [], [], [], {'method': 'bins', 'points_in': 0, 'points_out': 0}
+    edges = np.histogram_bin_edges(data, bins='auto')
+    bins = min(len(edges) - 1, max_points)
+    counts, edges = np.histogram(data, bins=bins)
+    centers, widths = (edges[:-1] + edges[1:]) / 2, np.diff(edges)
+    info = {'method': 'bins', 'points_in': len(data), 'points_out': len(counts)}
+    if dates is not None:
+        # Plotly date axes take ISO timestamps and bar widths in milliseconds
+        return pd.to_datetime(centers).strftime('%Y-%m-%d %H:%M:%S').tolist(), counts.tolist(), (widths / 1e6).tolist(), info
+    return centers.tolist(), counts.tolist(), widths.tolist(), info
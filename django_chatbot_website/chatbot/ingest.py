@@ -0,0 +1,206 @@
+"""
+Streaming ingestion of uploaded CSV/Excel files into the SQLite database the chatbot queries
+
+The file is read in chunks of INGEST_CHUNK_ROWS rows, so memory stays bounded
+for multi-GB CSVs. Column types are inferred from the first chunk, rows are
+bulk inserted with executemany in one transaction with the journal off, and
+indexes are created once all rows are loaded. Rollup tables for chart
+queries (see rollups.py) are accumulated in the same pass. The database is
+built under a temporary name and swapped in with os.replace, so the chatbot
+never sees a half-written file (its connection pool and caches follow the
+new inode).
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from .rollups import RollupBuilder
+
+TABLE_NAME = 'main_table'
+# The chatbot opens the database of the user named in the chat page's signed
+# dataset token; the chatbot workers started from here inherit the secret
+DB_PATH_TEMPLATE = os.environ.get('CHATBOT_DB_PATH_TEMPLATE', '/tmp/dataset_{user_id}.db')
+DATASET_SECRET = os.environ.setdefault('CHATBOT_DATASET_SECRET', secrets.token_hex(32))
+INGEST_CHUNK_ROWS = int(os.environ.get('INGEST_CHUNK_ROWS', '50000'))
+# Low-cardinality columns (typical GROUP BY / WHERE targets) get an index and rollups
+INDEX_MAX_DISTINCT = int(os.environ.get('INGEST_INDEX_MAX_DISTINCT', '1000'))
+INGEST_MAX_INDEXES = int(os.environ.get('INGEST_MAX_INDEXES', '4'))
+
+
+def user_db_path(user_id):
+    return Path(DB_PATH_TEMPLATE.format(user_id=user_id))
+
+
+def dataset_token(user_id):
+    """Signed "<user id>.<HMAC-SHA256>" telling the chatbot which user's database to query"""
+    signature = hmac.new(DATASET_SECRET.encode(), str(user_id).encode(), hashlib.sha256).hexdigest()
+    return f'{user_id}.{signature}'
+
+
+def quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def read_chunks(file_path, chunk_rows=INGEST_CHUNK_ROWS):
+    """Yield DataFrames of at most chunk_rows rows without loading the whole file"""
+    file_path = Path(file_path)
+    suffix = file_path.suffix.lower()
+    if suffix == '.csv':
+        yield from pd.read_csv(file_path, chunksize=chunk_rows)
+    elif suffix == '.xlsx':
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk_rows:
+                    yield pd.DataFrame(batch, columns=header).infer_objects()
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=header).infer_objects()
+        finally:
+            workbook.close()
+    else:
+        # legacy .xls has no streaming reader; read it whole and slice
+        df = pd.read_excel(file_path)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+
+def column_names(columns):
+    """Unique, non-empty column names"""
+    names = []
+    for i, column in enumerate(columns):
+        name = str(column).strip() if column is not None and str(column).strip() and not str(column).startswith('Unnamed:') else f'column_{i + 1}'
+        while name in names:
+            name = f'{name}_{i + 1}'
+        names.append(name)
+    return names
+
+
+def sqlite_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def normalize_chunk(chunk):
+    """Dates become ISO text, the way they are stored in SQLite"""
+    date_columns = [column for column in chunk.columns if pd.api.types.is_datetime64_any_dtype(chunk[column])]
+    if date_columns:
+        chunk = chunk.copy()
+        for column in date_columns:
+            chunk[column] = chunk[column].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return chunk
+
+
+def chunk_rows_for_insert(chunk):
+    """Plain Python values for executemany: NaN/NaT become NULL"""
+    chunk = chunk.astype(object)
+    return chunk.where(chunk.notna(), None).values.tolist()
+
+
+def ingest_file(file_path, db_path, chunk_rows=INGEST_CHUNK_ROWS, on_chunk=None):
+    """Load a CSV/Excel file into main_table of a fresh SQLite database.
+
+    on_chunk, if given, gets every chunk as read from the file (before column
+    renaming), so other stores can be built in the same pass. Returns a report
+    with the row count, indexes created and rows/sec.
+    """
+    db_path = Path(db_path)
+    tmp_path = db_path.with_name(db_path.name + '.tmp')
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    start = time.perf_counter()
+    row_count = 0
+    names = None
+    rollups = None
+    conn = sqlite3.connect(tmp_path, isolation_level=None)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('BEGIN')
+        for chunk in read_chunks(file_path, chunk_rows):
+            if on_chunk is not None:
+                on_chunk(chunk)
+            if names is None:
+                names = column_names(chunk.columns)
+                types = [sqlite_type(chunk[column].dtype) for column in chunk.columns]
+                columns_sql = ', '.join(f'{quote_identifier(name)} {type_}' for name, type_ in zip(names, types))
+                conn.execute(f'CREATE TABLE {TABLE_NAME} ({columns_sql})')
+                insert_sql = f'INSERT INTO {TABLE_NAME} VALUES ({", ".join("?" * len(names))})'
+                rollups = RollupBuilder(
+                    names,
+                    numeric_columns=[name for name, type_ in zip(names, types) if type_ != 'TEXT'],
+                    max_groups=INDEX_MAX_DISTINCT,
+                    column_types=dict(zip(names, types)),
+                )
+            chunk.columns = names
+            chunk = normalize_chunk(chunk)
+            # rollups are accumulated chunk by chunk in the same pass as the load
+            rollups.add(chunk)
+            conn.executemany(insert_sql, chunk_rows_for_insert(chunk))
+            row_count += len(chunk)
+        if names is None:
+            raise ValueError('The uploaded file has no header row')
+        rollup_columns = rollups.write(conn, file_path)
+        conn.execute('COMMIT')
+        load_seconds = time.perf_counter() - start
+
+        indexes = rollups.low_cardinality()[:INGEST_MAX_INDEXES]
+        for name in indexes:
+            conn.execute(f'CREATE INDEX {quote_identifier("idx_" + name)} ON {TABLE_NAME} ({quote_identifier(name)})')
+        conn.execute('ANALYZE')
+    except BaseException:
+        conn.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+    conn.close()
+    os.replace(tmp_path, db_path)
+
+    seconds = time.perf_counter() - start
+    report = {
+        'db_path': str(db_path),
+        'rows': row_count,
+        'columns': len(names),
+        'indexes': indexes,
+        'rollup_columns': rollup_columns,
+        'load_seconds': round(load_seconds, 3),
+        'seconds': round(seconds, 3),
+        'rows_per_sec': int(row_count / load_seconds) if load_seconds else row_count,
+    }
+    print(f"📥 Ingested {row_count} rows into {db_path} in {seconds:.2f}s "
+          f"({report['rows_per_sec']} rows/s, indexes: {', '.join(indexes) or 'none'})")
+    return report
+
+
+def ingest_for_user(file_path, user_id, chunk_rows=INGEST_CHUNK_ROWS, on_chunk=None):
+    """Ingest an upload into the user's chatbot database"""
+    return ingest_file(file_path, user_db_path(user_id), chunk_rows, on_chunk)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Load a CSV/Excel file into a chatbot SQLite database')
+    parser.add_argument('file', help='CSV or Excel file')
+    parser.add_argument('--user-id', default='1', help='User whose database is (re)built')
+    parser.add_argument('--db', help='Database path (overrides --user-id)')
+    parser.add_argument('--chunk-rows', type=int, default=INGEST_CHUNK_ROWS)
+    args = parser.parse_args()
+    ingest_file(args.file, args.db or user_db_path(args.user_id), args.chunk_rows)
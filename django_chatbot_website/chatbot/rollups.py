@@ -0,0 +1,231 @@
+"""
+Pre-aggregated rollup tables for chart queries
+
+While an upload is ingested chunk by chunk, RollupBuilder keeps running
+counts per low-cardinality column and sum/count/min/max per (group column,
+numeric column) pair. They are written next to main_table as:
+
+    _rollup_counts(column_name, value, row_count)
+    _rollup_stats(group_column, group_value, value_column, total, value_count, min_value, max_value)
+    _rollup_meta(key, value)  -- format, source file identity, row count
+
+Each ingestion rebuilds them in the same pass that loads the rows, so a
+replaced dataset always comes with matching rollups. Group values and stats
+are converted the way SQLite converts values for the column's declared type,
+so a chunk read with different dtypes (integers as floats once a NaN shows
+up) lands in the same groups and a rewritten query returns the same values,
+with the same types, as the query on main_table. Readers check
+_rollup_meta against the source file before trusting them.
+"""
+import math
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+
+ROLLUP_FORMAT = 1
+
+
+def _plain(value):
+    """Python value for a pandas/numpy scalar, None for missing values"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if hasattr(value, 'item'):
+        value = value.item()
+    try:
+        if value != value:  # NaT and other NaN-likes
+            return None
+    except TypeError:
+        pass
+    return value
+
+
+def stored_value(column_type, value):
+    """value as SQLite stores it in a column declared column_type (INTEGER, REAL or TEXT affinity)"""
+    value = _plain(value)
+    if value is None or isinstance(value, bytes):
+        return value
+    if isinstance(value, bool):
+        value = int(value)
+    if column_type == 'TEXT':
+        return value if isinstance(value, str) else str(value)
+    if isinstance(value, str):
+        for convert in (int, float):
+            try:
+                value = convert(value)
+                break
+            except ValueError:
+                continue
+        else:
+            return value
+    if column_type == 'INTEGER' and isinstance(value, float) and value.is_integer() and abs(value) < 2 ** 63:
+        return int(value)
+    if column_type == 'REAL' and isinstance(value, int):
+        return float(value)
+    return value
+
+
+class RollupBuilder:
+    """Running per-column counts and per-group numeric stats, fed one chunk at a time.
+
+    Columns with more than max_groups distinct values are dropped as soon as
+    they pass the cap, so memory stays bounded.
+    """
+
+    def __init__(self, columns, numeric_columns, max_groups, column_types=None):
+        self.max_groups = max_groups
+        self.numeric_columns = list(numeric_columns)
+        # declared SQLite type per column (TEXT when missing): keys and stats are converted to it
+        self.column_types = dict(column_types or {})
+        self.counts = {column: Counter() for column in columns}
+        self.stats = {column: {} for column in columns}  # column -> group value -> value column -> [sum, count, min, max]
+        self.row_count = 0
+
+    def add(self, chunk):
+        self.row_count += len(chunk)
+        for name in list(self.numeric_columns):
+            if not pd.api.types.is_numeric_dtype(chunk[name]):
+                # text in a numeric column: SQLite's SUM/MIN/MAX would mix types, leave it to main_table
+                self.numeric_columns.remove(name)
+                for stats in self.stats.values():
+                    for group_stats in stats.values():
+                        group_stats.pop(name, None)
+        for column in list(self.counts):
+            counts = chunk[column].value_counts(dropna=False)
+            counter = self.counts[column]
+            for value, count in counts.items():
+                counter[self._value(column, value)] += int(count)
+            if len(counter) > self.max_groups:
+                del self.counts[column]
+                del self.stats[column]
+                continue
+
+            value_columns = [name for name in self.numeric_columns if name != column]
+            if not value_columns:
+                continue
+            grouped = chunk.groupby(column, dropna=False)[value_columns].agg(['sum', 'count', 'min', 'max'])
+            positions = {key: i + 1 for i, key in enumerate(grouped.columns)}
+            stats = self.stats[column]
+            # itertuples keeps each column's own type (iterrows would upcast ints to floats)
+            for row in grouped.itertuples(name=None):
+                group_stats = stats.setdefault(self._value(column, row[0]), {})
+                for name in value_columns:
+                    total, low, high = (
+                        self._value(name, row[positions[(name, agg)]]) for agg in ('sum', 'min', 'max')
+                    )
+                    count = int(row[positions[(name, 'count')]])
+                    if total is None:
+                        total = self._value(name, 0)
+                    current = group_stats.get(name)
+                    if current is None:
+                        group_stats[name] = [total, count, low, high]
+                        continue
+                    current[0] += total
+                    current[1] += count
+                    if low is not None:
+                        current[2] = low if current[2] is None else min(current[2], low)
+                    if high is not None:
+                        current[3] = high if current[3] is None else max(current[3], high)
+
+    def _value(self, column, value):
+        return stored_value(self.column_types.get(column, 'TEXT'), value)
+
+    def low_cardinality(self):
+        """Rolled-up columns with more than one value and fewer values than half the rows"""
+        columns = [column for column, counter in self.counts.items() if 1 < len(counter) < self.row_count / 2]
+        return sorted(columns, key=lambda column: len(self.counts[column]))
+
+    def write(self, connection, source_path):
+        """Create the rollup tables on an open connection (inside the load transaction)"""
+        columns = self.low_cardinality()
+        connection.execute('CREATE TABLE _rollup_counts (column_name TEXT, value, row_count INTEGER)')
+        connection.execute('CREATE TABLE _rollup_stats (group_column TEXT, group_value, value_column TEXT, '
+                           'total, value_count INTEGER, min_value, max_value)')
+        connection.execute('CREATE TABLE _rollup_meta (key TEXT PRIMARY KEY, value)')
+        connection.executemany(
+            'INSERT INTO _rollup_counts VALUES (?, ?, ?)',
+            ((column, value, count) for column in columns for value, count in self.counts[column].items()),
+        )
+        connection.executemany(
+            'INSERT INTO _rollup_stats VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (
+                (column, group_value, name, total if count else None, count, low, high)
+                for column in columns
+                for group_value, group_stats in self.stats[column].items()
+                for name, (total, count, low, high) in group_stats.items()
+            ),
+        )
+        connection.execute('CREATE INDEX _rollup_counts_column ON _rollup_counts (column_name)')
+        connection.execute('CREATE INDEX _rollup_stats_columns ON _rollup_stats (group_column, value_column)')
+
+        stat = Path(source_path).stat()
+        meta = {
+            'format': ROLLUP_FORMAT,
+            'source_name': Path(source_path).name,
+            'source_size': stat.st_size,
+            'source_mtime_ns': stat.st_mtime_ns,
+            'rows': self.row_count,
+            'columns': ','.join(columns),
+            'built_at': time.time(),
+        }
+        connection.executemany('INSERT INTO _rollup_meta VALUES (?, ?)', meta.items())
+        return columns
+
+
+def _connect_read_only(db_path):
+    return sqlite3.connect(Path(db_path).resolve().as_uri() + '?mode=ro', uri=True)
+
+
+def rollups_match(db_path, source_path):
+    """True when db_path holds rollups built from the current version of source_path"""
+    try:
+        connection = _connect_read_only(db_path)
+    except sqlite3.OperationalError:
+        return False
+    try:
+        meta = dict(connection.execute('SELECT key, value FROM _rollup_meta'))
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        connection.close()
+    try:
+        stat = Path(source_path).stat()
+    except FileNotFoundError:
+        return False
+    return (meta.get('format') == ROLLUP_FORMAT
+            and meta.get('source_name') == Path(source_path).name
+            and meta.get('source_size') == stat.st_size
+            and meta.get('source_mtime_ns') == stat.st_mtime_ns)
+
+
+def value_counts(db_path, column):
+    """(values, counts) of a column, most frequent first like pandas value_counts; None if not rolled up"""
+    connection = _connect_read_only(db_path)
+    try:
+        rows = connection.execute(
+            'SELECT value, row_count FROM _rollup_counts WHERE column_name = ? AND value IS NOT NULL '
+            'ORDER BY row_count DESC', (column,)
+        ).fetchall()
+    finally:
+        connection.close()
+    if not rows:
+        return None
+    return [row[0] for row in rows], [row[1] for row in rows]
+
+
+def group_sums(db_path, group_column, value_column):
+    """(groups, sums) of value_column per group, like pandas groupby().sum(); None if not rolled up"""
+    connection = _connect_read_only(db_path)
+    try:
+        rows = connection.execute(
+            'SELECT group_value, COALESCE(total, 0) FROM _rollup_stats '
+            'WHERE group_column = ? AND value_column = ? AND group_value IS NOT NULL ORDER BY group_value',
+            (group_column, value_column),
+        ).fetchall()
+    finally:
+        connection.close()
+    if not rows:
+        return None
+    return [row[0] for row in rows], [row[1] for row in rows]
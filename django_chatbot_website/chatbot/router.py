@@ -0,0 +1,143 @@
+"""
+Session-sticky TCP/HTTP router in front of several Chainlit workers
+
+Chainlit keeps each chat session (and its socket.io connection) in the memory
+of one worker, so every request of a browser must reach the same worker. The
+router reads the head of the first request on each client connection, picks
+the worker named by the chatbot_worker cookie (or the next worker round-robin
+for a new browser), and then pipes bytes both ways unchanged, which also
+carries request bodies, keep-alive requests and WebSocket upgrades. When a
+browser is assigned a worker, or moved because its worker is down, the
+cookie is added to the head of the first response on its way back.
+
+    python -m chatbot.router --port 8002 --workers 8003 8004
+"""
+import argparse
+import asyncio
+import itertools
+import re
+
+ROUTER_COOKIE = 'chatbot_worker'
+MAX_HEAD_BYTES = 64 * 1024
+CONNECT_TIMEOUT = 2.0
+PIPE_CHUNK = 64 * 1024
+
+_COOKIE_RE = re.compile(rb'^cookie:(.*)$', re.IGNORECASE | re.MULTILINE)
+_BAD_GATEWAY = (b'HTTP/1.1 502 Bad Gateway\r\nContent-Type: text/plain\r\nContent-Length: 29\r\n'
+                b'Connection: close\r\n\r\nNo chatbot worker available.\n')
+
+
+def worker_from_cookie(head, count):
+    """Worker index stored in the request's router cookie, or None"""
+    for match in _COOKIE_RE.finditer(head):
+        for item in match.group(1).split(b';'):
+            name, _, value = item.strip().partition(b'=')
+            if name == ROUTER_COOKIE.encode() and value.isdigit() and int(value) < count:
+                return int(value)
+    return None
+
+
+def add_cookie(response_head, index):
+    """Response head with a Set-Cookie pinning the browser to a worker"""
+    cookie = f'Set-Cookie: {ROUTER_COOKIE}={index}; Path=/; HttpOnly; SameSite=Lax\r\n'.encode()
+    status_line, _, rest = response_head.partition(b'\r\n')
+    return status_line + b'\r\n' + cookie + rest
+
+
+async def _pipe(reader, writer, cookie_index=None):
+    """Copy bytes until EOF, then half-close the other side so its replies still get through.
+
+    With cookie_index, the router cookie is added to the first response head.
+    """
+    try:
+        if cookie_index is not None:
+            response_head = await reader.readuntil(b'\r\n\r\n')
+            writer.write(add_cookie(response_head, cookie_index))
+            await writer.drain()
+        while True:
+            data = await reader.read(PIPE_CHUNK)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, RuntimeError):
+        # one side is gone: drop the connection
+        _close(writer)
+
+
+def _close(writer):
+    try:
+        writer.close()
+    except RuntimeError:
+        pass
+
+
+class Router:
+    """Routes client connections to workers, sticky per browser"""
+
+    def __init__(self, worker_ports, host='127.0.0.1'):
+        self.workers = [(host, port) for port in worker_ports]
+        self._next = itertools.cycle(range(len(self.workers)))
+        self.connections = [0] * len(self.workers)
+
+    async def _connect(self, preferred):
+        """(index, reader, writer) of the preferred worker, or the next one that accepts"""
+        order = [preferred] + [index for index in range(len(self.workers)) if index != preferred]
+        for index in order:
+            host, port = self.workers[index]
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), CONNECT_TIMEOUT)
+                return index, reader, writer
+            except (OSError, asyncio.TimeoutError):
+                continue
+        return None, None, None
+
+    async def handle(self, client_reader, client_writer):
+        try:
+            head = await client_reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            _close(client_writer)
+            return
+
+        pinned = worker_from_cookie(head, len(self.workers))
+        index, upstream_reader, upstream_writer = await self._connect(
+            pinned if pinned is not None else next(self._next)
+        )
+        if index is None:
+            client_writer.write(_BAD_GATEWAY)
+            _close(client_writer)
+            return
+
+        self.connections[index] += 1
+        upstream_writer.write(head)
+        # the request body (if any) must flow while the response is awaited
+        upload = asyncio.ensure_future(_pipe(client_reader, upstream_writer))
+        try:
+            # a new browser, or one whose worker is gone, is told where it lives now
+            await _pipe(upstream_reader, client_writer, cookie_index=index if index != pinned else None)
+        finally:
+            # the connection ends with the worker's side
+            upload.cancel()
+            self.connections[index] -= 1
+            _close(upstream_writer)
+            _close(client_writer)
+
+    async def serve(self, port, host='127.0.0.1'):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEAD_BYTES)
+        print(f"🔀 Routing port {port} to workers on ports {', '.join(str(p) for _, p in self.workers)}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Session-sticky router for Chainlit workers')
+    parser.add_argument('--port', type=int, required=True, help='Public port')
+    parser.add_argument('--workers', type=int, nargs='+', required=True, help='Worker ports')
+    parser.add_argument('--host', default='127.0.0.1')
+    args = parser.parse_args()
+    try:
+        asyncio.run(Router(args.workers).serve(args.port, args.host))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,210 @@
+"""
+Supervisor for the Chainlit chatbot workers and the Django dev server
+
+Children are started in their own process group with stdout/stderr written
+straight to log files (nothing to drain, so a chatty child never blocks on a
+full pipe). Readiness is decided by polling each child's HTTP port with
+exponential backoff rather than sleeping for a fixed time, and a background
+thread restarts children that exit, backing off when they keep crashing.
+"""
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+CHATBOT_ROOT = Path(__file__).resolve().parent.parent.parent / 'chatbot_package'
+CHATBOT_PORT = int(os.environ.get('CHATBOT_PORT', '8002'))
+CHATBOT_WORKERS = int(os.environ.get('CHATBOT_WORKERS', '1'))
+LOG_DIR = Path(os.environ.get('SUPERVISOR_LOG_DIR', Path(__file__).resolve().parent.parent / 'logs'))
+READY_TIMEOUT = float(os.environ.get('SUPERVISOR_READY_TIMEOUT', '60'))
+RESTART_BACKOFF_MAX = float(os.environ.get('SUPERVISOR_RESTART_BACKOFF_MAX', '30'))
+STABLE_SECONDS = 30  # a child that ran this long starts its restart backoff over
+PROBE_INTERVAL_MAX = 0.25  # probing a local port is cheap; keep time-to-ready tight
+
+
+def probe(port, host='127.0.0.1', path='/', timeout=1.0):
+    """True when an HTTP server answers on the port"""
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        connection.request('GET', path)
+        return connection.getresponse().status < 500
+    except (OSError, http.client.HTTPException):
+        return False
+    finally:
+        connection.close()
+
+
+class ManagedProcess:
+    """One supervised child: command line, HTTP port to probe and log file"""
+
+    def __init__(self, name, args, port, cwd=None, env=None, log_dir=LOG_DIR):
+        self.name = name
+        self.args = [str(arg) for arg in args]
+        self.port = port
+        self.cwd = cwd
+        self.env = env
+        self.log_path = Path(log_dir) / f'{name}.log'
+        self.process = None
+        self.log_file = None
+        self.started_at = None
+        self.ready = False
+        self.restarts = 0
+        self.next_restart = None
+
+    def start(self):
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.log_file is None:
+            self.log_file = open(self.log_path, 'ab', buffering=0)
+        self.log_file.write(f'\n=== {time.strftime("%Y-%m-%d %H:%M:%S")} starting {" ".join(self.args)}\n'.encode())
+        self.process = subprocess.Popen(
+            self.args,
+            cwd=self.cwd,
+            env={**os.environ, **(self.env or {})},
+            stdin=subprocess.DEVNULL,
+            stdout=self.log_file,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,  # own process group, so grandchildren are stopped with it
+        )
+        self.started_at = time.monotonic()
+        self.ready = False
+        self.next_restart = None
+
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def check_ready(self):
+        self.ready = self.running() and probe(self.port)
+        return self.ready
+
+    def wait_ready(self, timeout=READY_TIMEOUT):
+        """Poll the port with backoff until it answers, the child exits or the timeout passes"""
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+        while self.running():
+            if self.check_ready():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, PROBE_INTERVAL_MAX)
+        return False
+
+    def stop(self, timeout=5):
+        if self.running():
+            self._signal(signal.SIGTERM)
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self._signal(signal.SIGKILL)
+                self.process.wait()
+        self.ready = False
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    def _signal(self, signum):
+        try:
+            os.killpg(self.process.pid, signum)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            self.process.send_signal(signum)
+
+    def status(self):
+        return {
+            'name': self.name,
+            'pid': self.process.pid if self.process else None,
+            'port': self.port,
+            'running': self.running(),
+            'ready': self.ready,
+            'restarts': self.restarts,
+            'log': str(self.log_path),
+        }
+
+
+class Supervisor:
+    """Starts children, waits for their ports and restarts the ones that exit"""
+
+    def __init__(self, processes, check_interval=1.0):
+        self.processes = list(processes)
+        self.check_interval = check_interval
+        self._stopping = threading.Event()
+        self._monitor = None
+
+    def start(self, timeout=READY_TIMEOUT):
+        """Start every child (they boot in parallel); returns True once all are ready"""
+        started = time.monotonic()
+        for child in self.processes:
+            child.start()
+        ready = True
+        for child in self.processes:
+            remaining = max(timeout - (time.monotonic() - started), 0)
+            if child.wait_ready(remaining):
+                print(f'✅ {child.name} ready on port {child.port} after {time.monotonic() - child.started_at:.1f}s')
+            else:
+                ready = False
+                print(f'❌ {child.name} not ready on port {child.port} (see {child.log_path})')
+        self._stopping.clear()
+        self._monitor = threading.Thread(target=self._watch, name='supervisor', daemon=True)
+        self._monitor.start()
+        return ready
+
+    def _watch(self):
+        while not self._stopping.wait(self.check_interval):
+            now = time.monotonic()
+            for child in self.processes:
+                if child.running():
+                    if not child.ready and child.check_ready():
+                        print(f'✅ {child.name} ready on port {child.port}')
+                    continue
+                if child.next_restart is None:
+                    if now - child.started_at >= STABLE_SECONDS:
+                        child.restarts = 0
+                    delay = min(2 ** child.restarts, RESTART_BACKOFF_MAX)
+                    child.next_restart = now + delay
+                    child.ready = False
+                    print(f'♻️ {child.name} exited with code {child.process.returncode}, restarting in {delay:.0f}s')
+                elif now >= child.next_restart:
+                    child.restarts += 1
+                    child.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._monitor is not None:
+            self._monitor.join()
+        for child in self.processes:
+            child.stop()
+
+    def status(self):
+        return [child.status() for child in self.processes]
+
+
+def chatbot_workers(count=CHATBOT_WORKERS, port=CHATBOT_PORT):
+    """Chainlit workers answering on port; several workers sit behind the sticky router"""
+    if count <= 1:
+        return [ManagedProcess(
+            'chatbot',
+            [sys.executable, CHATBOT_ROOT / 'run_chatbot.py', '--port', port, '--headless'],
+            port,
+            cwd=CHATBOT_ROOT,
+        )]
+    worker_ports = [port + 1 + i for i in range(count)]
+    workers = [
+        ManagedProcess(
+            f'chatbot-{i + 1}',
+            [sys.executable, CHATBOT_ROOT / 'run_chatbot.py', '--port', worker_port, '--headless'],
+            worker_port,
+            cwd=CHATBOT_ROOT,
+        )
+        for i, worker_port in enumerate(worker_ports)
+    ]
+    router = ManagedProcess(
+        'router',
+        [sys.executable, '-m', 'chatbot.router', '--port', port, '--workers', *worker_ports],
+        port,
+        cwd=Path(__file__).resolve().parent.parent,
+    )
+    return workers + [router]
@@ -0,0 +1,75 @@
+"""
+Background processing of uploaded datasets
+
+The request only saves the upload. A worker thread then reads the file once,
+in chunks, and feeds every chunk both to the Arrow store for the dashboard
+(dataset_store.StoreWriter) and to the SQLite database the chatbot queries
+(ingest), so memory stays bounded and no request waits for the parse. The
+browser polls the job through the upload-status API.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import dataset_store, ingest
+
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', '1'))
+
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='upload')
+_jobs = {}  # user id -> latest job
+_user_locks = {}  # user id -> lock, so two uploads never rebuild the same database at once
+_lock = threading.Lock()
+
+
+def process(file_path, user_id, chunk_rows=ingest.INGEST_CHUNK_ROWS):
+    """Build the Arrow store and the user's chatbot database in one pass; returns (info, ingest report)"""
+    writer = dataset_store.StoreWriter(file_path)
+    try:
+        report = ingest.ingest_for_user(file_path, user_id, chunk_rows, on_chunk=writer.add)
+        info = writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    return info, report
+
+
+def _run(job, file_path, user_id):
+    with _lock:
+        user_lock = _user_locks.setdefault(user_id, threading.Lock())
+    with user_lock:
+        try:
+            info, report = process(file_path, user_id)
+        except Exception as e:
+            job.update(status='error', error=str(e), finished=time.time())
+            print(f"❌ Processing {file_path.name} failed: {e}")
+            return
+        job.update(status='ready', info=info, ingest=report, finished=time.time())
+
+
+def start(file_path, user_id):
+    """Process a saved upload in the background; returns its job"""
+    job = {'status': 'processing', 'filename': file_path.name, 'started': time.time()}
+    with _lock:
+        _jobs[user_id] = job
+    _executor.submit(_run, job, file_path, user_id)
+    return job
+
+
+def status(user_id):
+    """The user's latest upload job, or None"""
+    with _lock:
+        job = _jobs.get(user_id)
+        return dict(job) if job is not None else None
+
+
+def wait(user_id, timeout=None):
+    """Block until the user's latest job is done (for tests and scripts); returns it"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        job = status(user_id)
+        if job is None or job['status'] != 'processing':
+            return job
+        if deadline is not None and time.monotonic() >= deadline:
+            return job
+        time.sleep(0.05)
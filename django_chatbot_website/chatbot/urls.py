@@ -7,6 +7,7 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
     path('register/', views.register, name='register'),
     path('api/upload-dataset/', views.upload_dataset, name='upload_dataset'),
+    path('api/upload-status/', views.upload_status, name='upload_status'),
     path('api/create-chart/', views.create_chart, name='create_chart'),
     path('api/dataset-info/', views.get_dataset_info, name='dataset_info'),
 ]
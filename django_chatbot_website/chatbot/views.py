@@ -1,21 +1,18 @@
 from django.shortcuts import render, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-import subprocess
-import os
-import signal
-import time
-import pandas as pd
+from django.views.decorators.gzip import gzip_page
 import json
-import numpy as np
-from pathlib import Path
 
-# Global variable to track the chatbot process
-chatbot_process = None
+from . import chart_payload, dataset_store, downsample, ingest, rollups, supervisor, uploads
+
+# Supervisor of the chatbot workers started from this process
+chatbot_supervisor = None
 
 def home(request):
     """Home page view"""
@@ -38,64 +35,61 @@ def register(request):
 @login_required
 def chat(request):
     """Chat interface view - shows the iframe with chainlit chatbot"""
-    return render(request, 'chatbot/chat.html')
+    # the signed token makes the chatbot session query this user's uploaded dataset
+    chatbot_url = f'http://localhost:{supervisor.CHATBOT_PORT}/?dataset={ingest.dataset_token(request.user.id)}'
+    return render(request, 'chatbot/chat.html', {'chatbot_url': chatbot_url})
+
+def _finished_upload(request, keys):
+    """Info of the user's upload that finished processing since the page last looked, or None.
+
+    The info is stored in the session as the current dataset.
+    """
+    job = uploads.status(request.user.id)
+    if job is None or job['status'] != 'ready' or request.session.get('upload_finished') == job['finished']:
+        return None
+    info = job['info']
+    dataset_info = {key: info[key] for key in keys}
+    if 'sample_data' in dataset_info:
+        dataset_info['sample_data'] = dataset_info['sample_data'][:5]
+    request.session['current_dataset'] = dataset_info
+    request.session['upload_finished'] = job['finished']
+    return job
 
 @login_required
 def dashboard(request):
     """Dashboard view for data analysis and visualization"""
     context = {'dataset_info': None}
-    user_data_dir = Path('user_data') / str(request.user.id)
-    user_data_dir.mkdir(parents=True, exist_ok=True)
     
     if request.method == 'POST' and request.FILES.get('dataset'):
         try:
             uploaded_file = request.FILES['dataset']
             
-            # Validate file type
-            allowed_extensions = ['.csv', '.xlsx', '.xls']
-            file_extension = Path(uploaded_file.name).suffix.lower()
-            
-            if file_extension not in allowed_extensions:
-                messages.error(request, 'Only CSV and Excel files are supported')
-                return redirect('dashboard')
-            
-            # Save file
-            file_path = user_data_dir / uploaded_file.name
-            with open(file_path, 'wb+') as destination:
-                for chunk in uploaded_file.chunks():
-                    destination.write(chunk)
-            
-            # Read the dataset
-            if file_extension == '.csv':
-                df = pd.read_csv(file_path)
-            else:  # Excel files
-                df = pd.read_excel(file_path)
-            
-            # Get dataset info
-            dataset_info = {
-                'filename': uploaded_file.name,
-                'rows': len(df),
-                'columns': len(df.columns),
-                'size': f"{uploaded_file.size / 1024:.1f} KB",
-                'column_names': df.columns.tolist(),
-                'column_types': df.dtypes.astype(str).to_dict(),
-                'numeric_columns': df.select_dtypes(include=['number']).columns.tolist(),
-                'categorical_columns': df.select_dtypes(include=['object']).columns.tolist(),
-                'preview_data': df.head(10).values.tolist()
-            }
-            
-            # Store dataset info in session
-            request.session['current_dataset'] = dataset_info
-            context['dataset_info'] = dataset_info
-            
-            messages.success(request, f'Dataset {uploaded_file.name} uploaded successfully!')
+            # Only the save happens in the request; parsing runs in the background
+            file_path = dataset_store.save_upload(uploaded_file, request.user.id)
+            uploads.start(file_path, request.user.id)
+            messages.info(request, f'Dataset {uploaded_file.name} uploaded, processing it...')
             
+        except dataset_store.DatasetError as e:
+            messages.error(request, str(e))
         except Exception as e:
             messages.error(request, f'Error uploading file: {str(e)}')
-            return redirect('dashboard')
+        return redirect('dashboard')
+    
+    job = _finished_upload(request, (
+        'filename', 'rows', 'columns', 'size', 'column_names', 'column_types',
+        'numeric_columns', 'categorical_columns', 'preview_data',
+    ))
+    if job is not None:
+        messages.success(request, f'Dataset {job["filename"]} processed! '
+                                  f'{job["ingest"]["rows"]} rows loaded for the chatbot.')
+    
+    # A form upload redirects here before the file is parsed; the page polls until it is
+    job = uploads.status(request.user.id)
+    if job is not None and job['status'] == 'processing':
+        context['upload_status_url'] = reverse('upload_status')
     
     # Check if there's a current dataset in session
-    elif 'current_dataset' in request.session:
+    if 'current_dataset' in request.session:
         context['dataset_info'] = request.session['current_dataset']
     
     return render(request, 'chatbot/dashboard.html', context)
@@ -103,63 +97,75 @@ def dashboard(request):
 @login_required
 @csrf_exempt
 def upload_dataset(request):
-    """Handle dataset upload"""
+    """Handle dataset upload: save it and start processing it in the background"""
     if request.method == 'POST' and request.FILES.get('dataset'):
         try:
             uploaded_file = request.FILES['dataset']
             
-            # Validate file type
-            allowed_extensions = ['.csv', '.xlsx', '.xls']
-            file_extension = Path(uploaded_file.name).suffix.lower()
-            
-            if file_extension not in allowed_extensions:
-                return JsonResponse({'error': 'Only CSV and Excel files are supported'}, status=400)
-            
-            # Create user data directory
-            user_data_dir = Path('user_data') / str(request.user.id)
-            user_data_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Save file
-            file_path = user_data_dir / uploaded_file.name
-            with open(file_path, 'wb+') as destination:
-                for chunk in uploaded_file.chunks():
-                    destination.write(chunk)
-            
-            # Read and analyze the dataset
-            if file_extension == '.csv':
-                df = pd.read_csv(file_path)
-            else:  # Excel files
-                df = pd.read_excel(file_path)
-            
-            # Get dataset info
-            dataset_info = {
-                'filename': uploaded_file.name,
-                'rows': len(df),
-                'columns': len(df.columns),
-                'column_names': df.columns.tolist(),
-                'column_types': df.dtypes.astype(str).to_dict(),
-                'numeric_columns': df.select_dtypes(include=['number']).columns.tolist(),
-                'categorical_columns': df.select_dtypes(include=['object']).columns.tolist(),
-                'missing_values': df.isnull().sum().to_dict(),
-                'sample_data': df.head().to_dict('records')
-            }
-            
-            # Store dataset info in session
-            request.session['current_dataset'] = dataset_info
+            # Parsing into the Arrow store and the chatbot's database happens
+            # off the request thread; the browser polls upload_status
+            file_path = dataset_store.save_upload(uploaded_file, request.user.id)
+            uploads.start(file_path, request.user.id)
             
             return JsonResponse({
                 'success': True,
-                'message': f'Dataset {uploaded_file.name} uploaded successfully',
-                'dataset_info': dataset_info
-            })
+                'status': 'processing',
+                'message': f'Dataset {uploaded_file.name} uploaded, processing it...',
+                'status_url': reverse('upload_status'),
+            }, status=202)
             
+        except dataset_store.DatasetError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'error': f'Error uploading file: {str(e)}'}, status=500)
     
     return JsonResponse({'error': 'No file uploaded'}, status=400)
 
+@login_required
+def upload_status(request):
+    """State of the user's latest upload; the dataset info once it is processed"""
+    job = uploads.status(request.user.id)
+    if job is None:
+        return JsonResponse({'error': 'No upload found'}, status=404)
+    if job['status'] == 'processing':
+        return JsonResponse({'success': True, 'status': 'processing', 'filename': job['filename']})
+    if job['status'] == 'error':
+        return JsonResponse({'status': 'error', 'error': f'Error processing {job["filename"]}: {job["error"]}'}, status=500)
+    
+    _finished_upload(request, (
+        'filename', 'rows', 'columns', 'column_names', 'column_types',
+        'numeric_columns', 'categorical_columns', 'missing_values', 'sample_data',
+    ))
+    return JsonResponse({
+        'success': True,
+        'status': 'ready',
+        'message': f'Dataset {job["filename"]} uploaded successfully',
+        'dataset_info': request.session.get('current_dataset'),
+        'ingest': job['ingest']
+    })
+
+def _value_counts(user_id, filename, column, use_rollups):
+    """(values, counts) of a column, most frequent first"""
+    if use_rollups:
+        result = rollups.value_counts(ingest.user_db_path(user_id), column)
+        if result is not None:
+            return result
+    counts = dataset_store.load_columns(user_id, filename, [column])[column].value_counts()
+    return counts.index.tolist(), counts.values.tolist()
+
+def _group_sums(user_id, filename, group_column, value_column, use_rollups):
+    """(groups, sums) of value_column per value of group_column"""
+    if use_rollups:
+        result = rollups.group_sums(ingest.user_db_path(user_id), group_column, value_column)
+        if result is not None:
+            return result
+    df = dataset_store.load_columns(user_id, filename, [group_column, value_column])
+    grouped = df.groupby(group_column)[value_column].sum()
+    return grouped.index.tolist(), grouped.values.tolist()
+
 @login_required
 @csrf_exempt
+@gzip_page
 def create_chart(request):
     """Create a chart from uploaded dataset"""
     if request.method == 'POST':
@@ -176,19 +182,26 @@ def create_chart(request):
             dataset_info = request.session['current_dataset']
             filename = dataset_info['filename']
             
-            # Load the dataset
-            user_data_dir = Path('user_data') / str(request.user.id)
-            file_path = user_data_dir / filename
-            
-            if not file_path.exists():
+            # Load only the chart's columns from the memory-mapped store
+            try:
+                info = dataset_store.load_info(request.user.id, filename)
+            except dataset_store.DatasetError:
                 return JsonResponse({'error': 'Dataset file not found'}, status=404)
             
-            # Read the dataset
-            file_extension = Path(filename).suffix.lower()
-            if file_extension == '.csv':
-                df = pd.read_csv(file_path)
-            else:  # Excel files
-                df = pd.read_excel(file_path)
+            unknown_columns = [column for column in (x_column, y_column) if column and column not in info['column_names']]
+            if not x_column or unknown_columns:
+                return JsonResponse({'error': f'Unknown column: {unknown_columns[0] if unknown_columns else x_column}'}, status=400)
+            
+            # Counts and sums are read from the rollup tables built at ingestion
+            # when they were built from this file; other charts need the raw columns
+            use_rollups = rollups.rollups_match(
+                ingest.user_db_path(request.user.id), dataset_store.dataset_file(request.user.id, filename)
+            )
+            if chart_type not in ('bar', 'pie'):
+                df = dataset_store.load_columns(request.user.id, filename, [x_column, y_column])
+            # Line, scatter and histogram data is reduced to this many points
+            max_points = downsample.point_budget(data.get('max_points'))
+            sampling = None
             
             # Generate chart data for Plotly
             chart_data = {}
@@ -196,11 +209,11 @@ def create_chart(request):
             if chart_type == 'bar':
                 if y_column:
                     # Group by x_column and sum/mean y_column
-                    grouped = df.groupby(x_column)[y_column].sum()
+                    groups, sums = _group_sums(request.user.id, filename, x_column, y_column, use_rollups)
                     chart_data = {
                         'data': [{
-                            'x': grouped.index.tolist(),
-                            'y': grouped.values.tolist(),
+                            'x': groups,
+                            'y': sums,
                             'type': 'bar',
                             'name': y_column
                         }],
@@ -212,11 +225,11 @@ def create_chart(request):
                     }
                 else:
                     # Count occurrences of x_column
-                    value_counts = df[x_column].value_counts()
+                    values, counts = _value_counts(request.user.id, filename, x_column, use_rollups)
                     chart_data = {
                         'data': [{
-                            'x': value_counts.index.tolist(),
-                            'y': value_counts.values.tolist(),
+                            'x': values,
+                            'y': counts,
                             'type': 'bar',
                             'name': 'Count'
                         }],
@@ -229,10 +242,14 @@ def create_chart(request):
             
             elif chart_type == 'line':
                 if y_column:
+                    # LTTB keeps the line's shape; min-max keeps every spike
+                    x_values, y_values, sampling = downsample.line_points(
+                        df[x_column], df[y_column], max_points, data.get('downsample', 'lttb')
+                    )
                     chart_data = {
                         'data': [{
-                            'x': df[x_column].tolist(),
-                            'y': df[y_column].tolist(),
+                            'x': x_values,
+                            'y': y_values,
                             'type': 'scatter',
                             'mode': 'lines+markers',
                             'name': y_column
@@ -245,11 +262,11 @@ def create_chart(request):
                     }
             
             elif chart_type == 'pie':
-                value_counts = df[x_column].value_counts()
+                values, counts = _value_counts(request.user.id, filename, x_column, use_rollups)
                 chart_data = {
                     'data': [{
-                        'values': value_counts.values.tolist(),
-                        'labels': value_counts.index.tolist(),
+                        'values': counts,
+                        'labels': values,
                         'type': 'pie'
                     }],
                     'layout': {
@@ -258,11 +275,30 @@ def create_chart(request):
                 }
             
             elif chart_type == 'scatter':
-                if y_column:
+                if y_column and data.get('density'):
+                    # Binned point counts instead of individual markers
+                    x_centers, y_centers, counts, sampling = downsample.density_grid(df[x_column], df[y_column], max_points)
                     chart_data = {
                         'data': [{
-                            'x': df[x_column].tolist(),
-                            'y': df[y_column].tolist(),
+                            'x': x_centers,
+                            'y': y_centers,
+                            'z': counts,
+                            'type': 'heatmap',
+                            'colorscale': 'Blues',
+                            'name': f'{y_column} vs {x_column}'
+                        }],
+                        'layout': {
+                            'title': f'{y_column} vs {x_column} (density)',
+                            'xaxis': {'title': x_column},
+                            'yaxis': {'title': y_column}
+                        }
+                    }
+                elif y_column:
+                    x_values, y_values, sampling = downsample.scatter_points(df[x_column], df[y_column], max_points)
+                    chart_data = {
+                        'data': [{
+                            'x': x_values,
+                            'y': y_values,
                             'mode': 'markers',
                             'type': 'scatter',
                             'name': f'{y_column} vs {x_column}'
@@ -275,22 +311,31 @@ def create_chart(request):
                     }
             
             elif chart_type == 'histogram':
+                # Binned here; the browser only draws the bars
+                centers, counts, widths, sampling = downsample.histogram(df[x_column], max_points)
+                trace = {
+                    'x': centers,
+                    'y': counts,
+                    'type': 'bar',
+                    'name': x_column
+                }
+                if widths is not None:
+                    trace['width'] = widths
                 chart_data = {
-                    'data': [{
-                        'x': df[x_column].tolist(),
-                        'type': 'histogram',
-                        'name': x_column
-                    }],
+                    'data': [trace],
                     'layout': {
                         'title': f'Distribution of {x_column}',
                         'xaxis': {'title': x_column},
-                        'yaxis': {'title': 'Frequency'}
+                        'yaxis': {'title': 'Frequency'},
+                        'bargap': 0
                     }
                 }
             
             return JsonResponse({
                 'success': True,
-                'chart_json': json.dumps(chart_data)
+                # One JSON document; numeric arrays travel as base64 typed arrays
+                'chart': chart_payload.encode_figure(chart_data),
+                'sampling': sampling
             })
             
         except Exception as e:
@@ -307,32 +352,12 @@ def get_dataset_info(request):
             data = json.loads(request.body)
             filename = data.get('filename')
             
-            user_data_dir = Path('user_data') / str(request.user.id)
-            file_path = user_data_dir / filename
-            
-            if not file_path.exists():
+            # Served from the info sidecar written at upload time, no re-parsing
+            try:
+                dataset_info = dataset_store.load_info(request.user.id, filename)
+            except dataset_store.DatasetError:
                 return JsonResponse({'error': 'Dataset not found'}, status=404)
             
-            # Read the dataset based on file extension
-            file_extension = Path(filename).suffix.lower()
-            if file_extension == '.csv':
-                df = pd.read_csv(file_path)
-            else:  # Excel files
-                df = pd.read_excel(file_path)
-            
-            dataset_info = {
-                'filename': filename,
-                'rows': len(df),
-                'columns': len(df.columns),
-                'column_names': df.columns.tolist(),
-                'column_types': df.dtypes.astype(str).to_dict(),
-                'numeric_columns': df.select_dtypes(include=['number']).columns.tolist(),
-                'categorical_columns': df.select_dtypes(include=['object']).columns.tolist(),
-                'missing_values': df.isnull().sum().to_dict(),
-                'sample_data': df.head(10).to_dict('records'),
-                'summary_stats': df.describe().to_dict() if len(df.select_dtypes(include=['number']).columns) > 0 else {}
-            }
-            
             return JsonResponse({
                 'success': True,
                 'dataset_info': dataset_info
@@ -344,46 +369,24 @@ def get_dataset_info(request):
     return JsonResponse({'error': 'Invalid request method'}, status=405)
 
 def start_chatbot_server():
-    """Start the Chainlit chatbot server if not already running"""
-    global chatbot_process
+    """Start the Chainlit chatbot workers if not already running; True once they answer"""
+    global chatbot_supervisor
     
-    if chatbot_process and chatbot_process.poll() is None:
-        return True  # Already running
+    if chatbot_supervisor is not None:
+        return all(child['ready'] for child in chatbot_supervisor.status())
     
-    try:
-        # Path to your chatbot package
-        chatbot_root = Path(__file__).parent.parent.parent / "chatbot_package"
-        run_script = chatbot_root / "run_chatbot.py"
-        
-        if not run_script.exists():
-            print(f"Chatbot script not found at {run_script}")
-            return False
-        
-        # Start the chatbot server on port 8002
-        chatbot_process = subprocess.Popen(
-            ["python", str(run_script)],
-            cwd=str(chatbot_root),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        # Give it a moment to start
-        time.sleep(3)
-        
-        return chatbot_process.poll() is None
-        
-    except Exception as e:
-        print(f"Error starting chatbot: {e}")
+    if not (supervisor.CHATBOT_ROOT / 'run_chatbot.py').exists():
+        print(f"Chatbot script not found in {supervisor.CHATBOT_ROOT}")
         return False
+    
+    # Polls the workers' port instead of sleeping; crashed workers are restarted
+    chatbot_supervisor = supervisor.Supervisor(supervisor.chatbot_workers())
+    return chatbot_supervisor.start()
 
 def stop_chatbot_server():
-    """Stop the Chainlit chatbot server"""
-    global chatbot_process
+    """Stop the Chainlit chatbot workers"""
+    global chatbot_supervisor
     
-    if chatbot_process and chatbot_process.poll() is None:
-        try:
-            chatbot_process.terminate()
-            chatbot_process.wait(timeout=5)
-        except subprocess.TimeoutExpired:
-            chatbot_process.kill()
-        chatbot_process = None
+    if chatbot_supervisor is not None:
+        chatbot_supervisor.stop()
+        chatbot_supervisor = None
@@ -2,63 +2,25 @@
 """
 Script to start both the Django server and Chainlit chatbot server
 """
+import argparse
 import subprocess
-import time
 import sys
-import os
+import time
 from pathlib import Path
-import signal
-import threading
 
-def start_chatbot_server():
-    """Start the Chainlit chatbot server"""
-    print("🤖 Starting Chainlit chatbot server...")
-    chatbot_root = Path(__file__).parent.parent / "chatbot_package"
-    run_script = chatbot_root / "run_chatbot.py"
-    
-    if not run_script.exists():
-        print(f"❌ Chatbot script not found at {run_script}")
-        return None
-    
-    try:
-        process = subprocess.Popen(
-            [sys.executable, str(run_script)],
-            cwd=str(chatbot_root),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        time.sleep(3)  # Give it time to start
-        
-        if process.poll() is None:
-            print("✅ Chainlit chatbot server started on http://localhost:8002")
-            return process
-        else:
-            print("❌ Failed to start chatbot server")
-            return None
-    except Exception as e:
-        print(f"❌ Error starting chatbot server: {e}")
-        return None
+from chatbot.supervisor import CHATBOT_PORT, CHATBOT_WORKERS, LOG_DIR, ManagedProcess, Supervisor, chatbot_workers
 
-def start_django_server():
-    """Start the Django development server"""
-    print("🌐 Starting Django server...")
-    try:
-        process = subprocess.Popen(
-            [sys.executable, "manage.py", "runserver", "127.0.0.1:8000"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        time.sleep(2)  # Give it time to start
-        
-        if process.poll() is None:
-            print("✅ Django server started on http://127.0.0.1:8000")
-            return process
-        else:
-            print("❌ Failed to start Django server")
-            return None
-    except Exception as e:
-        print(f"❌ Error starting Django server: {e}")
-        return None
+DJANGO_PORT = 8000
+
+
+def django_server(port=DJANGO_PORT):
+    """Django development server as a supervised process"""
+    return ManagedProcess(
+        'django',
+        [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}'],
+        port,
+        cwd=Path(__file__).resolve().parent,
+    )
 
 def setup_database():
     """Run Django migrations"""
@@ -72,58 +34,38 @@ def setup_database():
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description="Start the Django website and the Chainlit chatbot")
+    parser.add_argument("--workers", type=int, default=CHATBOT_WORKERS, help="Number of Chainlit workers")
+    parser.add_argument("--chatbot-port", type=int, default=CHATBOT_PORT, help="Port the chatbot answers on")
+    args = parser.parse_args()
+
     print("🚀 Starting Data Analyst Chatbot Website")
     print("=" * 50)
-    
+
     # Setup database first
     if not setup_database():
         sys.exit(1)
-    
-    chatbot_process = None
-    django_process = None
-    
+
+    # Chatbot workers and Django boot in parallel; each is ready when its port answers
+    supervisor = Supervisor(chatbot_workers(args.workers, args.chatbot_port) + [django_server()])
+    started = time.monotonic()
     try:
-        # Start chatbot server
-        chatbot_process = start_chatbot_server()
-        
-        # Start Django server
-        django_process = start_django_server()
-        
-        if not django_process:
-            sys.exit(1)
-        
-        print("\n🎉 Both servers are running!")
-        print("📊 Main website: http://127.0.0.1:8000")
-        print("🤖 Chatbot (direct): http://localhost:8002")
-        print("\nPress Ctrl+C to stop both servers")
-        
-        # Wait for processes
-        try:
-            django_process.wait()
-        except KeyboardInterrupt:
-            print("\n🛑 Stopping servers...")
-            
+        if not supervisor.start():
+            print("⚠️ Some servers are not ready yet; they keep being retried in the background")
+
+        print(f"\n🎉 Servers started in {time.monotonic() - started:.1f}s")
+        print(f"📊 Main website: http://127.0.0.1:{DJANGO_PORT}")
+        print(f"🤖 Chatbot: http://localhost:{args.chatbot_port}"
+              + (f" ({args.workers} workers behind the sticky router)" if args.workers > 1 else ""))
+        print(f"📝 Logs: {LOG_DIR}")
+        print("\nPress Ctrl+C to stop all servers")
+
+        while True:
+            time.sleep(1)
     except KeyboardInterrupt:
         print("\n🛑 Stopping servers...")
-    
     finally:
-        # Clean up processes
-        if chatbot_process and chatbot_process.poll() is None:
-            print("Stopping chatbot server...")
-            chatbot_process.terminate()
-            try:
-                chatbot_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                chatbot_process.kill()
-        
-        if django_process and django_process.poll() is None:
-            print("Stopping Django server...")
-            django_process.terminate()
-            try:
-                django_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                django_process.kill()
-        
+        supervisor.stop()
         print("✅ Servers stopped")
 
 if __name__ == "__main__":
@@ -0,0 +1,12 @@
+import os
+import sys
+from pathlib import Path
+
+import django
+
+# import the app's modules as "chatbot.<module>", the way manage.py runs them
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# views and templates need the project's settings
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+django.setup()
@@ -0,0 +1,89 @@
+import base64
+import gzip
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from django.test import RequestFactory
+
+from chatbot import chart_payload, dataset_store, ingest, uploads, views
+from chatbot.chart_payload import encode_array, encode_figure
+
+
+def _decode(spec):
+    """What decodeChart in dashboard.html does"""
+    array = np.frombuffer(base64.b64decode(spec['bdata']), dtype=np.dtype('<' + spec['dtype']))
+    return array.reshape(spec['shape']) if 'shape' in spec else array
+
+
+@pytest.mark.parametrize('values,dtype', [
+    (list(range(-100, 20)), 'i1'),
+    (list(range(0, 250)), 'u1'),
+    (list(range(-300, 300)), 'i2'),
+    (list(range(0, 60000, 1000)), 'u2'),
+    (list(range(-100000, 100000, 5000)), 'i4'),
+    (list(range(0, 4_000_000_000, 100_000_000)), 'u4'),
+    (list(range(0, 2 ** 40, 2 ** 35)), 'f8'),
+    ([float(i) for i in range(20)], 'i1'),
+    ([i + 0.5 for i in range(20)], 'f8'),
+])
+def test_smallest_dtype_that_holds_every_value(values, dtype):
+    spec = encode_array(values)
+    assert spec['dtype'] == dtype
+    assert _decode(spec).tolist() == values
+
+
+def test_two_dimensional_arrays_keep_their_shape():
+    z = [[row * 10 + column for column in range(5)] for row in range(4)]
+    spec = encode_array(z)
+    assert spec['shape'] == [4, 5]
+    assert _decode(spec).tolist() == z
+
+
+@pytest.mark.parametrize('values', [
+    [1.5] * 10 + [float('nan')] * 10,
+    [1.0] * 19 + [float('inf')],
+    list(range(19)) + [None],
+    ['a'] * 20,
+    [True, False] * 10,
+    [[1, 2], [3]] * 10,
+    list(range(chart_payload.MIN_ENCODED_LENGTH - 1)),
+])
+def test_values_without_a_typed_array_equivalent_stay_json(values):
+    assert encode_array(values) is values
+
+
+def test_encode_figure_only_touches_numeric_arrays():
+    figure = {
+        'data': [{'x': ['a'] * 20, 'y': list(range(20)), 'type': 'bar', 'name': 'n'}],
+        'layout': {'title': 't'},
+    }
+    encoded = encode_figure(figure)
+    assert encoded['data'][0]['x'] == ['a'] * 20
+    assert encoded['data'][0]['y']['dtype'] == 'i1'
+    assert encoded['layout'] == {'title': 't'}
+    assert figure['data'][0]['y'] == list(range(20))
+
+
+def test_the_chart_api_sends_gzipped_typed_arrays(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_store, 'USER_DATA_ROOT', tmp_path)
+    monkeypatch.setattr(ingest, 'DB_PATH_TEMPLATE', str(tmp_path / 'dataset_{user_id}.db'))
+    file_path = dataset_store.dataset_file(5, 'sales.csv')
+    file_path.write_text('day,amount\n' + ''.join(f'{day},{day * 1.5}\n' for day in range(300)))
+    uploads.process(file_path, 5)
+
+    request = RequestFactory().post(
+        '/api/create-chart/', json.dumps({'chart_type': 'line', 'x_column': 'day', 'y_column': 'amount'}),
+        content_type='application/json', HTTP_ACCEPT_ENCODING='gzip',
+    )
+    request.user = SimpleNamespace(is_authenticated=True, id=5)
+    request.session = {'current_dataset': {'filename': 'sales.csv'}}
+    response = views.create_chart(request)
+
+    assert response.status_code == 200
+    assert response['Content-Encoding'] == 'gzip'
+    trace = json.loads(gzip.decompress(response.content))['chart']['data'][0]
+    assert trace['x']['dtype'] == 'i2' and trace['y']['dtype'] == 'f8'
+    assert _decode(trace['x']).tolist() == list(range(300))
+    assert _decode(trace['y']).tolist() == [day * 1.5 for day in range(300)]
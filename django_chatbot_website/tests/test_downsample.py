@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from chatbot import downsample
+
+
+def test_point_budget_is_clamped():
+    assert downsample.point_budget(None) == downsample.CHART_MAX_POINTS
+    assert downsample.point_budget('abc') == downsample.CHART_MAX_POINTS
+    assert downsample.point_budget(1) == 10
+    assert downsample.point_budget(10 ** 9) == downsample.CHART_MAX_POINTS_LIMIT
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(10000)
+    y = np.sin(x / 500.0)
+    y[4321] = 50  # a spike LTTB must not drop
+    indices = downsample.lttb(x, y, 200)
+    assert len(indices) == 200
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert np.all(np.diff(indices) > 0)
+    assert 4321 in indices
+
+
+def test_minmax_keeps_bucket_extremes():
+    y = np.zeros(1000)
+    y[10], y[990] = -7, 9
+    indices = downsample.minmax(y, 20)
+    assert len(indices) <= 20
+    assert 10 in indices and 990 in indices
+
+
+@pytest.mark.parametrize('reducer', [
+    lambda n: downsample.lttb(np.arange(n), np.arange(n), 100),
+    lambda n: downsample.minmax(np.arange(n), 100),
+    lambda n: downsample.sample(n, 100),
+])
+def test_small_inputs_are_not_reduced(reducer):
+    assert list(reducer(50)) == list(range(50))
+
+
+def test_sample_is_deterministic():
+    assert list(downsample.sample(10000, 50)) == list(downsample.sample(10000, 50))
+
+
+def test_line_points_with_dates_and_missing_values():
+    dates = pd.Series(pd.date_range('2020-01-01', periods=5000, freq='h').strftime('%Y-%m-%d %H:%M:%S'))
+    values = pd.Series(np.arange(5000, dtype=float))
+    values[100] = np.nan
+    x, y, info = downsample.line_points(dates, values, 500)
+    assert info == {'method': 'lttb', 'points_in': 4999, 'points_out': 500}
+    assert x[0] == '2020-01-01 00:00:00'
+    assert not any(np.isnan(y))
+
+
+def test_density_grid_counts_every_point():
+    rng = np.random.default_rng(1)
+    x, y = pd.Series(rng.normal(size=20000)), pd.Series(rng.normal(size=20000))
+    x_centers, y_centers, counts, info = downsample.density_grid(x, y, 400)
+    assert len(x_centers) == len(y_centers) == 20
+    assert sum(map(sum, counts)) == 20000
+    assert info['points_out'] <= 400
+
+
+def test_histogram_numeric_dates_and_categories():
+    centers, counts, widths, info = downsample.histogram(pd.Series(np.arange(1000.0)), 50)
+    assert sum(counts) == 1000 and len(counts) <= 50 and len(widths) == len(counts)
+
+    dates = pd.Series(pd.date_range('2021-01-01', periods=365).strftime('%Y-%m-%d'))
+    centers, counts, widths, info = downsample.histogram(dates, 30)
+    assert info['method'] == 'bins' and sum(counts) == 365
+    assert centers[0].startswith('2021-01')
+
+    centers, counts, widths, info = downsample.histogram(pd.Series(['a', 'b', 'a', None]), 10)
+    assert info['method'] == 'categories'
+    assert dict(zip(centers, counts)) == {'a': 2, 'b': 1}
+    assert widths is None
@@ -0,0 +1,95 @@
+import itertools
+import math
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+from chatbot import ingest
+from chatbot.rollups import group_sums, stored_value, value_counts
+
+# the chatbot's query rewriter, to check its rewrites against the tables built here
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'chatbot_package' / 'src'))
+from rollups import _load_rollups  # noqa: E402
+
+GENRES = ['drama', 'comedy', 'horror']
+
+
+def _csv(path):
+    """24 rows in chunks of 4: a NaN year and an all-integer score chunk come later, and one genre chunk is numeric"""
+    lines = ['year,genre,score,votes']
+    for i in range(24):
+        year = '' if i == 13 else str(2000 + i % 3)
+        genre = str(i % 2) if 16 <= i < 20 else GENRES[i % 3]
+        score = str(5 + i % 4) if 8 <= i < 12 else f'{5 + i % 4}.5'
+        votes = '' if i == 5 else str(10 * i)
+        lines.append(f'{year},{genre},{score},{votes}')
+    path.write_text('\n'.join(lines) + '\n')
+    return path
+
+
+@pytest.fixture
+def database(tmp_path):
+    db_path = tmp_path / 'dataset.db'
+    ingest.ingest_file(_csv(tmp_path / 'movies.csv'), db_path, chunk_rows=4)
+    return db_path
+
+
+def _queries(columns):
+    for group, value in itertools.permutations(columns, 2):
+        yield f'SELECT {group}, COUNT(*) AS n FROM main_table GROUP BY {group}'
+        yield f'SELECT {group}, COUNT({group}) FROM main_table GROUP BY 1 ORDER BY 2 DESC'
+        for function in ('SUM', 'AVG', 'COUNT', 'MIN', 'MAX'):
+            yield f'SELECT {group}, {function}({value}) AS v FROM main_table GROUP BY {group} ORDER BY {group}'
+
+
+def _same(a, b):
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b)
+    return type(a) is type(b) and a == b
+
+
+def _rows(connection, sql):
+    return sorted(connection.execute(sql).fetchall(), key=repr)
+
+
+def test_rewritten_queries_match_the_base_table(database):
+    with sqlite3.connect(database) as connection:
+        rollups = _load_rollups(connection)
+        assert rollups is not None
+        rewritten = 0
+        for sql in _queries(['year', 'genre', 'score', 'votes']):
+            fast = rollups.rewrite(sql)
+            if fast is None:
+                continue
+            rewritten += 1
+            base, rolled = _rows(connection, sql), _rows(connection, fast)
+            assert len(base) == len(rolled), sql
+            for base_row, rolled_row in zip(base, rolled):
+                assert all(_same(a, b) for a, b in zip(base_row, rolled_row)), (sql, base_row, rolled_row)
+    assert rewritten >= 20
+
+
+def test_group_keys_do_not_split_when_a_chunk_has_nans(database):
+    years, counts = value_counts(database, 'year')
+    assert sorted(years) == [2000, 2001, 2002]
+    assert all(type(year) is int for year in years)
+    groups, sums = group_sums(database, 'year', 'votes')
+    assert groups == [2000, 2001, 2002]
+    assert all(type(total) is int for total in sums)
+
+
+@pytest.mark.parametrize('column_type,value,expected', [
+    ('INTEGER', 2001.0, 2001),
+    ('INTEGER', 2.5, 2.5),
+    ('INTEGER', '12', 12),
+    ('INTEGER', 'abc', 'abc'),
+    ('REAL', 7, 7.0),
+    ('TEXT', 1, '1'),
+    ('TEXT', 1.5, '1.5'),
+    ('INTEGER', True, 1),
+    ('REAL', float('nan'), None),
+])
+def test_stored_value_follows_sqlite_affinity(column_type, value, expected):
+    assert _same(stored_value(column_type, value), expected)
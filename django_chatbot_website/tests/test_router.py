@@ -0,0 +1,116 @@
+import asyncio
+import re
+
+from chatbot.router import ROUTER_COOKIE, Router, add_cookie, worker_from_cookie
+
+_LENGTH_RE = re.compile(rb'^content-length:\s*(\d+)', re.IGNORECASE | re.MULTILINE)
+
+
+async def _start_worker(name):
+    """Keep-alive HTTP stub that echoes the request body and names itself in X-Worker"""
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                match = _LENGTH_RE.search(head)
+                body = await reader.readexactly(int(match.group(1))) if match else b''
+                reply = head.split(b' ', 1)[0] + b' ' + body
+                writer.write(b'HTTP/1.1 200 OK\r\nX-Worker: ' + name.encode()
+                             + b'\r\nContent-Length: ' + str(len(reply)).encode() + b'\r\n\r\n' + reply)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def _request(reader, writer, method, body=b'', cookie=None):
+    head = f'{method} / HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n'
+    if cookie:
+        head += f'Cookie: {cookie}\r\n'
+    writer.write(head.encode() + b'\r\n' + body)
+    await writer.drain()
+    response_head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 5)
+    length = int(_LENGTH_RE.search(response_head).group(1))
+    response_body = await reader.readexactly(length)
+    headers = dict(
+        line.decode().split(': ', 1) for line in response_head.split(b'\r\n')[1:] if b': ' in line
+    )
+    return headers, response_body
+
+
+async def _with_router(worker_names, scenario):
+    workers = [await _start_worker(name) for name in worker_names]
+    router = Router([port for _, port in workers])
+    server = await asyncio.start_server(router.handle, '127.0.0.1', 0)
+    try:
+        return await scenario(server.sockets[0].getsockname()[1], workers)
+    finally:
+        server.close()
+        for worker, _ in workers:
+            worker.close()
+
+
+def test_worker_from_cookie():
+    head = b'GET / HTTP/1.1\r\nCookie: a=1; chatbot_worker=1\r\n\r\n'
+    assert worker_from_cookie(head, 2) == 1
+    assert worker_from_cookie(head, 1) is None
+    assert worker_from_cookie(b'GET / HTTP/1.1\r\n\r\n', 2) is None
+
+
+def test_add_cookie_after_status_line():
+    head = add_cookie(b'HTTP/1.1 200 OK\r\nX: y\r\n\r\n', 3)
+    assert head.startswith(b'HTTP/1.1 200 OK\r\nSet-Cookie: chatbot_worker=3;')
+    assert head.endswith(b'X: y\r\n\r\n')
+
+
+def test_post_body_from_new_browser_is_forwarded():
+    async def scenario(port, workers):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        headers, body = await _request(reader, writer, 'POST', b'x' * 200_000)
+        writer.close()
+        return headers, body
+
+    headers, body = asyncio.run(_with_router(['a', 'b'], scenario))
+    assert body == b'POST ' + b'x' * 200_000
+    assert headers['Set-Cookie'].startswith(f'{ROUTER_COOKIE}=')
+
+
+def test_keep_alive_requests_share_the_worker():
+    async def scenario(port, workers):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        responses = [await _request(reader, writer, 'POST', b'first')]
+        responses.append(await _request(reader, writer, 'GET'))
+        responses.append(await _request(reader, writer, 'POST', b'third'))
+        writer.close()
+        return responses
+
+    responses = asyncio.run(_with_router(['a', 'b'], scenario))
+    assert [body for _, body in responses] == [b'POST first', b'GET ', b'POST third']
+    assert len({headers['X-Worker'] for headers, _ in responses}) == 1
+    # the cookie goes on the first response only
+    assert ['Set-Cookie' in headers for headers, _ in responses] == [True, False, False]
+
+
+def test_pinned_browser_keeps_its_worker_and_fails_over():
+    async def scenario(port, workers):
+        names = []
+        for _ in range(3):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            headers, _ = await _request(reader, writer, 'POST', b'body', cookie=f'{ROUTER_COOKIE}=1')
+            names.append((headers['X-Worker'], 'Set-Cookie' in headers))
+            writer.close()
+        workers[1][0].close()
+        await workers[1][0].wait_closed()
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        headers, body = await _request(reader, writer, 'POST', b'moved', cookie=f'{ROUTER_COOKIE}=1')
+        writer.close()
+        return names, headers, body
+
+    names, headers, body = asyncio.run(_with_router(['a', 'b'], scenario))
+    assert names == [('b', False)] * 3
+    assert body == b'POST moved'
+    assert headers['X-Worker'] == 'a'
+    assert headers['Set-Cookie'].startswith(f'{ROUTER_COOKIE}=0;')
@@ -0,0 +1,126 @@
+import socket
+import sys
+import time
+
+import pytest
+
+from chatbot import supervisor
+from chatbot.supervisor import ManagedProcess, Supervisor
+
+# Stands in for a Chainlit worker: counts its starts, boots slowly (a negative
+# delay exits with code 3 instead), serves HTTP, and on its first run exits
+# after a while as if it had crashed.
+STUB = '''
+import http.server, pathlib, sys, time
+
+port, boot_delay, starts, crash_after = int(sys.argv[1]), float(sys.argv[2]), pathlib.Path(sys.argv[3]), float(sys.argv[4])
+with starts.open('a') as f:
+    f.write('start\\n')
+first_run = len(starts.read_text().split()) == 1
+if boot_delay < 0:
+    sys.exit(3)
+time.sleep(boot_delay)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.end_headers()
+
+
+server = http.server.HTTPServer(('127.0.0.1', port), Handler)
+server.timeout = 0.05
+started = time.monotonic()
+while not (first_run and crash_after and time.monotonic() - started > crash_after):
+    server.handle_request()
+sys.exit(1)
+'''
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def stub(tmp_path):
+    script = tmp_path / 'stub.py'
+    script.write_text(STUB)
+    children = []
+
+    def make(boot_delay=0.0, crash_after=0.0):
+        port = _free_port()
+        args = [sys.executable, script, port, boot_delay, tmp_path / f'starts-{port}', crash_after]
+        child = ManagedProcess(f'stub-{port}', args, port, log_dir=tmp_path / 'logs')
+        child.starts_file = tmp_path / f'starts-{port}'
+        children.append(child)
+        return child
+
+    yield make
+    for child in children:
+        child.stop()
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_ready_once_the_port_answers_not_after_a_fixed_sleep(stub):
+    child = stub(boot_delay=0.4)
+    child.start()
+    assert not child.check_ready()
+    started = time.monotonic()
+    assert child.wait_ready(timeout=10)
+    assert 0.2 < time.monotonic() - started < 3
+    assert child.status()['ready'] and child.status()['running']
+    assert 'starting' in child.log_path.read_text()
+
+
+def test_a_child_that_exits_is_not_waited_for(stub):
+    child = stub(boot_delay=-1)
+    child.start()
+    started = time.monotonic()
+    assert not child.wait_ready(timeout=30)
+    assert time.monotonic() - started < 5
+    assert child.process.returncode == 3
+
+
+def test_wait_ready_gives_up_at_the_timeout(stub):
+    child = stub(boot_delay=60)
+    child.start()
+    started = time.monotonic()
+    assert not child.wait_ready(timeout=0.3)
+    assert 0.3 <= time.monotonic() - started < 2
+    assert child.running()
+
+
+def test_stop_ends_the_child(stub):
+    child = stub()
+    child.start()
+    assert child.wait_ready(timeout=10)
+    child.stop()
+    assert not child.running()
+    assert not supervisor.probe(child.port)
+
+
+def test_a_child_that_exits_is_restarted_and_probed_again(stub, monkeypatch):
+    monkeypatch.setattr(supervisor, 'RESTART_BACKOFF_MAX', 0.1)
+    child = stub(crash_after=0.5)
+    chatbot_supervisor = Supervisor([child], check_interval=0.05)
+    try:
+        assert chatbot_supervisor.start(timeout=10)
+        first_pid = child.process.pid
+        assert _wait_for(lambda: child.restarts == 1)
+        assert _wait_for(lambda: child.ready)
+        assert child.process.pid != first_pid
+        assert child.starts_file.read_text().split() == ['start', 'start']
+        assert chatbot_supervisor.status()[0]['restarts'] == 1
+    finally:
+        chatbot_supervisor.stop()
+    assert not child.running()
@@ -0,0 +1,94 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pyarrow.feather as feather
+import pytest
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils.html import escapejs
+
+from chatbot import dataset_store, ingest, uploads, views
+
+CSV = '''year,title,score,budget
+2001,a,7,10
+2002,b,8,20
+2003,c,6,
+2004,d,,40
+2005,e,9.5,50
+2006,f,5,unknown
+'''
+
+
+@pytest.fixture
+def upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, 'DB_PATH_TEMPLATE', str(tmp_path / 'dataset_{user_id}.db'))
+    file_path = tmp_path / 'movies.csv'
+    file_path.write_text(CSV)
+    return file_path
+
+
+def test_one_pass_builds_the_arrow_store_and_the_database(upload):
+    info, report = uploads.process(upload, 7, chunk_rows=2)
+
+    assert report['rows'] == info['rows'] == 6
+    with sqlite3.connect(ingest.user_db_path(7)) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM main_table').fetchone() == (6,)
+
+    table = feather.read_table(dataset_store.store_path(upload), memory_map=True)
+    assert table.num_rows == 6
+    df = table.to_pandas()
+    # integers, then a gap, then decimals, then text in later chunks
+    assert df['year'].tolist() == [2001, 2002, 2003, 2004, 2005, 2006]
+    assert df['score'].tolist()[:3] == [7.0, 8.0, 6.0] and df['score'].tolist()[4] == 9.5
+    assert df['budget'].tolist()[-1] == 'unknown'
+
+    assert info['column_names'] == ['year', 'title', 'score', 'budget']
+    assert info['column_types']['year'] == 'int64'
+    assert info['column_types']['score'] == 'float64'
+    assert info['numeric_columns'] == ['year', 'score']
+    assert info['missing_values'] == {'year': 0, 'title': 0, 'score': 1, 'budget': 1}
+    assert info['summary_stats']['year']['max'] == 2006
+    assert info['sample_data'][0] == {'year': 2001, 'title': 'a', 'score': 7.0, 'budget': '10'}
+    assert not list(upload.parent.glob('*.part*'))
+
+
+def test_failed_ingest_leaves_no_store(upload):
+    upload.write_text('')
+    with pytest.raises(Exception):
+        uploads.process(upload, 7, chunk_rows=2)
+    assert not dataset_store.store_path(upload).exists()
+    assert not list(upload.parent.glob('*.part*'))
+
+
+def test_background_job_reports_its_result(upload):
+    job = uploads.start(upload, 8)
+    assert job['status'] in ('processing', 'ready')
+    job = uploads.wait(8, timeout=30)
+    assert job['status'] == 'ready'
+    assert job['info']['rows'] == job['ingest']['rows'] == 6
+
+
+def _dashboard(user_id, method='get', **data):
+    request = getattr(RequestFactory(), method)('/dashboard/', data)
+    request.user = SimpleNamespace(is_authenticated=True, id=user_id, username='analyst')
+    request.session = SessionStore()
+    request._messages = FallbackStorage(request)
+    return views.dashboard(request)
+
+
+def test_a_form_upload_page_polls_until_the_dataset_is_processed(upload, monkeypatch):
+    processing = {'status': 'processing', 'filename': 'movies.csv'}
+    monkeypatch.setattr(uploads, 'start', lambda file_path, user_id: None)
+    monkeypatch.setattr(dataset_store, 'USER_DATA_ROOT', upload.parent)
+    with upload.open('rb') as f:
+        response = _dashboard(9, 'post', dataset=f)
+    assert response.status_code == 302
+
+    monkeypatch.setattr(uploads, 'status', lambda user_id: processing)
+    page = _dashboard(9).content.decode()
+    assert f"waitForUpload('{escapejs(reverse('upload_status'))}')" in page
+
+    monkeypatch.setattr(uploads, 'status', lambda user_id: None)
+    assert "waitForUpload('" not in _dashboard(9).content.decode()